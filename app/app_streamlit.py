@@ -7,7 +7,6 @@ ROOT = Path(__file__).resolve().parents[1]  # project root
 if str(ROOT) not in sys.path:
     sys.path.insert(0, str(ROOT))
 
-from datetime import datetime
 import streamlit as st
 
 try:
@@ -17,14 +16,17 @@ except Exception as _e:
     RECORDER_AVAILABLE = False
     RECORDER_IMPORT_ERROR = str(_e)
 
-from app.config import RETRIEVER_TOP_K, TTS_VOICE, TTS_VOICE_CHOICES, MIC_DIR
-from app.rag.retriever import BooksRetriever
-from app.rag.prompts import make_recommendation_messages
-from app.llm.openai_client import chat_once
-from app.tools.summary_tool import call_summary_tool_via_openai
-from app.guards.moderation import check_message
-from app.tools.tts import synthesize_to_file, make_tts_key
-from app.tools.stt import transcribe_wav, transcribe_bytes
+from app.config import RETRIEVER_TOP_K, TTS_VOICE, TTS_VOICE_CHOICES, TTS_FORMAT
+from app.rag.retriever import get_retriever
+from app.llm.openai_client import embed_cache_stats
+from app.guards.moderation import moderation_stats
+from app.llm.semantic_cache import get_semantic_cache
+from app.tools.summaries_store import get_store
+from app.pipeline import RecommendationPipeline
+from app.tracing import start_trace, latency_summary
+from app.tools.audio_cache import get_audio_cache
+from app.tools.tts import synthesize_stream
+from app.tools.stt import transcribe_bytes, save_recording
 
 
 # Helper function to format candidates as a Markdown table
@@ -37,11 +39,60 @@ def candidates_markdown(items):
         lines.append(f"| {i} | {title} | {dist_s} |")
     return "\n".join(lines)
 
+# Spans of the last request next to the rolling percentiles of each stage
+def stage_timings_markdown(spans, summary):
+    lines = ["| Stage | ms | p50 / p95 / p99 ms | Details |", "|---|---:|---:|---|"]
+    for sp in sorted(spans, key=lambda x: x.start):
+        roll = summary.get(sp.name)
+        roll_s = " / ".join(f"{roll[p] * 1000:.0f}" for p in ("p50", "p95", "p99")) if roll else "n/a"
+        details = ", ".join(f"{k}={v}" for k, v in sp.attrs.items() if v is not None)
+        if sp.error:
+            details = f"error={sp.error}" + (f", {details}" if details else "")
+        lines.append(f"| {sp.name} | {sp.duration * 1000:.1f} | {roll_s} | {details.replace('|', '/')} |")
+    return "\n".join(lines)
+
+# Stream TTS: start playing the first segment while the rest is synthesized.
+# st.audio only plays complete media and cannot be appended to while it plays,
+# so the opening plays on its own and the full recording is offered below it.
+_AUDIO_MIME = {"mp3": "audio/mpeg", "wav": "audio/wav", "opus": "audio/ogg", "aac": "audio/aac", "flac": "audio/flac"}
+
+
+def play_tts(text):
+    stream = synthesize_stream(text, voice=st.session_state.get("tts_voice", TTS_VOICE))
+    mime = _AUDIO_MIME.get(TTS_FORMAT, f"audio/{TTS_FORMAT}")
+    first = st.empty()
+    with st.spinner("Synthesizing…"):
+        for i, segment in enumerate(stream):
+            if i == 0:
+                first.audio(segment, format=mime, autoplay=True)
+    if stream.segments > 1:
+        st.caption(
+            "Playing the opening above while the rest was synthesized. The player can't continue into "
+            "the later parts, so the full recording below starts from the beginning:"
+        )
+        st.audio(str(stream.path), format=mime)
+    source = "cache" if stream.cache_hit else f"{stream.segments} segments"
+    st.caption(f"First audio after {stream.time_to_first_audio:.2f}s ({source}). Saved to {stream.path}")
+
 # Streamlit app configuration
 st.set_page_config(page_title="Smart Librarian", page_icon="📚", layout="centered")
 st.title("📚 Smart Librarian")
 st.caption("Tell me what you're in the mood for. I'll recommend one book.")
 
+
+# Warm the process-wide index and summaries once per server process (not per rerun)
+@st.cache_resource(show_spinner="Loading book index…")
+def warm_resources():
+    get_store()
+    get_retriever()
+    return True
+
+
+try:
+    warm_resources()
+except Exception as e:  # not cached, so it is retried on the next rerun
+    st.sidebar.warning(f"Book index not loaded yet ({type(e).__name__}). Run the ingest script first.")
+
 # Sessions state (history for display only; not used as LLM context) ---
 if "messages" not in st.session_state:
     st.session_state["messages"] = []
@@ -55,6 +106,8 @@ if "last_summary_text" not in st.session_state:
     st.session_state["last_summary_text"] = None
 if "last_debug" not in st.session_state:
     st.session_state["last_debug"] = None
+if "last_trace" not in st.session_state:
+    st.session_state["last_trace"] = None
 
 # Sidebar for actions
 st.sidebar.header("Actions")
@@ -67,7 +120,8 @@ st.sidebar.button(
                                               last_item=None,
                                               last_rec_text=None,
                                               last_summary_text=None,
-                                              last_debug=None)
+                                              last_debug=None,
+                                              last_trace=None)
                     ),
 )
 
@@ -85,6 +139,17 @@ voice = st.sidebar.selectbox("Voice list dropdown", TTS_VOICE_CHOICES, index=def
 
 st.sidebar.divider()
 
+# Diagnostics: cProfile the next request (report shows in the debug expander)
+st.sidebar.subheader("🩺 Diagnostics")
+st.sidebar.toggle(
+    "Profile requests (cProfile)",
+    value=False,
+    key="profile_next",
+    help="Profiles the UI thread and the pipeline's worker tasks, merged into one report.",
+)
+
+st.sidebar.divider()
+
 # Voice mode toggle
 st.sidebar.subheader("🎧 Voice mode")
 voice_mode = st.sidebar.toggle("Enable voice mode", value=False, key="voice_mode_toggle")
@@ -110,9 +175,8 @@ if voice_mode:
         st.sidebar.info("Recorder component not available. Use file upload below.")
 
     if audio_bytes:
-        ts = datetime.now().strftime("%Y%m%d_%H%M%S")
-        wav_path = (MIC_DIR / f"mic_{ts}.wav").resolve()
-        wav_path.write_bytes(audio_bytes)
+        # Stored once per distinct clip; MIC_DIR is pruned by age and size
+        save_recording(audio_bytes)
 
         try:
             text = transcribe_bytes(audio_bytes, filename="mic.wav", language="en")
@@ -170,95 +234,97 @@ elif typed_now:
     user_query = typed_now
 
 if user_query:
-    with st.chat_message("user"):
-        st.markdown(user_query)
-    st.session_state["messages"].append({"role": "user", "content": user_query})
-
-    # Moderation guard
-    mod = check_message(user_query)
-    if mod.flagged:
-        polite = "I can’t process messages that include offensive language. Please rephrase your request."
-        with st.chat_message("assistant"):
-            st.warning(polite)
-        st.session_state["messages"].append({"role": "assistant", "content": polite})
-
-        # Surface minimal debug info
-        with st.expander("🔎 Debug: moderation"):
-            st.markdown(f"**Provider**: {mod.provider}")
-            if mod.categories:
-                st.markdown(f"**Categories**: {', '.join(mod.categories)}")
-            if mod.error:
-                st.markdown(f"**Fallback reason**: {mod.error}")
-        # Stop before retrieval/LLM work
-        st.stop()
-
-    # Retrieval: top-1 only
-    retr = BooksRetriever()
-    items = retr.search(user_query, top_k=RETRIEVER_TOP_K)
-
-    # If no items found, show a warning
-    if not items:
-        msg = "I couldn't find a good match. Could you rephrase your request?"
-        with st.chat_message("assistant"):
-            st.warning(msg)
-        st.session_state["messages"].append({"role": "assistant", "content": msg})
-        st.session_state["last_debug"] = None
-        st.stop()
-
-    best = items[0]
-    title = best["title"]
-    doc = best["document"]
-
-    # Build messages and write the recommendation (short, EN, no CTA)
-    messages = make_recommendation_messages(
-        user_query=user_query,
-        title=title,
-        retrieved_document=doc
-    )
-    reply = chat_once(messages)
-    with st.chat_message("assistant"):
-        st.markdown(reply)
-    
-    # Persist for reruns + history
-    st.session_state["last_rec_text"] = reply
-    st.session_state["messages"].append({"role": "assistant", "content": reply})
-
-    # Keep last title for tool call
-    st.session_state["last_title"] = title
-    st.session_state["last_item"] = best
-
-    # AUTO tool call for full summary
-    tool_res = call_summary_tool_via_openai(title)
-    with st.chat_message("assistant"):
-        if tool_res["ok"]:
-            full = tool_res["summary"]
-            st.markdown(f"**Detailed summary - _{tool_res['args_title']}_**")
-            st.write(full)
-
-            # Persist for reruns + history
-            st.session_state["last_summary_text"] = full
-            st.session_state["messages"].append({
-                "role": "assistant",
-                "content": f"**Detailed summary — _{tool_res['args_title']}_**\n\n{full}"
-            })
-        else:
-            st.warning(f"Summary not found for **{title}**.")
-            st.session_state["last_summary_text"] = None
+    # One trace per message: every stage below records a span on it
+    profile = st.session_state.get("profile_next", False)
+    with start_trace("request", profile=profile) as trace:
+        st.session_state["last_trace"] = trace  # kept even if a branch below calls st.stop()
+        with st.chat_message("user"):
+            st.markdown(user_query)
+        st.session_state["messages"].append({"role": "user", "content": user_query})
+
+        # Moderation guard (runs alongside the query embedding)
+        pipeline = RecommendationPipeline()
+        result = pipeline.retrieve(user_query, top_k=RETRIEVER_TOP_K)
+        mod = result.moderation
+        if mod.flagged:
+            polite = "I can’t process messages that include offensive language. Please rephrase your request."
+            with st.chat_message("assistant"):
+                st.warning(polite)
+            st.session_state["messages"].append({"role": "assistant", "content": polite})
+
+            # Surface minimal debug info
+            with st.expander("🔎 Debug: moderation"):
+                st.markdown(f"**Provider**: {mod.provider}")
+                if mod.categories:
+                    st.markdown(f"**Categories**: {', '.join(mod.categories)}")
+                if mod.error:
+                    st.markdown(f"**Fallback reason**: {mod.error}")
+            # Stop before retrieval/LLM work
+            st.stop()
+
+        # Retrieval: top-1 only
+        items = result.items
+
+        # If no items found, show a warning
+        if not items:
+            msg = "I couldn't find a good match. Could you rephrase your request?"
+            with st.chat_message("assistant"):
+                st.warning(msg)
+            st.session_state["messages"].append({"role": "assistant", "content": msg})
             st.session_state["last_debug"] = None
+            st.stop()
+
+        best = items[0]
+        title = best["title"]
+        doc = best["document"]
 
-    # Persist debug for later reruns
-    st.session_state["last_debug"] = {
-        "top_title": title,
-        "top_doc": doc,
-        "candidates": [
-            {
-                "rank": i + 1,
-                "title": it.get("title", ""),
-                "distance": it.get("distance"),
-            }
-            for i, it in enumerate(items)
-        ],
-    }
+        # Stream the recommendation (short, EN, no CTA) while the full summary is fetched
+        with st.chat_message("assistant"):
+            st.write_stream(pipeline.recommend_stream(result))
+        reply = result.reply
+
+        # Persist for reruns + history
+        st.session_state["last_rec_text"] = reply
+        st.session_state["messages"].append({"role": "assistant", "content": reply})
+
+        # Keep last title for tool call
+        st.session_state["last_title"] = title
+        st.session_state["last_item"] = best
+
+        # AUTO tool call for full summary
+        tool_res = result.summary
+        with st.chat_message("assistant"):
+            if tool_res["ok"]:
+                full = tool_res["summary"]
+                st.markdown(f"**Detailed summary - _{tool_res['args_title']}_**")
+                st.write(full)
+
+                # Persist for reruns + history
+                st.session_state["last_summary_text"] = full
+                st.session_state["messages"].append({
+                    "role": "assistant",
+                    "content": f"**Detailed summary — _{tool_res['args_title']}_**\n\n{full}"
+                })
+            else:
+                st.warning(f"Summary not found for **{title}**.")
+                st.session_state["last_summary_text"] = None
+                st.session_state["last_debug"] = None
+
+        # Persist debug for later reruns
+        st.session_state["last_debug"] = {
+            "top_title": title,
+            "top_doc": doc,
+            "timings": dict(result.timings),
+            "reply_cached": result.reply_cached,
+            "candidates": [
+                {
+                    "rank": i + 1,
+                    "title": it.get("title", ""),
+                    "distance": it.get("distance"),
+                }
+                for i, it in enumerate(items)
+            ],
+        }
 
 
 # Show debug info and audio playback only if there are messages
@@ -279,6 +345,50 @@ if st.session_state["messages"] != []:
             st.markdown("**Short summary of top-1 used for LLM:**")
             st.code(dbg["top_doc"])
 
+            timings = dbg.get("timings") or {}
+            if "chat_ttft" in timings:
+                st.caption(
+                    f"Recommendation: first token after {timings['chat_ttft']:.2f}s, "
+                    f"complete after {timings.get('chat', 0.0):.2f}s"
+                )
+
+            sem = get_semantic_cache().stats()
+            st.caption(
+                f"Recommendation {'reused from' if dbg.get('reply_cached') else 'added to'} the semantic cache "
+                f"(hit rate {sem['hit_rate']:.0%}, {sem['entries']} entries)"
+            )
+
+            cache = embed_cache_stats()
+            if cache:
+                st.caption(
+                    f"Embedding cache: {cache['hits']} hits / {cache['misses']} misses "
+                    f"({cache['hit_rate']:.0%}), {cache['entries']} entries"
+                )
+
+            mstats = moderation_stats()
+            if mstats["checks"]:
+                st.caption(
+                    f"Moderation: {mstats['short_circuit_rate']:.0%} blocked locally, "
+                    f"{mstats['cache_hit_rate']:.0%} cached, {mstats['api_calls']} API calls "
+                    f"for {mstats['checks']} checks"
+                )
+
+            astats = get_audio_cache().stats()
+            if astats["hits"] or astats["misses"]:
+                st.caption(
+                    f"Audio cache: {astats['hits']} hits / {astats['misses']} misses, "
+                    f"{astats['entries']} files, {astats['bytes'] / 1e6:.1f} of {astats['max_bytes'] / 1e6:.0f} MB"
+                )
+
+    trace = st.session_state.get("last_trace")
+    if trace is not None:
+        with st.expander("⏱️ Debug: stage timings", expanded=False):
+            st.markdown(stage_timings_markdown(trace.spans, latency_summary()))
+            st.caption(f"Request total: {trace.duration * 1000:.0f} ms")
+            if trace.profile:
+                st.markdown("**cProfile (top functions by cumulative time):**")
+                st.code(trace.profile)
+
 
     # Audio playback for TTS
     with st.expander("🔊 Audio (Text-to-Speech)", expanded=False):
@@ -291,9 +401,7 @@ if st.session_state["messages"] != []:
             clicked = st.button("🔊 Listen to recommendation", disabled=not rec_text, key="btn_tts_rec")
             if clicked and rec_text:
                 try:
-                    p = synthesize_to_file(rec_text, voice=st.session_state.get("tts_voice", TTS_VOICE))
-                    st.audio(str(p))
-                    st.caption(f"Saved to {p}")
+                    play_tts(rec_text)
                 except Exception as e:
                     st.warning(f"TTS failed: {e}")
 
@@ -301,8 +409,6 @@ if st.session_state["messages"] != []:
             clicked = st.button("🔊 Listen to summary", disabled=not sum_text, key="btn_tts_sum")
             if clicked and sum_text:
                 try:
-                    p = synthesize_to_file(sum_text, voice=st.session_state.get("tts_voice", TTS_VOICE))
-                    st.audio(str(p))
-                    st.caption(f"Saved to {p}")
+                    play_tts(sum_text)
                 except Exception as e:
                     st.warning(f"TTS failed: {e}")
\ No newline at end of file
@@ -5,6 +5,13 @@ import os
 # Load .env once
 load_dotenv()
 
+
+def _to_bool(s: str | None, default: bool = True) -> bool:
+    if s is None:
+        return default
+    return s.strip().lower() in {"1", "true", "yes", "y", "on"}
+
+
 # Paths
 PROJECT_ROOT = Path(__file__).resolve().parents[1]
 DATA_DIR = PROJECT_ROOT / "data"
@@ -13,6 +20,32 @@ DATA_DIR = PROJECT_ROOT / "data"
 OPENAI_CHAT_MODEL = os.getenv("OPENAI_CHAT_MODEL", "gpt-4o-mini")
 OPENAI_EMBED_MODEL = os.getenv("OPENAI_EMBED_MODEL", "text-embedding-3-small")
 
+# Shared OpenAI client: one keep-alive connection pool for every module
+OPENAI_MAX_RETRIES = int(os.getenv("OPENAI_MAX_RETRIES", "3"))  # SDK retries, exponential backoff with jitter
+OPENAI_MAX_CONNECTIONS = int(os.getenv("OPENAI_MAX_CONNECTIONS", "50"))
+OPENAI_MAX_KEEPALIVE = int(os.getenv("OPENAI_MAX_KEEPALIVE", "20"))
+OPENAI_KEEPALIVE_EXPIRY = float(os.getenv("OPENAI_KEEPALIVE_EXPIRY", "60"))  # seconds an idle connection is kept
+OPENAI_CONNECT_TIMEOUT = float(os.getenv("OPENAI_CONNECT_TIMEOUT", "5"))
+
+# Per-operation request timeouts (seconds)
+OPENAI_TIMEOUT_EMBED = float(os.getenv("OPENAI_TIMEOUT_EMBED", "20"))
+OPENAI_TIMEOUT_CHAT = float(os.getenv("OPENAI_TIMEOUT_CHAT", "60"))
+OPENAI_TIMEOUT_MODERATION = float(os.getenv("OPENAI_TIMEOUT_MODERATION", "10"))
+OPENAI_TIMEOUT_TTS = float(os.getenv("OPENAI_TIMEOUT_TTS", "120"))
+OPENAI_TIMEOUT_STT = float(os.getenv("OPENAI_TIMEOUT_STT", "120"))
+
+# Embedding cache (shared by ingest and retrieval)
+EMBED_CACHE_PATH = Path(os.getenv("EMBED_CACHE_PATH", DATA_DIR / "embed_cache.sqlite3"))
+EMBED_CACHE_ENABLED = _to_bool(os.getenv("EMBED_CACHE_ENABLED"), True)
+EMBED_CACHE_MAX_ENTRIES = int(os.getenv("EMBED_CACHE_MAX_ENTRIES", "100000"))
+
+# Batch embedding (ingest)
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", "256"))  # inputs per request
+EMBED_MAX_CONCURRENCY = int(os.getenv("EMBED_MAX_CONCURRENCY", "4"))  # requests in flight
+INGEST_BATCH_SIZE = int(os.getenv("INGEST_BATCH_SIZE", "512"))  # records embedded + written per flush
+INGEST_CHECKPOINT_PATH = Path(os.getenv("INGEST_CHECKPOINT_PATH", DATA_DIR / "ingest.checkpoint.json"))
+EMBED_MAX_RETRIES = int(os.getenv("EMBED_MAX_RETRIES", "6"))
+
 # ChromaDB
 CHROMADB_PATH = Path(os.getenv("CHROMADB_PATH", DATA_DIR / "chroma_store"))
 CHROMA_COLLECTION = os.getenv("CHROMA_COLLECTION", "books")
@@ -21,25 +54,58 @@ CHROMA_COLLECTION = os.getenv("CHROMA_COLLECTION", "books")
 BOOK_SUMMARIES_PATH = Path(
     os.getenv("BOOK_SUMMARIES_PATH", DATA_DIR / "book_summaries.json")
 )
+# Indexed summaries database built from BOOK_SUMMARIES_PATH; bodies are read lazily behind an LRU
+SUMMARIES_DB_PATH = Path(os.getenv("SUMMARIES_DB_PATH", DATA_DIR / "summaries.sqlite3"))
+SUMMARIES_CACHE_SIZE = int(os.getenv("SUMMARIES_CACHE_SIZE", "256"))
+
+# Summary tool: resolve titles locally; the forced LLM tool call is opt-in
+SUMMARY_LLM_FALLBACK = _to_bool(os.getenv("SUMMARY_LLM_FALLBACK"), False)
+SUMMARY_FUZZY_MIN_SCORE = float(os.getenv("SUMMARY_FUZZY_MIN_SCORE", "0.85"))
 
 # Retriever config
 RETRIEVER_TOP_K = int(os.getenv("RETRIEVER_TOP_K", "5"))  # per your choice
+RETRIEVER_BACKEND = os.getenv("RETRIEVER_BACKEND", "chroma").lower()  # "chroma" | "numpy"
+NUMPY_INDEX_PATH = Path(os.getenv("NUMPY_INDEX_PATH", DATA_DIR / "numpy_index"))
 
+# Lexical (BM25) index: title short-circuit + fusion with vector results
+LEXICAL_ENABLED = _to_bool(os.getenv("LEXICAL_ENABLED"), True)
+LEXICAL_INDEX_PATH = Path(os.getenv("LEXICAL_INDEX_PATH", DATA_DIR / "lexical_index.json"))
 
-# Moderation
-def _to_bool(s: str | None, default: bool = True) -> bool:
-    if s is None:
-        return default
-    return s.strip().lower() in {"1", "true", "yes", "y", "on"}
+# Semantic cache for recommendation replies (paraphrased queries, same title)
+SEMANTIC_CACHE_ENABLED = _to_bool(os.getenv("SEMANTIC_CACHE_ENABLED"), True)
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.95"))  # cosine similarity
+SEMANTIC_CACHE_TTL_SECONDS = float(os.getenv("SEMANTIC_CACHE_TTL_SECONDS", "86400"))
+SEMANTIC_CACHE_MAX_ENTRIES = int(os.getenv("SEMANTIC_CACHE_MAX_ENTRIES", "5000"))
+
+# Request pipeline (threads shared by all sessions)
+PIPELINE_MAX_WORKERS = int(os.getenv("PIPELINE_MAX_WORKERS", "8"))
 
+# Tracing: per-stage spans, rolling percentiles, optional JSONL export
+TRACE_ENABLED = _to_bool(os.getenv("TRACE_ENABLED"), True)
+TRACE_WINDOW = int(os.getenv("TRACE_WINDOW", "500"))  # spans kept per stage for p50/p95/p99
+TRACE_EXPORT_PATH = Path(os.environ["TRACE_EXPORT_PATH"]) if os.getenv("TRACE_EXPORT_PATH") else None
 
+
+# Moderation
 MODERATION_ENABLED = _to_bool(os.getenv("MODERATION_ENABLED"), True)
 MODERATION_PROVIDER = os.getenv("MODERATION_PROVIDER", "openai").lower()
+MODERATION_CACHE_TTL_SECONDS = float(os.getenv("MODERATION_CACHE_TTL_SECONDS", "3600"))
+MODERATION_CACHE_MAX_ENTRIES = int(os.getenv("MODERATION_CACHE_MAX_ENTRIES", "10000"))
+MODERATION_BATCH_SIZE = int(os.getenv("MODERATION_BATCH_SIZE", "32"))  # inputs per API request
+# Local blocklist: one <lang>.txt per language, reloaded when the files change
+MODERATION_BLOCKLIST_DIR = Path(os.getenv("MODERATION_BLOCKLIST_DIR", PROJECT_ROOT / "app" / "guards" / "blocklists"))
+MODERATION_BLOCKLIST_LANGS = [
+    l.strip().lower() for l in os.getenv("MODERATION_BLOCKLIST_LANGS", "").split(",") if l.strip()
+]  # empty = every file in the directory
+MODERATION_BLOCKLIST_RELOAD_SECONDS = float(os.getenv("MODERATION_BLOCKLIST_RELOAD_SECONDS", "5"))
 
 # Text-to-speech
 TTS_MODEL = os.getenv("OPENAI_TTS_MODEL", "gpt-4o-mini-tts")
 TTS_VOICE = os.getenv("OPENAI_TTS_VOICE", "alloy")
 TTS_FORMAT = os.getenv("OPENAI_TTS_FORMAT", "mp3")
+TTS_CHUNK_CHARS = int(os.getenv("TTS_CHUNK_CHARS", "600"))  # sentences are packed up to this size
+TTS_FIRST_CHUNK_CHARS = int(os.getenv("TTS_FIRST_CHUNK_CHARS", "200"))  # short head chunk: audio starts sooner
+TTS_MAX_CONCURRENCY = int(os.getenv("TTS_MAX_CONCURRENCY", "4"))  # chunk requests in flight
 
 # List for sidebar dropdown
 TTS_VOICE_CHOICES = [
@@ -49,12 +115,24 @@ TTS_VOICE_CHOICES = [
 ]
 
 # Where we cache the generated audio files
-AUDIO_DIR = DATA_DIR / "audio"
-AUDIO_DIR.mkdir(parents=True, exist_ok=True)
+AUDIO_DIR = Path(os.getenv("AUDIO_DIR", DATA_DIR / "audio"))
+AUDIO_CACHE_MAX_BYTES = int(os.getenv("AUDIO_CACHE_MAX_BYTES", str(500 * 1024 * 1024)))  # LRU budget for AUDIO_DIR
 
 # Speech-to-text
 STT_MODEL = os.getenv("OPENAI_STT_MODEL", "whisper-1")
+# Long WAV recordings are split at silences and the segments transcribed in parallel
+STT_CHUNKING_ENABLED = _to_bool(os.getenv("STT_CHUNKING_ENABLED"), True)
+STT_SEGMENT_SECONDS = float(os.getenv("STT_SEGMENT_SECONDS", "30"))  # target (max) segment length
+STT_SEGMENT_OVERLAP_SECONDS = float(os.getenv("STT_SEGMENT_OVERLAP_SECONDS", "1.0"))  # only when a cut falls inside speech
+STT_MAX_CONCURRENCY = int(os.getenv("STT_MAX_CONCURRENCY", "4"))  # segment requests in flight
+# WAV uploads are trimmed/downmixed/resampled first; transcripts are cached by audio hash
+STT_COMPACT_AUDIO = _to_bool(os.getenv("STT_COMPACT_AUDIO"), True)
+STT_UPLOAD_SAMPLE_RATE = int(os.getenv("STT_UPLOAD_SAMPLE_RATE", "16000"))
+STT_CACHE_ENABLED = _to_bool(os.getenv("STT_CACHE_ENABLED"), True)
+STT_CACHE_PATH = Path(os.getenv("STT_CACHE_PATH", DATA_DIR / "stt_cache.sqlite3"))
+STT_CACHE_MAX_ENTRIES = int(os.getenv("STT_CACHE_MAX_ENTRIES", "5000"))
 
 # Where we save microphone recordings (for debugging)
-MIC_DIR = DATA_DIR / "mic"
-MIC_DIR.mkdir(parents=True, exist_ok=True)
+MIC_DIR = Path(os.getenv("MIC_DIR", DATA_DIR / "mic"))
+MIC_RETENTION_DAYS = float(os.getenv("MIC_RETENTION_DAYS", "7"))  # 0 = keep regardless of age
+MIC_MAX_BYTES = int(os.getenv("MIC_MAX_BYTES", str(100 * 1024 * 1024)))  # oldest recordings go first
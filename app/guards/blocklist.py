@@ -0,0 +1,192 @@
+"""
+Data-driven local blocklist.
+
+Terms are loaded from one text file per language (`<lang>.txt` in
+MODERATION_BLOCKLIST_DIR, one word or phrase per line) and compiled into a
+single Aho-Corasick automaton, so a scan costs one pass over the text no matter
+how many terms there are. Text and terms go through the same normalization:
+case folding, diacritics removal and leetspeak mapping ("Sh1t" == "$hit" ==
+"shit"), with every run of characters other than letters (of any script) and
+digits acting as a word break. The automaton's alphabet is whole words rather
+than characters: terms only ever match whole words, and a scan takes one step
+per word. get_blocklist() reloads the files when they change on disk.
+"""
+from __future__ import annotations
+import logging
+import re
+import threading
+import time
+import unicodedata
+from collections import deque
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from app.config import MODERATION_BLOCKLIST_DIR, MODERATION_BLOCKLIST_LANGS, MODERATION_BLOCKLIST_RELOAD_SECONDS
+
+_LEET = str.maketrans({"0": "o", "1": "i", "3": "e", "4": "a", "5": "s", "7": "t", "@": "a", "$": "s", "!": "i"})
+# Unicode letters and digits; everything else (underscore included) is a word break
+_WORD_RE = re.compile(r"[^\W_]+")
+# Words containing a digit or symbol (the only ones that may need leet mapping);
+# anchored at word starts and possessive so plain words cost no backtracking
+_LEET_WORD_RE = re.compile(r"(?<![\w@$!])[^\W\d_]*+[\d@$!][\w@$!]*+")
+_LETTER_RE = re.compile(r"[^\W\d_]")
+
+log = logging.getLogger(__name__)
+
+
+def _unleet(m: re.Match) -> str:
+    word = m.group(0).strip("!")  # "wow!" is punctuation, "sh!t" is leetspeak, "$hit" and "@ss" too
+    # "h3ll0" is leetspeak, "2024" is a number
+    return word.translate(_LEET) if _LETTER_RE.search(word) else word
+
+
+def normalize_for_matching(text: str) -> str:
+    """
+    Casefold, strip diacritics, map leetspeak inside words that contain letters,
+    and separate words by single spaces. Letters of any script count as words.
+    """
+    text = (text or "").casefold()
+    if not text.isascii():
+        text = unicodedata.normalize("NFKD", text)
+        text = "".join(ch for ch in text if not unicodedata.combining(ch))
+    text = _LEET_WORD_RE.sub(_unleet, text)
+    return " ".join(_WORD_RE.findall(text))
+
+
+@dataclass(frozen=True)
+class BlocklistMatch:
+    term: str  # normalized term
+    lang: str
+    start: int  # word offsets in the normalized text
+    end: int
+
+
+class Blocklist:
+    """Aho-Corasick automaton over normalized terms, one transition per word."""
+
+    def __init__(self, terms: Iterable[Tuple[str, str]] = ()):
+        # goto[state] maps a word to the next state; out[state] lists term ids ending there
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._out: List[List[int]] = [[]]
+        self._terms: List[Tuple[str, str, int]] = []  # (normalized term, lang, words)
+        seen = set()
+        for term, lang in terms:
+            words = normalize_for_matching(term).split()
+            norm = " ".join(words)
+            if not norm:
+                log.warning("Skipping blocklist term %r (%s): no letters or digits to match", term, lang)
+                continue
+            if norm not in seen:
+                seen.add(norm)
+                self._add(words, len(self._terms))
+                self._terms.append((norm, lang, len(words)))
+        self._build()
+
+    def __len__(self) -> int:
+        return len(self._terms)
+
+    @classmethod
+    def from_dir(cls, path: Path, langs: Optional[Iterable[str]] = None) -> "Blocklist":
+        """Load `<lang>.txt` files; `langs` restricts which languages are used."""
+        wanted = {l.lower() for l in langs} if langs else None
+        terms: List[Tuple[str, str]] = []
+        for f in sorted(Path(path).glob("*.txt")):
+            lang = f.stem.lower()
+            if wanted is not None and lang not in wanted:
+                continue
+            for line in f.read_text(encoding="utf-8").splitlines():
+                line = line.split("#", 1)[0].strip()
+                if line:
+                    terms.append((line, lang))
+        return cls(terms)
+
+    def _add(self, words: List[str], term_id: int) -> None:
+        state = 0
+        for w in words:
+            nxt = self._goto[state].get(w)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[state][w] = nxt
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append([])
+            state = nxt
+        self._out[state].append(term_id)
+
+    def _build(self) -> None:
+        # Breadth-first: a state's failure link points at its longest proper suffix in the trie
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for w, nxt in self._goto[state].items():
+                queue.append(nxt)
+                f = self._fail[state]
+                while f and w not in self._goto[f]:
+                    f = self._fail[f]
+                self._fail[nxt] = self._goto[f].get(w, 0)
+                self._out[nxt] = self._out[nxt] + self._out[self._fail[nxt]]
+
+    def _scan(self, words: List[str], first_only: bool) -> List[BlocklistMatch]:
+        goto, fail, out = self._goto, self._fail, self._out
+        root = goto[0]
+        found: List[BlocklistMatch] = []
+        state = 0
+        for i, w in enumerate(words):
+            while state and w not in goto[state]:
+                state = fail[state]
+            state = (goto[state] if state else root).get(w, 0)
+            if out[state]:
+                for tid in out[state]:
+                    term, lang, n = self._terms[tid]
+                    found.append(BlocklistMatch(term, lang, i + 1 - n, i + 1))
+                    if first_only:
+                        return found
+        return found
+
+    def find_all(self, text: str) -> List[BlocklistMatch]:
+        return self._scan(normalize_for_matching(text).split(), first_only=False)
+
+    def search(self, text: str) -> Optional[BlocklistMatch]:
+        """First match, or None."""
+        found = self._scan(normalize_for_matching(text).split(), first_only=True)
+        return found[0] if found else None
+
+
+def _dir_signature(path: Path) -> tuple:
+    try:
+        return tuple(sorted((f.name, f.stat().st_mtime_ns, f.stat().st_size) for f in Path(path).glob("*.txt")))
+    except OSError:
+        return ()
+
+
+_blocklist: Optional[Blocklist] = None
+_signature: Optional[tuple] = None
+_checked = 0.0
+_lock = threading.Lock()
+
+
+def get_blocklist() -> Blocklist:
+    """
+    Process-wide blocklist. The directory is re-checked at most every
+    MODERATION_BLOCKLIST_RELOAD_SECONDS and recompiled when a file changed.
+    If a reload fails, the last good blocklist stays in use (empty if none
+    loaded yet) and the load is retried after the next interval.
+    """
+    global _blocklist, _signature, _checked
+    now = time.monotonic()
+    with _lock:
+        if _blocklist is not None and now - _checked < MODERATION_BLOCKLIST_RELOAD_SECONDS:
+            return _blocklist
+        _checked = now
+        sig = _dir_signature(MODERATION_BLOCKLIST_DIR)
+        if _blocklist is None or sig != _signature:
+            try:
+                _blocklist = Blocklist.from_dir(MODERATION_BLOCKLIST_DIR, MODERATION_BLOCKLIST_LANGS or None)
+                _signature = sig
+            except (OSError, ValueError) as e:  # UnicodeDecodeError is a ValueError
+                log.warning("Could not reload the blocklist from %s: %s", MODERATION_BLOCKLIST_DIR, e)
+                if _blocklist is None:
+                    _blocklist = Blocklist()
+        return _blocklist
@@ -1,10 +1,22 @@
 from __future__ import annotations
-import re
-from dataclasses import dataclass
-from typing import Optional, Dict, Any
-from openai import OpenAI
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, replace
+from typing import Optional, Dict, Any, List, Tuple
 
-from app.config import MODERATION_ENABLED, MODERATION_PROVIDER
+from app.config import (
+    MODERATION_ENABLED,
+    MODERATION_PROVIDER,
+    MODERATION_CACHE_TTL_SECONDS,
+    MODERATION_CACHE_MAX_ENTRIES,
+    MODERATION_BATCH_SIZE,
+)
+from app.guards.blocklist import get_blocklist
+from app.llm.embed_cache import normalize_text
+from app.llm.openai_client import get_client
+from app.tracing import span
 
 
 @dataclass
@@ -14,57 +26,166 @@ class ModerationResult:
     provider: str
     categories: list[str]
     error: Optional[str] = None
-
-# Small local fallback (expand as you like)
-_BLOCK_RE = re.compile(
-    r"\b("
-    r"fuck|shit|bitch|asshole|idiot|moron|"        # EN basics
-    r"pula|dracu|fut|jigodie|nesimtit|prost"       # RO basics (mild+)
-    r")\b",
-    flags=re.IGNORECASE,
-)
+    cached: bool = False  # verdict reused from the moderation cache
 
 
 def _local_moderate(text: str) -> ModerationResult:
-    if _BLOCK_RE.search(text or ""):
+    # Blocklist files live in MODERATION_BLOCKLIST_DIR (see app/guards/blocklist.py)
+    if get_blocklist().search(text or "") is not None:
         return ModerationResult(allowed=False, flagged=True, provider="local", categories=["blocklist"])
     return ModerationResult(allowed=True, flagged=False, provider="local", categories=[])
 
 
-# OpenAI moderation API
+# OpenAI moderation API (one request for many inputs)
+def _openai_moderate_many(texts: List[str]) -> List[ModerationResult]:
+    resp = get_client("moderation").moderations.create(model="omni-moderation-latest", input=texts)
+    out = []
+    for r in resp.results:
+        cats = [k for k, v in r.categories.__dict__.items() if v]  # flagged categories
+        out.append(ModerationResult(allowed=not r.flagged, flagged=bool(r.flagged), provider="openai", categories=cats))
+    return out
+
+
 def _openai_moderate(text: str) -> ModerationResult:
-    client = OpenAI()
-    resp = client.moderations.create(model="omni-moderation-latest", input=text)
-    out = resp.results[0]
-    cats = [k for k, v in out.categories.__dict__.items() if v]  # flagged categories
-    return ModerationResult(
-        allowed=not out.flagged,
-        flagged=bool(out.flagged),
-        provider="openai",
-        categories=cats,
-    )
+    return _openai_moderate_many([text])[0]
+
+
+def moderation_key(text: str) -> str:
+    # Case and whitespace don't change a verdict
+    return hashlib.sha256(normalize_text(text).casefold().encode("utf-8")).hexdigest()
+
+
+class ModerationCache:
+    """
+    TTL + LRU cache of API verdicts keyed by normalized-text hash.
+    Also keeps the counters behind moderation_stats().
+    """
+
+    def __init__(self, ttl_seconds: float | None = None, max_entries: int | None = None):
+        self.ttl_seconds = MODERATION_CACHE_TTL_SECONDS if ttl_seconds is None else ttl_seconds
+        self.max_entries = max_entries or MODERATION_CACHE_MAX_ENTRIES
+        self._entries: "OrderedDict[str, Tuple[float, ModerationResult]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.checks = 0
+        self.local_blocks = 0  # answered by the blocklist, API skipped
+        self.hits = 0
+        self.api_calls = 0
+        self.api_inputs = 0
+        self.errors = 0
+
+    def get(self, key: str) -> Optional[ModerationResult]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            created, res = entry
+            if time.time() - created > self.ttl_seconds:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return replace(res, cached=True)
+
+    def put(self, key: str, res: ModerationResult) -> None:
+        with self._lock:
+            self._entries[key] = (time.time(), replace(res))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def count(self, **deltas: int) -> None:
+        with self._lock:
+            for name, n in deltas.items():
+                setattr(self, name, getattr(self, name) + n)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            checks = self.checks
+            return {
+                "checks": checks,
+                "local_blocks": self.local_blocks,
+                "cache_hits": self.hits,
+                "api_calls": self.api_calls,
+                "api_inputs": self.api_inputs,
+                "errors": self.errors,
+                "short_circuit_rate": self.local_blocks / checks if checks else 0.0,
+                "cache_hit_rate": self.hits / checks if checks else 0.0,
+                "entries": len(self._entries),
+            }
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+_cache = ModerationCache()
+
+
+def get_moderation_cache() -> ModerationCache:
+    return _cache
+
+
+def moderation_stats() -> Dict[str, Any]:
+    """Counters and rates: local short-circuits, cache hits, API calls."""
+    return _cache.stats()
 
 
 def check_message(text: str) -> ModerationResult:
     """Main entrypoint used by the UI."""
+    with span("moderation") as s:
+        res = check_messages([text])[0]
+        s.set(provider=res.provider, flagged=res.flagged, cached=res.cached)
+    return res
+
+
+def check_messages(texts: List[str]) -> List[ModerationResult]:
+    """
+    Moderate many texts, returning one result per input in order.
+    Local blocklist first (blocked texts never reach the API), then the verdict
+    cache; the remaining distinct texts go to the API in batched requests.
+    """
     if not MODERATION_ENABLED:
-        return ModerationResult(True, False, provider="disabled", categories=[])
-
-    # If user forces local-only moderation
-    if MODERATION_PROVIDER == "local":
-        return _local_moderate(text)
-
-    # Default: openai primary + local overlay
-    try:
-        o = _openai_moderate(text)
-    except Exception as e:
-        fb = _local_moderate(text)
-        fb.error = f"openai_moderation_error: {e.__class__.__name__}"
-        return fb
-
-    l = _local_moderate(text)
-    if o.flagged or l.flagged:
-        cats = list(set(o.categories + l.categories + (["blocklist"] if l.flagged else [])))
-        return ModerationResult(allowed=False, flagged=True, provider="openai+local", categories=cats)
-
-    return o
+        return [ModerationResult(True, False, provider="disabled", categories=[]) for _ in texts]
+
+    results: List[Optional[ModerationResult]] = [None] * len(texts)
+    pending: Dict[str, List[int]] = {}  # cache key -> positions
+    firsts: Dict[str, str] = {}  # cache key -> text sent to the API
+    _cache.count(checks=len(texts))
+    for i, text in enumerate(texts):
+        local = _local_moderate(text)
+        # If user forces local-only moderation, or the blocklist already rejects it
+        if local.flagged or MODERATION_PROVIDER == "local":
+            results[i] = local
+            if local.flagged:
+                _cache.count(local_blocks=1)
+            continue
+        key = moderation_key(text)
+        cached = _cache.get(key)
+        if cached is not None:
+            results[i] = cached
+            continue
+        pending.setdefault(key, []).append(i)
+        firsts.setdefault(key, text)
+
+    keys = list(pending)
+    for start in range(0, len(keys), MODERATION_BATCH_SIZE):
+        batch = keys[start : start + MODERATION_BATCH_SIZE]
+        try:
+            verdicts = _openai_moderate_many([firsts[k] for k in batch])
+            _cache.count(api_calls=1, api_inputs=len(batch))
+        except Exception as e:
+            # Local verdict (clean, since blocked texts never get here); not cached
+            _cache.count(errors=1)
+            verdicts = [
+                replace(_local_moderate(firsts[k]), error=f"openai_moderation_error: {e.__class__.__name__}")
+                for k in batch
+            ]
+        else:
+            for k, v in zip(batch, verdicts):
+                if v.flagged:
+                    v.provider = "openai+local"
+                _cache.put(k, v)
+        for k, v in zip(batch, verdicts):
+            for i in pending[k]:
+                results[i] = replace(v)
+    return results
@@ -0,0 +1,62 @@
+"""
+Disk-backed, content-addressed cache for embedding vectors.
+
+Entries are keyed by (model, normalized text hash) and stored as float32 blobs
+in a small SQLite file (app/sqlite_lru.py), so ingest runs and repeated user
+queries share them. When the cache grows past `max_entries`, the least
+recently used rows are evicted.
+"""
+from __future__ import annotations
+import hashlib
+from array import array
+from pathlib import Path
+from typing import List, Optional
+
+from app.config import EMBED_CACHE_PATH, EMBED_CACHE_MAX_ENTRIES
+from app.sqlite_lru import SqliteLRU
+
+
+def normalize_text(text: str) -> str:
+    # collapse whitespace so trivially different inputs share an entry
+    return " ".join((text or "").split())
+
+
+def make_embed_key(text: str, model: str) -> str:
+    payload = f"{model}\x00{normalize_text(text)}"
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    def __init__(self, path: Path | None = None, max_entries: int | None = None):
+        self.path = Path(path or EMBED_CACHE_PATH)
+        self.max_entries = max_entries or EMBED_CACHE_MAX_ENTRIES
+        self._store = SqliteLRU(
+            self.path,
+            "embeddings",
+            self.max_entries,
+            value_column="vec",
+            encode=lambda vec: array("f", vec).tobytes(),
+            decode=lambda blob: array("f", blob).tolist(),
+            extra_columns=[("model", "TEXT NOT NULL")],
+        )
+
+    def get(self, text: str, model: str) -> Optional[List[float]]:
+        return self._store.get(make_embed_key(text, model))
+
+    def put(self, text: str, model: str, vec: List[float]) -> None:
+        self._store.put(make_embed_key(text, model), vec, model=model)
+
+    def get_many(self, texts: List[str], model: str) -> List[Optional[List[float]]]:
+        """Batch lookup; returns one vector (or None) per input, in order."""
+        keys = [make_embed_key(t, model) for t in texts]
+        found = self._store.get_many(keys)
+        return [found.get(k) for k in keys]
+
+    def put_many(self, texts: List[str], model: str, vecs: List[List[float]]) -> None:
+        self._store.put_many(((make_embed_key(t, model), v) for t, v in zip(texts, vecs)), model=model)
+
+    def clear(self) -> None:
+        self._store.clear()
+
+    def stats(self) -> dict:
+        return self._store.stats()
@@ -1,26 +1,357 @@
-from typing import List
-from openai import OpenAI
+"""
+Shared OpenAI access for the whole app.
 
-from app.config import OPENAI_EMBED_MODEL, OPENAI_CHAT_MODEL
+get_client(operation) / get_async_client(operation) hand out one process-wide
+client per flavour, built on a tuned keep-alive connection pool, so every module
+reuses the same TLS connections. Per-operation views only change the timeout
+and share the pool. The SDK retries transient errors (429, 5xx, connection
+errors) with jittered exponential backoff. Tests and offline benchmarks swap in
+a stand-in with set_client_factory(). The openai SDK itself (the bulk of this
+module's import cost) is imported when the first client is built.
+"""
+from __future__ import annotations
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import TYPE_CHECKING, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from app.config import (
+    OPENAI_EMBED_MODEL,
+    OPENAI_CHAT_MODEL,
+    OPENAI_MAX_RETRIES,
+    OPENAI_MAX_CONNECTIONS,
+    OPENAI_MAX_KEEPALIVE,
+    OPENAI_KEEPALIVE_EXPIRY,
+    OPENAI_CONNECT_TIMEOUT,
+    OPENAI_TIMEOUT_EMBED,
+    OPENAI_TIMEOUT_CHAT,
+    OPENAI_TIMEOUT_MODERATION,
+    OPENAI_TIMEOUT_TTS,
+    OPENAI_TIMEOUT_STT,
+    EMBED_CACHE_ENABLED,
+    EMBED_BATCH_SIZE,
+    EMBED_MAX_CONCURRENCY,
+    EMBED_MAX_RETRIES,
+)
+from app.llm.embed_cache import EmbeddingCache
+from app.tracing import span
+
+if TYPE_CHECKING:
+    import httpx
+    from openai import AsyncOpenAI, OpenAI
+
+# Request timeout per operation; the connect phase is capped separately
+OPERATION_TIMEOUTS: Dict[str, float] = {
+    "embeddings": OPENAI_TIMEOUT_EMBED,
+    "chat": OPENAI_TIMEOUT_CHAT,
+    "moderation": OPENAI_TIMEOUT_MODERATION,
+    "speech": OPENAI_TIMEOUT_TTS,
+    "transcription": OPENAI_TIMEOUT_STT,
+}
+
+
+def _limits() -> httpx.Limits:
+    import httpx
+
+    return httpx.Limits(
+        max_connections=OPENAI_MAX_CONNECTIONS,
+        max_keepalive_connections=OPENAI_MAX_KEEPALIVE,
+        keepalive_expiry=OPENAI_KEEPALIVE_EXPIRY,
+    )
+
+
+def _timeout(seconds: float) -> httpx.Timeout:
+    import httpx
+
+    return httpx.Timeout(seconds, connect=OPENAI_CONNECT_TIMEOUT)
+
+
+def default_client_factory() -> OpenAI:
+    from openai import DefaultHttpxClient, OpenAI
+
+    return OpenAI(
+        http_client=DefaultHttpxClient(limits=_limits(), timeout=_timeout(OPENAI_TIMEOUT_CHAT)),
+        max_retries=OPENAI_MAX_RETRIES,
+    )
+
+
+def default_async_client_factory() -> AsyncOpenAI:
+    from openai import AsyncOpenAI, DefaultAsyncHttpxClient
+
+    return AsyncOpenAI(
+        http_client=DefaultAsyncHttpxClient(limits=_limits(), timeout=_timeout(OPENAI_TIMEOUT_CHAT)),
+        max_retries=OPENAI_MAX_RETRIES,
+    )
+
+
+_client_factory: Callable[[], OpenAI] = default_client_factory
+_async_client_factory: Callable[[], AsyncOpenAI] = default_async_client_factory
+_client: Optional[OpenAI] = None
+_async_client: Optional[AsyncOpenAI] = None
+_views: Dict[Tuple[str, str], Tuple[object, object]] = {}  # (flavour, op) -> (base client, view)
+_embed_cache: Optional[EmbeddingCache] = None
+_init_lock = threading.Lock()
+
+
+def _view(flavour: str, base, operation: Optional[str]):
+    # with_options() copies the client but keeps its HTTP pool; cache one copy per operation
+    if operation is None:
+        return base
+    key = (flavour, operation)
+    cached = _views.get(key)
+    if cached is not None and cached[0] is base:
+        return cached[1]
+    view = base.with_options(timeout=_timeout(OPERATION_TIMEOUTS[operation]))
+    _views[key] = (base, view)
+    return view
+
+
+def get_client(operation: Optional[str] = None) -> OpenAI:
+    """
+    Returns the process-wide OpenAI client, built on first use so importing
+    this module doesn't require credentials. With `operation` (one of
+    OPERATION_TIMEOUTS) the client carries that operation's timeout.
+    """
+    global _client
+    with _init_lock:
+        if _client is None:
+            _client = _client_factory()
+        return _view("sync", _client, operation)
+
+
+def get_async_client(operation: Optional[str] = None) -> AsyncOpenAI:
+    """
+    Async counterpart of get_client(). Its pool belongs to the event loop that
+    first uses it, so share it only within one loop.
+    """
+    global _async_client
+    with _init_lock:
+        if _async_client is None:
+            _async_client = _async_client_factory()
+        return _view("async", _async_client, operation)
+
+
+def set_client_factory(
+    factory: Optional[Callable[[], OpenAI]] = None,
+    async_factory: Optional[Callable[[], AsyncOpenAI]] = None,
+) -> None:
+    """
+    Replace how the shared clients are built (e.g. a local stand-in in tests);
+    None restores the default. Existing clients are dropped.
+    """
+    global _client_factory, _async_client_factory, _client, _async_client
+    with _init_lock:
+        _client_factory = factory or default_client_factory
+        _async_client_factory = async_factory or default_async_client_factory
+        _client = None
+        _async_client = None
+        _views.clear()
+
+
+def get_embed_cache() -> Optional[EmbeddingCache]:
+    """
+    Returns the process-wide embedding cache (None when disabled).
+    """
+    global _embed_cache
+    with _init_lock:
+        if _embed_cache is None and EMBED_CACHE_ENABLED:
+            _embed_cache = EmbeddingCache()
+    return _embed_cache
 
-_client = OpenAI()
 
 def embed_text(text: str) -> List[float]:
     """
     Returns an embedding vector for the given text using OpenAI's embeddings API.
+    Vectors are served from the on-disk embedding cache when available.
     """
-    resp = _client.embeddings.create(model=OPENAI_EMBED_MODEL, input=text)
-    return resp.data[0].embedding
+    with span("embedding", cache_hit=False) as s:
+        cache = get_embed_cache()
+        if cache is not None:
+            vec = cache.get(text, OPENAI_EMBED_MODEL)
+            if vec is not None:
+                s.set(cache_hit=True)
+                return vec
+
+        resp = get_client("embeddings").embeddings.create(model=OPENAI_EMBED_MODEL, input=text)
+        s.set(**_usage(resp))
+        vec = resp.data[0].embedding
+        if cache is not None:
+            cache.put(text, OPENAI_EMBED_MODEL, vec)
+        return vec
+
+
+def _usage(resp) -> dict:
+    # Token counts for tracing; absent on some responses (and on stand-in clients)
+    usage = getattr(resp, "usage", None)
+    if usage is None:
+        return {}
+    return {
+        k: v
+        for k in ("prompt_tokens", "completion_tokens", "total_tokens")
+        if isinstance(v := getattr(usage, k, None), int)
+    }
+
+
+def _retry_after_seconds(err: Exception) -> Optional[float]:
+    # Honor the server's hint on 429s (Retry-After / retry-after-ms headers)
+    headers = getattr(getattr(err, "response", None), "headers", None) or {}
+    for name, scale in (("retry-after-ms", 0.001), ("retry-after", 1.0)):
+        value = headers.get(name)
+        if value:
+            try:
+                return float(value) * scale
+            except ValueError:
+                pass
+    return None
+
+
+def _with_backoff(fn: Callable, max_retries: int = EMBED_MAX_RETRIES):
+    """
+    Run fn(), retrying rate limits and transient failures with exponential backoff.
+    """
+    from openai import APIConnectionError, InternalServerError, RateLimitError
+
+    for attempt in range(max_retries + 1):
+        try:
+            return fn()
+        except (RateLimitError, APIConnectionError, InternalServerError) as e:
+            if attempt == max_retries:
+                raise
+            delay = _retry_after_seconds(e) or min(30.0, 0.5 * 2 ** attempt)
+            time.sleep(delay + random.uniform(0, delay * 0.25))
+
+
+def _embed_batch(batch: List[str]) -> List[List[float]]:
+    client = get_client("embeddings").with_options(max_retries=0)  # retries handled by _with_backoff
+    with span("embedding_batch", inputs=len(batch)) as s:
+        resp = _with_backoff(
+            lambda: client.embeddings.create(model=OPENAI_EMBED_MODEL, input=batch)
+        )
+        s.set(**_usage(resp))
+    return [d.embedding for d in sorted(resp.data, key=lambda d: d.index)]
+
+
+def embed_texts(
+    texts: Iterable[str],
+    *,
+    batch_size: int | None = None,
+    max_concurrency: int | None = None,
+    progress: Callable[[int, int, float], None] | None = None,
+) -> List[List[float]]:
+    """
+    Embed many texts, returning vectors in input order.
+    Cached vectors are reused; the rest are sent `batch_size` inputs per request
+    with at most `max_concurrency` requests in flight.
+    `progress(done, total, elapsed_s)` is called after each finished batch.
+    """
+    texts = list(texts)
+    batch_size = batch_size or EMBED_BATCH_SIZE
+    max_concurrency = max_concurrency or EMBED_MAX_CONCURRENCY
+    cache = get_embed_cache()
+
+    out: List[Optional[List[float]]] = (
+        cache.get_many(texts, OPENAI_EMBED_MODEL) if cache is not None else [None] * len(texts)
+    )
+    missing = list(dict.fromkeys(t for t, v in zip(texts, out) if v is None))
+    batches = [missing[i : i + batch_size] for i in range(0, len(missing), batch_size)]
+
+    fetched: dict[str, List[float]] = {}
+    start = time.perf_counter()
+    done = 0
+    if batches:
+        with ThreadPoolExecutor(max_workers=min(max_concurrency, len(batches))) as pool:
+            futures = {pool.submit(_embed_batch, b): b for b in batches}
+            for fut in as_completed(futures):
+                batch = futures[fut]
+                vecs = fut.result()
+                fetched.update(zip(batch, vecs))
+                if cache is not None:
+                    cache.put_many(batch, OPENAI_EMBED_MODEL, vecs)
+                done += len(batch)
+                if progress:
+                    progress(done, len(missing), time.perf_counter() - start)
+
+    return [v if v is not None else fetched[t] for t, v in zip(texts, out)]
+
+
+def embed_cache_stats() -> dict:
+    """
+    Hit/miss counters of the embedding cache (empty when disabled).
+    """
+    cache = get_embed_cache()
+    return cache.stats() if cache is not None else {}
+
 
 def chat_once(messages: list[dict], temperature: float = 0.7, max_tokens: int = 250):
     """
     Single-shot chat completion. Returns the full text.
     """
-    resp = _client.chat.completions.create(
-        model=OPENAI_CHAT_MODEL,
-        messages=messages,
-        temperature=temperature,
-        max_tokens=max_tokens,
-        stream=False,
-    )
-    return resp.choices[0].message.content or ""
\ No newline at end of file
+    with span("chat", model=OPENAI_CHAT_MODEL) as s:
+        resp = get_client("chat").chat.completions.create(
+            model=OPENAI_CHAT_MODEL,
+            messages=messages,
+            temperature=temperature,
+            max_tokens=max_tokens,
+            stream=False,
+        )
+        s.set(**_usage(resp))
+    return resp.choices[0].message.content or ""
+
+
+class ChatStream:
+    """
+    Streamed chat completion. Iterate to receive text deltas as they arrive;
+    afterwards `text` holds the full reply and the timing fields are set
+    (seconds since the request was sent).
+    """
+
+    def __init__(self, messages: list[dict], temperature: float = 0.7, max_tokens: int = 250):
+        self.messages = messages
+        self.temperature = temperature
+        self.max_tokens = max_tokens
+        self.text = ""
+        self.time_to_first_token: Optional[float] = None
+        self.total_time: Optional[float] = None
+        self.usage: dict = {}
+
+    def __iter__(self) -> Iterator[str]:
+        with span("chat_stream", model=OPENAI_CHAT_MODEL) as s:
+            try:
+                yield from self._deltas()
+            finally:
+                s.set(ttft=self.time_to_first_token, **self.usage)
+
+    def _deltas(self) -> Iterator[str]:
+        t0 = time.perf_counter()
+        stream = get_client("chat").chat.completions.create(
+            model=OPENAI_CHAT_MODEL,
+            messages=self.messages,
+            temperature=self.temperature,
+            max_tokens=self.max_tokens,
+            stream=True,
+            stream_options={"include_usage": True},  # token counts arrive in a final, choice-less chunk
+        )
+        parts: List[str] = []
+        try:
+            for chunk in stream:
+                if not chunk.choices:
+                    self.usage = _usage(chunk)
+                    continue
+                delta = chunk.choices[0].delta.content
+                if not delta:
+                    continue
+                if self.time_to_first_token is None:
+                    self.time_to_first_token = time.perf_counter() - t0
+                parts.append(delta)
+                yield delta
+        finally:
+            self.text = "".join(parts)
+            self.total_time = time.perf_counter() - t0
+
+
+def chat_stream(messages: list[dict], temperature: float = 0.7, max_tokens: int = 250) -> ChatStream:
+    """
+    Streaming variant of chat_once(); yields tokens as they are generated.
+    """
+    return ChatStream(messages, temperature=temperature, max_tokens=max_tokens)
@@ -0,0 +1,120 @@
+"""
+In-process semantic cache for recommendation replies.
+
+A reply is reused when a new query recommends the same title and its embedding
+is close enough (cosine similarity >= threshold) to a query we already answered,
+so paraphrases like "cozy fantasy about friendship" / "friendship fantasy, cozy"
+share one chat completion. Entries expire after a TTL and are evicted LRU.
+"""
+from __future__ import annotations
+import math
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from itertools import count
+from typing import Dict, List, Optional, Set
+
+from app.config import (
+    SEMANTIC_CACHE_THRESHOLD,
+    SEMANTIC_CACHE_TTL_SECONDS,
+    SEMANTIC_CACHE_MAX_ENTRIES,
+)
+
+
+def _unit(vec: List[float]) -> List[float]:
+    norm = math.sqrt(sum(x * x for x in vec)) or 1.0
+    return [x / norm for x in vec]
+
+
+@dataclass
+class _Entry:
+    title: str
+    vec: List[float]  # unit length, so cosine == dot product
+    reply: str
+    created: float
+
+
+class SemanticCache:
+    def __init__(
+        self,
+        threshold: float | None = None,
+        ttl_seconds: float | None = None,
+        max_entries: int | None = None,
+    ):
+        self.threshold = SEMANTIC_CACHE_THRESHOLD if threshold is None else threshold
+        self.ttl_seconds = SEMANTIC_CACHE_TTL_SECONDS if ttl_seconds is None else ttl_seconds
+        self.max_entries = max_entries or SEMANTIC_CACHE_MAX_ENTRIES
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.evictions = 0
+        self._entries: "OrderedDict[int, _Entry]" = OrderedDict()  # LRU order, oldest first
+        self._by_title: Dict[str, Set[int]] = {}
+        self._ids = count()
+        self._lock = threading.Lock()
+
+    def _drop(self, entry_id: int) -> None:
+        entry = self._entries.pop(entry_id)
+        ids = self._by_title.get(entry.title)
+        if ids is not None:
+            ids.discard(entry_id)
+            if not ids:
+                del self._by_title[entry.title]
+
+    def lookup(self, query_embedding: List[float], title: str) -> Optional[str]:
+        """Cached reply for `title` whose query is similar enough, if any."""
+        q = _unit(query_embedding)
+        now = time.time()
+        with self._lock:
+            best_id, best_sim = None, self.threshold
+            for entry_id in list(self._by_title.get(title, ())):
+                entry = self._entries[entry_id]
+                if now - entry.created > self.ttl_seconds:
+                    self._drop(entry_id)
+                    self.expired += 1
+                    continue
+                sim = sum(a * b for a, b in zip(q, entry.vec))
+                if sim >= best_sim:
+                    best_id, best_sim = entry_id, sim
+            if best_id is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(best_id)
+            self.hits += 1
+            return self._entries[best_id].reply
+
+    def store(self, query_embedding: List[float], title: str, reply: str) -> None:
+        if not reply:
+            return
+        with self._lock:
+            entry_id = next(self._ids)
+            self._entries[entry_id] = _Entry(title, _unit(query_embedding), reply, time.time())
+            self._by_title.setdefault(title, set()).add(entry_id)
+            while len(self._entries) > self.max_entries:
+                self._drop(next(iter(self._entries)))
+                self.evictions += 1
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": (self.hits / total) if total else 0.0,
+            "entries": len(self._entries),
+            "expired": self.expired,
+            "evictions": self.evictions,
+        }
+
+
+_shared: Optional[SemanticCache] = None
+_shared_lock = threading.Lock()
+
+
+def get_semantic_cache() -> SemanticCache:
+    """Process-wide cache shared by all sessions."""
+    global _shared
+    with _shared_lock:
+        if _shared is None:
+            _shared = SemanticCache()
+    return _shared
@@ -0,0 +1,226 @@
+"""
+Local stand-in for the OpenAI client, for offline benchmarks and tests.
+
+Covers the calls this app makes (embeddings, chat incl. streaming and the forced
+summary tool call, moderation, TTS and STT) with deterministic outputs and a
+configurable simulated latency per operation. Embeddings are hashed bags of
+words, so texts sharing words get similar vectors and retrieval stays meaningful.
+"""
+from __future__ import annotations
+import hashlib
+import io
+import json
+import math
+import re
+import threading
+import time
+import wave
+from collections import Counter
+from types import SimpleNamespace
+from typing import Dict, Iterator, List, Optional
+
+# Simulated latency in seconds per call (per token for "chat_token")
+DEFAULT_LATENCY: Dict[str, float] = {
+    "embeddings": 0.05,
+    "chat": 0.25,
+    "chat_token": 0.01,
+    "moderation": 0.08,
+    "speech": 0.4,
+    "transcription": 0.5,
+}
+
+_WORD_RE = re.compile(r"\w+")
+_FLAG_WORDS = {"kill", "murder"}
+
+
+def fake_embedding(text: str, dim: int = 64) -> List[float]:
+    vec = [0.0] * dim
+    for word, n in Counter(_WORD_RE.findall((text or "").lower())).items():
+        h = hashlib.blake2b(word.encode("utf-8"), digest_size=8).digest()
+        idx = int.from_bytes(h[:4], "little") % dim
+        sign = 1.0 if h[4] & 1 else -1.0
+        vec[idx] += sign * n
+    norm = math.sqrt(sum(x * x for x in vec)) or 1.0
+    return [x / norm for x in vec]
+
+
+class _Embeddings:
+    def __init__(self, stub: "StubOpenAI"):
+        self._stub = stub
+
+    def create(self, model: str, input, **_):
+        texts = [input] if isinstance(input, str) else list(input)
+        self._stub._call("embeddings")
+        data = [SimpleNamespace(index=i, embedding=fake_embedding(t, self._stub.dim)) for i, t in enumerate(texts)]
+        return SimpleNamespace(data=data, model=model)
+
+
+class _Completions:
+    def __init__(self, stub: "StubOpenAI"):
+        self._stub = stub
+
+    def create(self, model: str, messages: list, stream: bool = False, tools=None, tool_choice=None, **_):
+        self._stub._call("chat")
+        if tools:
+            # Forced tool call: echo back the title from "title=..."
+            user = next((m["content"] for m in reversed(messages) if m["role"] == "user"), "")
+            title = user.split("title=", 1)[-1].strip()
+            call = SimpleNamespace(
+                id="call_stub",
+                type="function",
+                function=SimpleNamespace(name="get_summary_by_title", arguments=json.dumps({"title": title})),
+            )
+            msg = SimpleNamespace(role="assistant", content=None, tool_calls=[call])
+            return SimpleNamespace(choices=[SimpleNamespace(message=msg, finish_reason="tool_calls")])
+
+        text = self._stub.reply
+        if stream:
+            return self._stream(text)
+        msg = SimpleNamespace(role="assistant", content=text, tool_calls=None)
+        return SimpleNamespace(choices=[SimpleNamespace(message=msg, finish_reason="stop")])
+
+    def _stream(self, text: str) -> Iterator[SimpleNamespace]:
+        for tok in re.findall(r"\S+\s*", text):
+            self._stub._sleep("chat_token")
+            delta = SimpleNamespace(content=tok, role=None, tool_calls=None)
+            yield SimpleNamespace(choices=[SimpleNamespace(delta=delta, finish_reason=None)])
+
+
+class _Moderations:
+    def __init__(self, stub: "StubOpenAI"):
+        self._stub = stub
+
+    def create(self, input, model: Optional[str] = None, **_):
+        self._stub._call("moderation")
+        texts = [input] if isinstance(input, str) else list(input)
+        results = []
+        for t in texts:
+            violent = bool(_FLAG_WORDS & set(_WORD_RE.findall(t.lower())))
+            cats = SimpleNamespace(violence=violent, harassment=False, hate=False, sexual=False)
+            results.append(SimpleNamespace(flagged=violent, categories=cats))
+        return SimpleNamespace(results=results)
+
+
+class _BinaryResponse:
+    def __init__(self, data: bytes):
+        self._data = data
+
+    def read(self) -> bytes:
+        return self._data
+
+
+class _StreamedSpeech:
+    # Mimics the context manager returned by `with_streaming_response.create`:
+    # the first bytes arrive after a quarter of the latency, the rest trickles in.
+    def __init__(self, stub: "StubOpenAI", data: bytes):
+        self._stub = stub
+        self._data = data
+
+    def __enter__(self) -> "_StreamedSpeech":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        return None
+
+    def iter_bytes(self, chunk_size: int = 4096) -> Iterator[bytes]:
+        pieces = [self._data[i : i + chunk_size] for i in range(0, len(self._data), chunk_size)] or [b""]
+        self._stub._sleep("speech", 0.25)
+        for i, piece in enumerate(pieces):
+            if i:
+                self._stub._sleep("speech", 0.75 / (len(pieces) - 1))
+            yield piece
+
+
+class _StreamingSpeech:
+    def __init__(self, stub: "StubOpenAI"):
+        self._stub = stub
+
+    def create(self, model: str, voice: str, input: str, response_format: str = "mp3", **_):
+        with self._stub._lock:
+            self._stub.calls["speech"] += 1
+        return _StreamedSpeech(self._stub, fake_audio(input, voice, response_format))
+
+
+class _Speech:
+    def __init__(self, stub: "StubOpenAI"):
+        self._stub = stub
+        self.with_streaming_response = _StreamingSpeech(stub)
+
+    def create(self, model: str, voice: str, input: str, response_format: str = "mp3", **_):
+        self._stub._call("speech")
+        return _BinaryResponse(fake_audio(input, voice, response_format))
+
+
+class _Transcriptions:
+    def __init__(self, stub: "StubOpenAI"):
+        self._stub = stub
+
+    def create(self, model: str, file, language: Optional[str] = None, response_format: str = "json", **_):
+        self._stub._call("transcription")
+        return self._stub.transcript
+
+
+def fake_audio(text: str, voice: str = "", fmt: str = "mp3") -> bytes:
+    # ~2 bytes per character, deterministic per (voice, text); a real PCM file for "wav"
+    seed = hashlib.sha256(f"{voice}\x00{text}".encode("utf-8")).digest()
+    body = seed * max(1, len(text) // 16)
+    if fmt != "wav":
+        return b"ID3" + body
+    buf = io.BytesIO()
+    with wave.open(buf, "wb") as w:
+        w.setnchannels(1)
+        w.setsampwidth(2)
+        w.setframerate(24000)
+        w.writeframes(body)
+    return buf.getvalue()
+
+
+class StubOpenAI:
+    """
+    Drop-in for `openai.OpenAI` covering the endpoints used by the app.
+    `latency` overrides DEFAULT_LATENCY entries; `latency_scale=0` disables sleeping.
+    `calls` counts requests per operation.
+    """
+
+    def __init__(
+        self,
+        latency: Optional[Dict[str, float]] = None,
+        latency_scale: float = 1.0,
+        reply: str = "A warm, spoiler-free pick that matches what you asked for.",
+        transcript: str = "I want a cozy fantasy about friendship.",
+        dim: int = 64,
+    ):
+        self.latency = {**DEFAULT_LATENCY, **(latency or {})}
+        self.latency_scale = latency_scale
+        self.reply = reply
+        self.transcript = transcript
+        self.dim = dim
+        self.calls: Counter = Counter()
+        self._lock = threading.Lock()
+
+        self.embeddings = _Embeddings(self)
+        self.chat = SimpleNamespace(completions=_Completions(self))
+        self.moderations = _Moderations(self)
+        self.audio = SimpleNamespace(speech=_Speech(self), transcriptions=_Transcriptions(self))
+
+    def with_options(self, **_) -> "StubOpenAI":
+        return self
+
+    def _sleep(self, op: str, fraction: float = 1.0) -> None:
+        delay = self.latency.get(op, 0.0) * self.latency_scale * fraction
+        if delay > 0:
+            time.sleep(delay)
+
+    def _call(self, op: str) -> None:
+        with self._lock:
+            self.calls[op] += 1
+        self._sleep(op)
+
+
+def install_stub(stub: StubOpenAI) -> None:
+    """
+    Route every OpenAI call in the app through `stub` via the shared client factory.
+    """
+    from app.llm.openai_client import set_client_factory
+
+    set_client_factory(lambda: stub)
@@ -0,0 +1,216 @@
+"""
+UI-independent request pipeline for a single user message.
+
+Stages and their dependencies:
+
+    moderation ─┐
+                ├─> vector search ─┬─> recommendation (chat)
+    embedding ──┘                  └─> detailed summary
+
+Moderation and the query embedding run concurrently; if the text is flagged the
+embedding is cancelled (or its result discarded). Queries that name a title are
+answered from the lexical index and skip the embedding entirely. Once the top title is known,
+the recommendation and the summary lookup also run concurrently, so latency is
+roughly the critical path instead of the sum of all stages.
+"""
+from __future__ import annotations
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+from app.config import PIPELINE_MAX_WORKERS, RETRIEVER_TOP_K, SEMANTIC_CACHE_ENABLED
+from app.guards.moderation import ModerationResult, check_message
+from app.llm.openai_client import chat_once, chat_stream, embed_text
+from app.llm.semantic_cache import get_semantic_cache
+from app.rag.prompts import make_recommendation_messages
+from app.rag.retriever import get_retriever
+from app.tools.summary_tool import resolve_summary
+from app.tracing import in_context
+
+
+@dataclass
+class PipelineResult:
+    query: str
+    moderation: ModerationResult
+    items: List[Dict[str, Any]] = field(default_factory=list)
+    query_embedding: Optional[List[float]] = None
+    reply: str = ""
+    reply_cached: bool = False  # served from the semantic cache
+    summary: Optional[Dict[str, Any]] = None
+    timings: Dict[str, float] = field(default_factory=dict)  # stage -> seconds
+
+    @property
+    def flagged(self) -> bool:
+        return self.moderation.flagged
+
+    @property
+    def best(self) -> Optional[Dict[str, Any]]:
+        return self.items[0] if self.items else None
+
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=PIPELINE_MAX_WORKERS, thread_name_prefix="pipeline")
+    return _executor
+
+
+def _timed(timings: Dict[str, float], name: str, fn: Callable, *args, **kwargs):
+    t0 = time.perf_counter()
+    try:
+        return fn(*args, **kwargs)
+    finally:
+        timings[name] = time.perf_counter() - t0
+
+
+class RecommendationPipeline:
+    def __init__(self, executor: Optional[ThreadPoolExecutor] = None):
+        self._executor = executor
+
+    def _submit(self, timings: Dict[str, float], name: str, fn: Callable, *args) -> Future:
+        pool = self._executor or _get_executor()
+        # in_context: spans opened on the worker land in the caller's trace
+        return pool.submit(in_context(_timed, timings, name, fn, *args))
+
+    def retrieve(self, query: str, top_k: Optional[int] = None) -> PipelineResult:
+        """
+        Moderation and query embedding in parallel, then vector search.
+        Returns early (no items) when the message is flagged.
+        """
+        t0 = time.perf_counter()
+        timings: Dict[str, float] = {}
+        k = top_k or RETRIEVER_TOP_K
+        mod_f = self._submit(timings, "moderation", check_message, query)
+        emb_f: Optional[Future] = None
+        try:
+            retriever = get_retriever()
+            # A confident title match needs no embedding at all
+            hit = _timed(timings, "lexical", retriever.lexical_hit, query, k)
+            if hit is None:
+                emb_f = self._submit(timings, "embedding", embed_text, query)
+            mod = mod_f.result()
+        except BaseException:
+            mod_f.cancel()
+            if emb_f is not None:
+                emb_f.cancel()
+            raise
+
+        result = PipelineResult(query=query, moderation=mod, timings=timings)
+        if mod.flagged:
+            if emb_f is not None:
+                emb_f.cancel()  # no-op if already running; its result is simply discarded
+            timings["retrieve_total"] = time.perf_counter() - t0
+            return result
+
+        if hit is not None:
+            result.items = hit
+        else:
+            q_emb = emb_f.result()
+            result.query_embedding = q_emb
+            items = _timed(timings, "search", retriever.search_by_embedding, q_emb, k)
+            result.items = retriever.fuse(query, items, top_k=k)
+        timings["retrieve_total"] = time.perf_counter() - t0
+        return result
+
+    def _cached_reply(self, result: PipelineResult) -> Optional[str]:
+        if not SEMANTIC_CACHE_ENABLED or result.query_embedding is None:
+            return None
+        return get_semantic_cache().lookup(result.query_embedding, result.best["title"])
+
+    def _remember_reply(self, result: PipelineResult) -> None:
+        if SEMANTIC_CACHE_ENABLED and result.query_embedding is not None:
+            get_semantic_cache().store(result.query_embedding, result.best["title"], result.reply)
+
+    def recommend(
+        self,
+        result: PipelineResult,
+        on_reply: Optional[Callable[[str], None]] = None,
+    ) -> PipelineResult:
+        """
+        Write the recommendation for the top item while its summary is fetched.
+        `on_reply` is called from the calling thread as soon as the reply is ready,
+        before waiting for the summary.
+        """
+        best = result.best
+        if best is None:
+            return result
+        t0 = time.perf_counter()
+        timings = result.timings
+        sum_f = self._submit(timings, "summary", resolve_summary, best["title"])
+        try:
+            messages = make_recommendation_messages(
+                user_query=result.query,
+                title=best["title"],
+                retrieved_document=best["document"],
+            )
+            cached = self._cached_reply(result)
+            if cached is not None:
+                result.reply, result.reply_cached = cached, True
+            else:
+                result.reply = _timed(timings, "chat", chat_once, messages)
+                self._remember_reply(result)
+            if on_reply:
+                on_reply(result.reply)
+        except BaseException:
+            sum_f.cancel()
+            raise
+
+        result.summary = sum_f.result()
+        timings["recommend_total"] = time.perf_counter() - t0
+        return result
+
+    def recommend_stream(self, result: PipelineResult) -> Iterator[str]:
+        """
+        Streaming variant of recommend(): yields reply tokens as they arrive while
+        the summary is fetched. `result.reply` and `result.summary` are filled in
+        once the generator is exhausted; time-to-first-token lands in timings.
+        """
+        best = result.best
+        if best is None:
+            return
+        t0 = time.perf_counter()
+        timings = result.timings
+        sum_f = self._submit(timings, "summary", resolve_summary, best["title"])
+
+        cached = self._cached_reply(result)
+        stream = None
+        if cached is None:
+            stream = chat_stream(
+                make_recommendation_messages(
+                    user_query=result.query,
+                    title=best["title"],
+                    retrieved_document=best["document"],
+                )
+            )
+        try:
+            yield from (stream if stream is not None else [cached])
+        except BaseException:  # includes GeneratorExit when the consumer stops early
+            sum_f.cancel()
+            raise
+        finally:
+            if stream is not None:
+                timings["chat"] = stream.total_time or 0.0
+                if stream.time_to_first_token is not None:
+                    timings["chat_ttft"] = stream.time_to_first_token
+
+        if stream is None:
+            result.reply, result.reply_cached = cached, True
+        else:
+            result.reply = stream.text
+            self._remember_reply(result)
+        result.summary = sum_f.result()
+        timings["recommend_total"] = time.perf_counter() - t0
+
+    def run(self, query: str, top_k: Optional[int] = None) -> PipelineResult:
+        """Full pipeline for one message."""
+        result = self.retrieve(query, top_k=top_k)
+        if result.flagged or not result.items:
+            return result
+        return self.recommend(result)
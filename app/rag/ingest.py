@@ -1,73 +1,388 @@
 """
 Loads data/book_summaries.json, derives a short summary,
-creates a Chroma collection "books", and upserts vectors using OpenAI embeddings.
-Re-running this script wipes the collection and rebuilds it.
+and syncs the Chroma collection "books" using OpenAI embeddings.
+
+Records are streamed from the file (a JSON array or NDJSON, one object per
+line) and processed in batches of INGEST_BATCH_SIZE: each batch is embedded,
+written to Chroma and checkpointed before the next one is read, so memory does
+not grow with the catalog and an interrupted run resumes after the last
+finished batch.
+
+By default the sync is incremental: each record's content hash is kept in its
+metadata, so only new or changed books are re-embedded and removed books are
+deleted. Pass --rebuild to rebuild the collection from scratch; it is built
+under a staging name and swapped in at the end, so searches keep working
+meanwhile. With --export-numpy (default when RETRIEVER_BACKEND=numpy) the
+collection is also dumped into the NumPy retriever index. The BM25 lexical
+index is rebuilt on every run, collected from the same batches, and only
+rewritten when it changed (the retriever reloads when the file does).
 """
 from __future__ import annotations
+import argparse
+import hashlib
 import json
-import re
-import chromadb
+import os
+import time
+from collections import Counter
+from dataclasses import asdict, dataclass, field
 from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Set
 
-from app.config import BOOK_SUMMARIES_PATH, CHROMADB_PATH, CHROMA_COLLECTION
-from app.llm.openai_client import embed_text
+from app.config import (
+    BOOK_SUMMARIES_PATH,
+    CHROMADB_PATH,
+    CHROMA_COLLECTION,
+    OPENAI_EMBED_MODEL,
+    RETRIEVER_BACKEND,
+    NUMPY_INDEX_PATH,
+    LEXICAL_ENABLED,
+    LEXICAL_INDEX_PATH,
+    INGEST_BATCH_SIZE,
+    INGEST_CHECKPOINT_PATH,
+)
+from app.llm.openai_client import embed_texts
+from app.rag.lexical import LexicalIndex, tokenize
+from app.rag.records import iter_records, slugify, to_short
 
 
-def slugify(title: str) -> str:
-    s = title.strip().lower()
-    s = re.sub(r"[^a-z0-9]+", "-", s)
-    s = re.sub(r"-+", "-", s).strip("-")
-    return s
+def _batched(records: Iterable[dict], size: int) -> Iterator[List[dict]]:
+    batch: List[dict] = []
+    for rec in records:
+        batch.append(rec)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
 
 
-def to_short(text: str, max_sentences: int = 3, max_chars: int = 250) -> str:
-    # naive sentence split; good enough for our curated data
-    parts = re.split(r"(?<=[.!?])\s+", text.strip())
-    short = " ".join(parts[:max_sentences]).strip()
-    if len(short) > max_chars:
-        short = short[: max_chars - 1].rstrip() + "…"
-    return short
+def content_hash(doc_text: str, model: str = OPENAI_EMBED_MODEL) -> str:
+    # The model is part of the hash so switching models re-embeds everything
+    return hashlib.sha256(f"{model}\x00{doc_text}".encode("utf-8")).hexdigest()
 
 
-def main() -> None:
-    # 1) Load JSON
-    path = Path(BOOK_SUMMARIES_PATH)
-    records = json.loads(path.read_text(encoding="utf-8"))
+def build_docs(records: Iterable[dict]) -> Dict[str, dict]:
+    """
+    Map slugified id -> {"document", "metadata"} for every record.
+    Later duplicates of the same id win.
+    """
+    out: Dict[str, dict] = {}
+    for rec in records:
+        title = rec["title"]
+        doc_text = f"Title: {title}\nSummary: {to_short(rec['summary'])}"
+        out[slugify(title)] = {
+            "document": doc_text,
+            "metadata": {"title": title, "content_hash": content_hash(doc_text)},
+        }
+    return out
+
+
+class LexicalBuilder:
+    """
+    Collects the BM25 index while records stream past: each record is tokenized
+    once and only its term counts and short doc are kept, keyed by id, so a
+    later duplicate replaces the earlier one (as in build_docs).
+    """
+
+    def __init__(self):
+        self._docs: Dict[str, tuple] = {}  # id -> (title, document, term counts, token total)
+
+    def add(self, records: Iterable[dict]) -> None:
+        for rec in records:
+            title = rec["title"]
+            tokens = tokenize(f"{title} {rec['summary']}")
+            document = f"Title: {title}\nSummary: {to_short(rec['summary'])}"
+            self._docs[slugify(title)] = (title, document, Counter(tokens), len(tokens))
+
+    def build(self) -> LexicalIndex:
+        index = LexicalIndex()
+        for id_, (title, document, counts, length) in self._docs.items():
+            index.add_counts(id_, title, document, counts, length)
+        return index
+
+
+def build_lexical_index(records: Iterable[dict]) -> LexicalIndex:
+    """BM25 index over titles + full summaries; results carry the same short docs as Chroma."""
+    builder = LexicalBuilder()
+    builder.add(records)
+    return builder.build()
+
+
+@dataclass
+class IngestDiff:
+    added: List[str] = field(default_factory=list)
+    changed: List[str] = field(default_factory=list)
+    removed: List[str] = field(default_factory=list)
+    unchanged: int = 0
+
+    def report(self) -> str:
+        return (
+            f"+{len(self.added)} added, ~{len(self.changed)} changed, "
+            f"-{len(self.removed)} removed, ={self.unchanged} unchanged"
+        )
+
+
+@dataclass
+class IngestCheckpoint:
+    """Progress of one ingest run over one version of the source file."""
+
+    source: str  # path, size and mtime of the file being ingested
+    mode: str  # "sync" or "rebuild"
+    records_done: int = 0
+    path: Optional[Path] = field(default=None, repr=False)
+
+    @classmethod
+    def load(cls, path: Path, source: str, mode: str) -> "IngestCheckpoint":
+        """Resume state for this source and mode, or a fresh checkpoint."""
+        path = Path(path)
+        try:
+            data = json.loads(path.read_text(encoding="utf-8"))
+            if data.get("source") == source and data.get("mode") == mode:
+                return cls(source, mode, int(data.get("records_done", 0)), path)
+        except (OSError, ValueError):
+            pass
+        return cls(source, mode, 0, path)
+
+    def advance(self, records: int) -> None:
+        self.records_done += records
+        if self.path is not None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = self.path.with_suffix(self.path.suffix + ".tmp")
+            data = {k: v for k, v in asdict(self).items() if k != "path"}
+            tmp.write_text(json.dumps({**data, "updated": time.time()}), encoding="utf-8")
+            os.replace(tmp, self.path)
+
+    def clear(self) -> None:
+        if self.path is not None:
+            self.path.unlink(missing_ok=True)
+
+
+def _source_signature(path: Path) -> str:
+    st = path.stat()
+    return f"{path.resolve()}:{st.st_size}:{st.st_mtime_ns}"
+
+
+def diff_hashes(existing: Dict[str, str | None], incoming: Dict[str, str]) -> IngestDiff:
+    """Compare stored content hashes (id -> hash) against the dataset's."""
+    diff = IngestDiff()
+    for id_, h in incoming.items():
+        if id_ not in existing:
+            diff.added.append(id_)
+        elif existing[id_] != h:
+            diff.changed.append(id_)
+        else:
+            diff.unchanged += 1
+    diff.removed = [id_ for id_ in existing if id_ not in incoming]
+    return diff
 
-    # 2) Create persistent Chroma client & wipe collection
-    CHROMADB_PATH.mkdir(parents=True, exist_ok=True)
-    client = chromadb.PersistentClient(path=str(CHROMADB_PATH))
 
-    # delete if exists (idempotent-ingest)
+def _existing_hashes(collection, page_size: int) -> Dict[str, str | None]:
+    hashes: Dict[str, str | None] = {}
+    offset = 0
+    while True:
+        res = collection.get(include=["metadatas"], limit=page_size, offset=offset)
+        ids = res.get("ids") or []
+        for id_, meta in zip(ids, res.get("metadatas") or []):
+            hashes[id_] = (meta or {}).get("content_hash")
+        if len(ids) < page_size:
+            return hashes
+        offset += page_size
+
+
+def export_numpy_index(collection, page_size: int, path: Path | None = None) -> int:
+    """
+    Dump the collection into the NumPy retriever backend's files, page by page.
+    Returns the number of exported rows.
+    """
+    count = collection.count()
+    first = collection.get(include=["embeddings"], limit=1)
+    embeds = first.get("embeddings")
+    dim = len(embeds[0]) if embeds is not None and len(embeds) else 0
+
+    def pages():
+        for offset in range(0, count, page_size):
+            yield collection.get(
+                include=["embeddings", "documents", "metadatas"],
+                limit=page_size,
+                offset=offset,
+            )
+
+    # deferred: numpy is only needed when exporting
+    from app.rag.numpy_index import write_numpy_index
+
+    write_numpy_index(Path(path or NUMPY_INDEX_PATH), count, dim, pages())
+    return count
+
+
+def _report_progress(done: int, total: int, elapsed: float) -> None:
+    rate = done / elapsed if elapsed > 0 else 0.0
+    print(f"  embedded {done}/{total} ({rate:.1f} texts/s)", flush=True)
+
+
+def _embed(docs: List[str]) -> List[List[float]]:
+    t0 = time.perf_counter()
+    embeds = embed_texts(docs, progress=_report_progress)
+    print(f"Embedded {len(docs)} documents in {time.perf_counter() - t0:.1f}s")
+    return embeds
+
+
+def _upsert(collection, ids: List[str], entries: Dict[str, dict], step: int) -> None:
+    docs = [entries[i]["document"] for i in ids]
+    embeds = _embed(docs) if ids else []
+    # Chroma caps how many rows a single call may carry
+    for i in range(0, len(ids), step):
+        collection.upsert(
+            ids=ids[i : i + step],
+            documents=docs[i : i + step],
+            metadatas=[entries[x]["metadata"] for x in ids[i : i + step]],
+            embeddings=embeds[i : i + step],
+        )
+
+
+def _rebuild(
+    client,
+    path: Path,
+    batch_size: int,
+    step: int,
+    ckpt: IngestCheckpoint,
+    lexical: Optional[LexicalBuilder] = None,
+):
+    """Stream every record into a staging collection, then swap it in for the live one."""
+    staging_name = f"{CHROMA_COLLECTION}.rebuild"
+    if ckpt.records_done:
+        staging = client.get_or_create_collection(name=staging_name, metadata={"hnsw:space": "cosine"})
+        if staging.count() == 0:
+            ckpt.records_done = 0  # staging was lost: start over
+    if not ckpt.records_done:
+        try:
+            client.delete_collection(staging_name)
+        except Exception:
+            pass
+    staging = client.get_or_create_collection(name=staging_name, metadata={"hnsw:space": "cosine"})  # cosine distance
+    if ckpt.records_done:
+        print(f"Resuming rebuild after {ckpt.records_done} records")
+
+    records = iter_records(path)
+    for _ in range(ckpt.records_done):
+        rec = next(records, None)
+        if rec is not None and lexical is not None:
+            lexical.add([rec])
+    for batch in _batched(records, batch_size):
+        entries = build_docs(batch)
+        # upsert, not add: a duplicate title in a later batch replaces the earlier one
+        _upsert(staging, list(entries), entries, step)
+        if lexical is not None:
+            lexical.add(batch)
+        ckpt.advance(len(batch))
+        print(f"  {ckpt.records_done} records written", flush=True)
+
     try:
         client.delete_collection(CHROMA_COLLECTION)
     except Exception:
         pass
+    staging.modify(name=CHROMA_COLLECTION)
+    collection = client.get_collection(CHROMA_COLLECTION)
+    print(f"Rebuilt '{CHROMA_COLLECTION}' with {collection.count()} books at {CHROMADB_PATH}")
+    return collection
+
 
-    collection = client.create_collection(
+def _sync(
+    client,
+    path: Path,
+    batch_size: int,
+    step: int,
+    ckpt: IngestCheckpoint,
+    lexical: Optional[LexicalBuilder] = None,
+):
+    """Diff each batch against the stored hashes and touch only what changed."""
+    collection = client.get_or_create_collection(
         name=CHROMA_COLLECTION,
         metadata={"hnsw:space": "cosine"}  # cosine distance
     )
+    # ids and hashes only (no documents or vectors), needed to find removed books
+    existing = _existing_hashes(collection, step)
+    seen: Set[str] = set()
+    diff = IngestDiff()
 
-    # 3) Build docs, embeddings, and add
-    ids, docs, metas, embeds = [], [], [], []
-    for rec in records:
-        title = rec["title"]
-        full = rec["summary"]
-        short = to_short(full)
+    records = iter_records(path)
+    if ckpt.records_done:
+        print(f"Resuming sync after {ckpt.records_done} records")
+        for _ in range(ckpt.records_done):
+            rec = next(records, None)
+            if rec is not None:
+                seen.add(slugify(rec["title"]))
+                if lexical is not None:
+                    lexical.add([rec])
+    for batch in _batched(records, batch_size):
+        entries = build_docs(batch)
+        part = diff_hashes(
+            {id_: existing[id_] for id_ in entries if id_ in existing},
+            {id_: e["metadata"]["content_hash"] for id_, e in entries.items()},
+        )
+        _upsert(collection, part.added + part.changed, entries, step)
+        if lexical is not None:
+            lexical.add(batch)
+        diff.added += part.added
+        diff.changed += part.changed
+        diff.unchanged += part.unchanged
+        seen.update(entries)
+        ckpt.advance(len(batch))
 
-        doc_text = f"Title: {title}\nSummary: {short}"
-        vec = embed_text(doc_text)
+    diff.removed = [id_ for id_ in existing if id_ not in seen]
+    for i in range(0, len(diff.removed), step):
+        collection.delete(ids=diff.removed[i : i + step])
+    print(f"Synced '{CHROMA_COLLECTION}' at {CHROMADB_PATH}: {diff.report()}")
+    return collection
+
+
+def main(argv: List[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Sync book summaries into Chroma.")
+    parser.add_argument("--rebuild", action="store_true", help="rebuild the collection and re-embed everything")
+    parser.add_argument(
+        "--export-numpy",
+        action="store_true",
+        default=RETRIEVER_BACKEND == "numpy",
+        help="also write the NumPy retriever index (default when RETRIEVER_BACKEND=numpy)",
+    )
+    parser.add_argument("--batch-size", type=int, default=INGEST_BATCH_SIZE, help="records per embed + write flush")
+    parser.add_argument("--restart", action="store_true", help="ignore the checkpoint of an interrupted run")
+    args = parser.parse_args(argv)
+
+    # 1) Source file (JSON array or NDJSON), streamed
+    path = Path(BOOK_SUMMARIES_PATH)
+
+    # 2) Create persistent Chroma client (imported here: it is slow to load and
+    #    helpers like to_short() are used by jobs that never touch Chroma)
+    import chromadb
+
+    CHROMADB_PATH.mkdir(parents=True, exist_ok=True)
+    client = chromadb.PersistentClient(path=str(CHROMADB_PATH))
+    step = client.get_max_batch_size()
+    batch_size = max(1, min(args.batch_size, step))
 
-        ids.append(slugify(title))
-        docs.append(doc_text)
-        metas.append({"title": title})
-        embeds.append(vec)
+    # 3) Batches are checkpointed; a re-run over the same file resumes after the last one
+    mode = "rebuild" if args.rebuild else "sync"
+    if args.restart:
+        Path(INGEST_CHECKPOINT_PATH).unlink(missing_ok=True)
+    ckpt = IngestCheckpoint.load(INGEST_CHECKPOINT_PATH, _source_signature(path), mode)
+    # 4) The BM25 index is collected from the same batches (no second pass over the file)
+    lexical = LexicalBuilder() if LEXICAL_ENABLED else None
+    if args.rebuild:
+        collection = _rebuild(client, path, batch_size, step, ckpt, lexical)
+    else:
+        collection = _sync(client, path, batch_size, step, ckpt, lexical)
+    ckpt.clear()
 
-    if ids:
-        collection.add(ids=ids, documents=docs, metadatas=metas, embeddings=embeds)
+    if args.export_numpy:
+        n = export_numpy_index(collection, step)
+        print(f"Exported {n} vectors to the NumPy index at {NUMPY_INDEX_PATH}")
 
-    print(f"Ingested {len(ids)} books into '{CHROMA_COLLECTION}' at {CHROMADB_PATH}")
+    if lexical is not None:
+        index = lexical.build()
+        if index.save(LEXICAL_INDEX_PATH):
+            print(f"Wrote lexical index ({len(index)} books) to {LEXICAL_INDEX_PATH}")
+        else:
+            print(f"Lexical index unchanged ({len(index)} books) at {LEXICAL_INDEX_PATH}")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,170 @@
+"""
+In-memory BM25 index over book titles and full summaries.
+
+Built from book_summaries.json at ingest time and saved as JSON next to the
+vector store. The retriever uses it in two ways:
+  - a confident title match (exact title, or query words that pick out exactly
+    one title) answers the query without any embedding call;
+  - otherwise BM25 results are fused with the vector results (reciprocal rank
+    fusion), provided at least one vector result passed the confidence filter.
+"""
+from __future__ import annotations
+import json
+import math
+import os
+import re
+from collections import Counter, defaultdict
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from app.tools.title_index import normalize_title
+
+_TOKEN_RE = re.compile(r"\w+")
+_STOPWORDS = frozenset(
+    "a an and are as at be book books by for from i in is it me of on or story "
+    "that the to want with about like".split()
+)
+
+
+def tokenize(text: str) -> List[str]:
+    return [t for t in _TOKEN_RE.findall((text or "").casefold()) if t not in _STOPWORDS]
+
+
+def _title_words(text: str) -> frozenset:
+    # Title matching keeps every word except articles: "a story about a thief"
+    # must not match "The Book Thief" just because the other words are stopwords.
+    return frozenset(t for t in _TOKEN_RE.findall((text or "").casefold()) if t not in {"the", "a", "an"})
+
+
+class LexicalIndex:
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.docs: List[Dict[str, str]] = []  # {"id", "title", "document"}
+        self.doc_lens: List[int] = []
+        self.postings: Dict[str, List[Tuple[int, int]]] = defaultdict(list)  # token -> [(doc, tf)]
+        self._by_title: Dict[str, int] = {}
+        self._title_tokens: List[frozenset] = []
+        self._title_postings: Dict[str, List[int]] = defaultdict(list)
+
+    # --- building / persistence ---
+
+    def add(self, id_: str, title: str, document: str, text: str) -> None:
+        """Index one book; `document` is what search results return, `text` what gets indexed."""
+        tokens = tokenize(f"{title} {text}")
+        self.add_counts(id_, title, document, Counter(tokens), len(tokens))
+
+    def add_counts(self, id_: str, title: str, document: str, counts: Dict[str, int], length: int) -> None:
+        """Index one book from already tokenized text (term -> count, token total)."""
+        idx = len(self.docs)
+        self.docs.append({"id": id_, "title": title, "document": document})
+        self.doc_lens.append(length)
+        for tok, tf in counts.items():
+            self.postings[tok].append((idx, tf))
+        self._index_title(idx, title)
+
+    def _index_title(self, idx: int, title: str) -> None:
+        self._by_title.setdefault(normalize_title(title), idx)
+        toks = _title_words(title)
+        self._title_tokens.append(toks)
+        for tok in toks:
+            self._title_postings[tok].append(idx)
+
+    def save(self, path: Path) -> bool:
+        """
+        Write the index; returns False (and leaves the file untouched) when the
+        file already holds the same index, so its readers have nothing to reload.
+        """
+        path = Path(path)
+        payload = {"docs": self.docs, "doc_lens": self.doc_lens, "postings": self.postings}
+        data = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        try:
+            if path.stat().st_size == len(data) and path.read_bytes() == data:
+                return False
+        except FileNotFoundError:
+            pass
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(path.suffix + ".tmp")
+        tmp.write_bytes(data)
+        os.replace(tmp, path)  # readers never see a partial file
+        return True
+
+    @classmethod
+    def load(cls, path: Path) -> "LexicalIndex":
+        payload = json.loads(Path(path).read_text(encoding="utf-8"))
+        index = cls()
+        index.docs = payload["docs"]
+        index.doc_lens = payload["doc_lens"]
+        index.postings = defaultdict(list, {t: [tuple(p) for p in ps] for t, ps in payload["postings"].items()})
+        for idx, doc in enumerate(index.docs):
+            index._index_title(idx, doc["title"])
+        return index
+
+    def __len__(self) -> int:
+        return len(self.docs)
+
+    # --- querying ---
+
+    def search(self, query: str, top_k: int = 5) -> List[Tuple[int, float]]:
+        """BM25 top-k as (doc index, score), best first."""
+        n = len(self.docs)
+        if not n:
+            return []
+        avgdl = sum(self.doc_lens) / n or 1.0
+        scores: Dict[int, float] = defaultdict(float)
+        for tok in set(tokenize(query)):
+            plist = self.postings.get(tok)
+            if not plist:
+                continue
+            idf = math.log(1 + (n - len(plist) + 0.5) / (len(plist) + 0.5))
+            for idx, tf in plist:
+                norm = self.k1 * (1 - self.b + self.b * self.doc_lens[idx] / avgdl)
+                scores[idx] += idf * tf * (self.k1 + 1) / (tf + norm)
+        return sorted(scores.items(), key=lambda t: t[1], reverse=True)[:top_k]
+
+    def title_match(self, query: str) -> Optional[int]:
+        """
+        Doc index when the query confidently names one book: its exact title, or
+        words that all appear in exactly one title and cover at least half of it.
+        """
+        idx = self._by_title.get(normalize_title(query))
+        if idx is not None:
+            return idx
+        q = _title_words(query)
+        if not q:
+            return None
+        candidates = None
+        for tok in q:
+            docs = set(self._title_postings.get(tok, ()))
+            candidates = docs if candidates is None else candidates & docs
+            if not candidates:
+                return None
+        if len(candidates) != 1:
+            return None
+        idx = next(iter(candidates))
+        return idx if 2 * len(q) >= len(self._title_tokens[idx]) else None
+
+    def item(self, idx: int, distance: Optional[float] = None) -> Dict[str, object]:
+        doc = self.docs[idx]
+        return {"id": doc["id"], "title": doc["title"], "document": doc["document"], "distance": distance}
+
+
+def reciprocal_rank_fusion(
+    vector_items: List[Dict[str, object]],
+    lexical_items: List[Dict[str, object]],
+    top_k: int,
+    k: int = 60,
+) -> List[Dict[str, object]]:
+    """
+    Merge two ranked lists by sum of 1 / (k + rank). Vector items keep their
+    distance; lexical-only items carry distance None.
+    """
+    scores: Dict[str, float] = defaultdict(float)
+    by_key: Dict[str, Dict[str, object]] = {}
+    for ranked in (vector_items, lexical_items):
+        for rank, it in enumerate(ranked, start=1):
+            key = it.get("id") or it.get("title")
+            scores[key] += 1.0 / (k + rank)
+            by_key.setdefault(key, it)  # vector entry wins (it has a distance)
+    order = sorted(scores, key=lambda key: scores[key], reverse=True)  # stable: vector order breaks ties
+    return [by_key[key] for key in order[:top_k]]
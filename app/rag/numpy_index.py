@@ -0,0 +1,122 @@
+"""
+In-process exact vector index backed by NumPy.
+
+Book vectors are L2-normalized and stored as a float32 `vectors.npy` matrix that is
+memory-mapped on load; documents/metadata live next to it in `meta.json`.
+A query is one matrix-vector product plus `argpartition` for the top k, which for
+catalogs up to a few hundred thousand books is exact and faster than going
+through Chroma's client, SQLite and HNSW layers.
+
+`NumpyIndex` mimics the small part of a Chroma collection that BooksRetriever
+uses (`query`, `count`, `peek`), so the two backends are interchangeable.
+"""
+from __future__ import annotations
+import json
+import os
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+
+VECTORS_FILE = "vectors.npy"
+META_FILE = "meta.json"
+
+
+def _normalize_rows(m: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(m, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return m / norms
+
+
+def write_numpy_index(
+    path: Path,
+    count: int,
+    dim: int,
+    pages: Iterable[Dict[str, Sequence]],
+) -> None:
+    """
+    Write an index from `pages` of {"ids", "documents", "metadatas", "embeddings"}
+    (e.g. successive collection.get() results) holding `count` rows in total.
+    Vectors are streamed into a memory-mapped file, then both files are swapped
+    in atomically so readers never see a half-written index.
+    """
+    path = Path(path)
+    path.mkdir(parents=True, exist_ok=True)
+    tmp_vec = path / (VECTORS_FILE + ".tmp")
+    tmp_meta = path / (META_FILE + ".tmp")
+
+    matrix = np.lib.format.open_memmap(tmp_vec, mode="w+", dtype=np.float32, shape=(count, dim))
+    ids: List[str] = []
+    docs: List[str] = []
+    titles: List[str] = []
+    row = 0
+    for page in pages:
+        embeds = np.asarray(page["embeddings"], dtype=np.float32)
+        if not len(embeds):
+            continue
+        matrix[row : row + len(embeds)] = _normalize_rows(embeds)
+        row += len(embeds)
+        ids.extend(page["ids"])
+        docs.extend(page["documents"])
+        titles.extend((m or {}).get("title") for m in page["metadatas"])
+    if row != count:
+        raise ValueError(f"expected {count} rows, got {row}")
+    matrix.flush()
+    del matrix
+
+    tmp_meta.write_text(
+        json.dumps({"ids": ids, "documents": docs, "titles": titles}, ensure_ascii=False),
+        encoding="utf-8",
+    )
+    os.replace(tmp_vec, path / VECTORS_FILE)
+    os.replace(tmp_meta, path / META_FILE)
+
+
+class NumpyIndex:
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self._matrix = np.load(self.path / VECTORS_FILE, mmap_mode="r")
+        meta = json.loads((self.path / META_FILE).read_text(encoding="utf-8"))
+        self._ids: List[str] = meta["ids"]
+        self._docs: List[str] = meta["documents"]
+        self._titles: List[Optional[str]] = meta["titles"]
+
+    def count(self) -> int:
+        return int(self._matrix.shape[0])
+
+    def peek(self, limit: int = 10) -> Dict[str, Any]:
+        n = min(limit, self.count())
+        return {
+            "ids": self._ids[:n],
+            "documents": self._docs[:n],
+            "metadatas": [{"title": t} for t in self._titles[:n]],
+            "embeddings": np.asarray(self._matrix[:n]),
+        }
+
+    def query(
+        self,
+        query_embeddings: Sequence[Sequence[float]],
+        n_results: int = 10,
+        include: Sequence[str] = ("metadatas", "documents", "distances"),
+    ) -> Dict[str, List[List[Any]]]:
+        """Exact cosine top-k, returned in Chroma's result layout."""
+        res: Dict[str, List[List[Any]]] = {"ids": [], "documents": [], "metadatas": [], "distances": []}
+        n = self.count()
+        if n == 0 or not len(query_embeddings):
+            for _ in query_embeddings:
+                for v in res.values():
+                    v.append([])
+            return {key: v for key, v in res.items() if key == "ids" or key in include}
+
+        q = _normalize_rows(np.asarray(query_embeddings, dtype=np.float32))
+        sims = q @ self._matrix.T  # (queries, books)
+        k = min(n_results, n)
+        top = np.argpartition(-sims, k - 1, axis=1)[:, :k]
+        for qi in range(len(q)):
+            cand = top[qi]
+            order = cand[np.argsort(-sims[qi, cand])]
+            res["ids"].append([self._ids[i] for i in order])
+            res["documents"].append([self._docs[i] for i in order])
+            res["metadatas"].append([{"title": self._titles[i]} for i in order])
+            res["distances"].append([float(1.0 - sims[qi, i]) for i in order])  # cosine distance
+        return {key: v for key, v in res.items() if key == "ids" or key in include}
@@ -0,0 +1,87 @@
+"""
+Reading the book catalog: records streamed from data/book_summaries.json (a
+JSON array or NDJSON), plus the id and short-summary helpers derived from them.
+
+Kept free of heavy imports so tools that only read the catalog (the summaries
+store, the audio pre-generation job) don't load the indexing stack.
+"""
+from __future__ import annotations
+import json
+import re
+from pathlib import Path
+from typing import Iterator, TextIO
+
+
+def slugify(title: str) -> str:
+    s = title.strip().lower()
+    s = re.sub(r"[^a-z0-9]+", "-", s)
+    s = re.sub(r"-+", "-", s).strip("-")
+    return s
+
+
+def _iter_json_array(f: TextIO, chunk_size: int) -> Iterator[dict]:
+    # Decode one element at a time from a sliding window over the file
+    decoder = json.JSONDecoder()
+    buf, pos = "", 0
+    opened = False
+    while True:
+        while pos < len(buf) and buf[pos] in " \t\r\n,":
+            pos += 1
+        if pos == len(buf):
+            chunk = f.read(chunk_size)
+            if not chunk:
+                raise ValueError("unterminated JSON array")
+            buf, pos = chunk, 0
+            continue
+        if not opened:
+            if buf[pos] != "[":
+                raise ValueError("expected a JSON array")
+            opened, pos = True, pos + 1
+            continue
+        if buf[pos] == "]":
+            return
+        while True:
+            try:
+                obj, end = decoder.raw_decode(buf, pos)
+                break
+            except json.JSONDecodeError:
+                chunk = f.read(chunk_size)
+                if not chunk:
+                    raise
+                buf, pos = buf[pos:] + chunk, 0
+        yield obj
+        buf, pos = buf[end:], 0
+
+
+def iter_records(path: Path, chunk_size: int = 1 << 16) -> Iterator[dict]:
+    """
+    Stream book records from a JSON array or NDJSON file (by content, not
+    extension), holding one record (plus a read buffer) in memory at a time.
+    """
+    with Path(path).open("r", encoding="utf-8") as f:
+        head = f.read(chunk_size).lstrip()
+        while not head:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                return
+            head = chunk.lstrip()
+        f.seek(0)
+        if head[0] == "[":
+            yield from _iter_json_array(f, chunk_size)
+        else:
+            for n, line in enumerate(f, 1):
+                line = line.strip()
+                if line:
+                    try:
+                        yield json.loads(line)
+                    except json.JSONDecodeError as e:
+                        raise ValueError(f"{path}:{n}: invalid JSON line") from e
+
+
+def to_short(text: str, max_sentences: int = 3, max_chars: int = 250) -> str:
+    # naive sentence split; good enough for our curated data
+    parts = re.split(r"(?<=[.!?])\s+", text.strip())
+    short = " ".join(parts[:max_sentences]).strip()
+    if len(short) > max_chars:
+        short = short[: max_chars - 1].rstrip() + "…"
+    return short
@@ -1,32 +1,147 @@
 from __future__ import annotations
-import chromadb
+import threading
+from pathlib import Path
 from typing import List, Dict, Any, Optional
 
-from app.config import CHROMADB_PATH, CHROMA_COLLECTION, RETRIEVER_TOP_K
-from app.llm.openai_client import embed_text
+from app.config import (
+    CHROMADB_PATH,
+    CHROMA_COLLECTION,
+    RETRIEVER_TOP_K,
+    RETRIEVER_BACKEND,
+    NUMPY_INDEX_PATH,
+    LEXICAL_ENABLED,
+    LEXICAL_INDEX_PATH,
+)
+from app.llm.openai_client import embed_text, embed_texts
+from app.rag.lexical import LexicalIndex, reciprocal_rank_fusion
+from app.tracing import span
 
 
 class BooksRetriever:
-    def __init__(self):
-        self.client = chromadb.PersistentClient(path=str(CHROMADB_PATH))
-        self.collection = self.client.get_collection(CHROMA_COLLECTION)
+    def __init__(
+        self,
+        path: Path | None = None,
+        collection_name: str | None = None,
+        backend: str | None = None,
+        lexical_path: Path | None = None,
+    ):
+        # Both backends expose the same query()/count()/peek() surface
+        self.backend = (backend or RETRIEVER_BACKEND).lower()
+        if self.backend == "numpy":
+            from app.rag.numpy_index import NumpyIndex  # deferred: numpy is only needed by this backend
+
+            self.path = Path(path or NUMPY_INDEX_PATH)
+            self.client = None
+            self.collection = NumpyIndex(self.path)
+        else:
+            self.path = Path(path or CHROMADB_PATH)
+            import chromadb  # deferred: costs ~0.7s and the numpy backend never needs it
+
+            self.client = chromadb.PersistentClient(path=str(self.path))
+            self.collection = self.client.get_collection(collection_name or CHROMA_COLLECTION)
+
+        # Optional BM25 index written by ingest; vector-only search without it
+        self.lexical: Optional[LexicalIndex] = None
+        lex_path = Path(lexical_path or LEXICAL_INDEX_PATH)
+        if LEXICAL_ENABLED and lex_path.exists():
+            self.lexical = LexicalIndex.load(lex_path)
+
+    # Load the HNSW index now instead of on the first user query
+    def warm(self) -> None:
+        sample = self.collection.peek(limit=1)
+        embeds = sample.get("embeddings")
+        if embeds is not None and len(embeds):
+            self.collection.query(query_embeddings=[embeds[0]], n_results=1, include=[])
 
     # Search for the top K relevant book summaries based on the query
     def search(self, query: str, top_k: Optional[int] = None) -> List[Dict[str, Any]]:
+        hit = self.lexical_hit(query, top_k=top_k)
+        if hit is not None:
+            return hit  # answered without an embedding call
+        return self.fuse(query, self.search_by_embedding(embed_text(query), top_k=top_k), top_k=top_k)
+
+    # Confident title match from the lexical index (exact title first), else None
+    def lexical_hit(self, query: str, top_k: Optional[int] = None) -> Optional[List[Dict[str, Any]]]:
+        if self.lexical is None:
+            return None
+        with span("lexical", hit=False) as s:
+            idx = self.lexical.title_match(query)
+            if idx is None:
+                return None
+            s.set(hit=True)
+            k = top_k or RETRIEVER_TOP_K
+            others = [i for i, _ in self.lexical.search(query, top_k=k) if i != idx]
+            return [self.lexical.item(i) for i in [idx] + others[: k - 1]]
+
+    # Reciprocal rank fusion of vector results with BM25 results
+    def fuse(self, query: str, vector_items: List[Dict[str, Any]], top_k: Optional[int] = None) -> List[Dict[str, Any]]:
+        # No confident vector hit means no good match; BM25 alone would return
+        # any book sharing a single word with the query
+        if self.lexical is None or not vector_items:
+            return vector_items
+        k = top_k or RETRIEVER_TOP_K
+        lexical_items = [self.lexical.item(i) for i, _ in self.lexical.search(query, top_k=k)]
+        return reciprocal_rank_fusion(vector_items, lexical_items, top_k=k)
+
+    # Vector half of search(), for callers that already embedded the query (pass the result to fuse())
+    def search_by_embedding(self, q_emb: List[float], top_k: Optional[int] = None) -> List[Dict[str, Any]]:
+        return self.search_many_by_embedding([q_emb], top_k=top_k)[0]
+
+    # Batch search: one embeddings pass and as few index queries as possible
+    def search_many(
+        self,
+        queries: List[str],
+        top_k: Optional[int] = None,
+        batch_size: int = 256,
+    ) -> List[List[Dict[str, Any]]]:
+        """
+        Search many queries at once; returns one result list per query, in order,
+        the same as search() would give for each. Title matches are answered
+        from the lexical index; the other queries are embedded in batched
+        requests, sent to the index `batch_size` at a time and fused with BM25.
+        """
+        out: List[Optional[List[Dict[str, Any]]]] = [self.lexical_hit(q, top_k=top_k) for q in queries]
+        pending = [i for i, hit in enumerate(out) if hit is None]
+        if pending:
+            vector = self.search_many_by_embedding(
+                embed_texts([queries[i] for i in pending]), top_k=top_k, batch_size=batch_size
+            )
+            for i, items in zip(pending, vector):
+                out[i] = self.fuse(queries[i], items, top_k=top_k)
+        return out
+
+    def search_many_by_embedding(
+        self,
+        q_embs: List[List[float]],
+        top_k: Optional[int] = None,
+        batch_size: int = 256,
+    ) -> List[List[Dict[str, Any]]]:
+        """
+        Vector results only: without the query text there is no title
+        short-circuit and no BM25 fusion (see search_many for both).
+        """
         k = top_k or RETRIEVER_TOP_K
-        q_emb = embed_text(query)
-        res = self.collection.query(
-            query_embeddings=[q_emb],
-            n_results=k,
-            include=["metadatas", "documents", "distances"],
-        )
+        out: List[List[Dict[str, Any]]] = []
+        for start in range(0, len(q_embs), batch_size):
+            batch = q_embs[start : start + batch_size]
+            with span("vector_search", backend=self.backend, queries=len(batch)):
+                res = self.collection.query(
+                    query_embeddings=batch,
+                    n_results=k,
+                    include=["metadatas", "documents", "distances"],
+                )
+            for qi in range(len(res.get("documents") or [])):
+                out.append(self._items(res, qi))
+        return out
 
+    @staticmethod
+    def _items(res: Dict[str, Any], qi: int) -> List[Dict[str, Any]]:
         items: List[Dict[str, Any]] = []
-        docs = res.get("documents", [[]])[0]
-        metas = res.get("metadatas", [[]])[0]
-        dists = res.get("distances", [[]])[0]
+        docs = res.get("documents", [[]])[qi]
+        metas = res.get("metadatas", [[]])[qi]
+        dists = res.get("distances", [[]])[qi]
         ids_block = res.get("ids", [[]])  # may or may not be present
-        ids = ids_block[0] if ids_block else [None] * len(docs)
+        ids = ids_block[qi] if ids_block else [None] * len(docs)
 
         for i in range(len(docs)):
             if dists[i] < 0.8:  # filter out low-confidence results
@@ -42,3 +157,54 @@ class BooksRetriever:
     def best_title(self, query: str) -> Optional[str]:
         items = self.search(query, top_k=1)
         return items[0]["title"] if items else None
+
+
+# --- Process-wide instance (shared by all sessions / Streamlit reruns) ---
+
+_shared: Optional[BooksRetriever] = None
+_shared_sig: Optional[tuple] = None
+_shared_lock = threading.Lock()
+
+
+def _store_signature(backend: str) -> Optional[tuple]:
+    # Ingest writes go through Chroma's SQLite file (and its WAL), or replace the
+    # NumPy / lexical index files, so their mtimes/sizes change whenever the data
+    # does. The lexical file is left alone when its content is unchanged.
+    if backend == "numpy":
+        from app.rag.numpy_index import VECTORS_FILE, META_FILE
+
+        files = [NUMPY_INDEX_PATH / VECTORS_FILE, NUMPY_INDEX_PATH / META_FILE]
+    else:
+        files = [CHROMADB_PATH / "chroma.sqlite3", CHROMADB_PATH / "chroma.sqlite3-wal"]
+    files.append(LEXICAL_INDEX_PATH)
+    sig = []
+    for f in files:
+        try:
+            st = f.stat()
+            sig.append((st.st_mtime_ns, st.st_size))
+        except FileNotFoundError:
+            sig.append(None)
+    return tuple(sig)
+
+
+def get_retriever() -> BooksRetriever:
+    """
+    Return the process-wide BooksRetriever, opening it on first use and
+    reopening it when the index on disk has changed (e.g. after ingest).
+    Safe to call concurrently from multiple sessions.
+    """
+    global _shared, _shared_sig
+    sig = _store_signature(RETRIEVER_BACKEND)
+    if _shared is not None and sig == _shared_sig:
+        return _shared
+
+    with _shared_lock:
+        if _shared is None or sig != _shared_sig:
+            if _shared is not None and _shared.client is not None:
+                # Chroma caches one system per path; drop it so the index is re-read
+                from chromadb.api.client import SharedSystemClient
+                SharedSystemClient.clear_system_cache()
+            retriever = BooksRetriever()
+            retriever.warm()
+            _shared, _shared_sig = retriever, _store_signature(RETRIEVER_BACKEND)
+        return _shared
@@ -0,0 +1,150 @@
+"""
+Key -> value table in a small SQLite file with least-recently-used eviction.
+
+Shared by the disk caches that map a content hash to a stored result
+(embedding vectors, transcripts). Each caller names its table and value
+column, supplies how values are encoded for SQLite and decoded back, and may
+keep extra descriptive columns per row. Reads refresh an entry's access time;
+when the table grows past `max_entries`, the least recently used rows are
+deleted down to 90% of the limit.
+"""
+from __future__ import annotations
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+
+def _identity(value: Any) -> Any:
+    return value
+
+
+class SqliteLRU:
+    def __init__(
+        self,
+        path: Path,
+        table: str,
+        max_entries: int,
+        *,
+        value_column: str = "value",
+        value_type: str = "BLOB",
+        encode: Callable[[Any], Any] = _identity,
+        decode: Callable[[Any], Any] = _identity,
+        extra_columns: Sequence[Tuple[str, str]] = (),
+    ):
+        self.path = Path(path)
+        self.table = table
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._value = value_column
+        self._encode = encode
+        self._decode = decode
+        self._extra = [name for name, _ in extra_columns]
+        self._lock = threading.Lock()
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        extra_sql = "".join(f" {name} {decl}," for name, decl in extra_columns)
+        self._conn.execute(
+            f"CREATE TABLE IF NOT EXISTS {table} ("
+            f" key TEXT PRIMARY KEY,{extra_sql}"
+            f" {value_column} {value_type} NOT NULL,"
+            f" last_access REAL NOT NULL)"
+        )
+        self._conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{table}_last_access ON {table}(last_access)")
+        self._conn.commit()
+        self._count = self._conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+        columns = ["key", *self._extra, value_column, "last_access"]
+        self._insert_sql = (
+            f"INSERT OR REPLACE INTO {table} ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})"
+        )
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            row = self._conn.execute(f"SELECT {self._value} FROM {self.table} WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self._conn.execute(f"UPDATE {self.table} SET last_access = ? WHERE key = ?", (time.time(), key))
+            self._conn.commit()
+            self.hits += 1
+        return self._decode(row[0])
+
+    def get_many(self, keys: List[str]) -> Dict[str, Any]:
+        """Batch lookup; returns the entries found (every key counts as a hit or a miss)."""
+        found: Dict[str, Any] = {}
+        with self._lock:
+            unique = list(dict.fromkeys(keys))
+            for i in range(0, len(unique), 500):  # stay under SQLite's variable limit
+                part = unique[i : i + 500]
+                marks = ",".join("?" * len(part))
+                rows = self._conn.execute(
+                    f"SELECT key, {self._value} FROM {self.table} WHERE key IN ({marks})", part
+                ).fetchall()
+                found.update(rows)
+            if found:
+                now = time.time()
+                self._conn.executemany(
+                    f"UPDATE {self.table} SET last_access = ? WHERE key = ?",
+                    [(now, k) for k in found],
+                )
+                self._conn.commit()
+            hits = sum(1 for k in keys if k in found)
+            self.hits += hits
+            self.misses += len(keys) - hits
+        return {k: self._decode(v) for k, v in found.items()}
+
+    def put(self, key: str, value: Any, **extra: Any) -> None:
+        self.put_many([(key, value)], **extra)
+
+    def put_many(self, items: Iterable[Tuple[str, Any]], **extra: Any) -> None:
+        """Store (key, value) pairs; `extra` gives the extra columns, the same for every row."""
+        now = time.time()
+        fixed = [extra[name] for name in self._extra]
+        rows = [(key, *fixed, self._encode(value), now) for key, value in items]
+        with self._lock:
+            self._conn.executemany(self._insert_sql, rows)
+            self._conn.commit()
+            self._count += len(rows)  # approximate (replacements count too); re-counted before evicting
+            if self._count > self.max_entries:
+                self._evict()
+
+    def _evict(self) -> None:
+        # Drop ~10% below the limit so we don't evict on every insert
+        target = int(self.max_entries * 0.9)
+        self._count = self._conn.execute(f"SELECT COUNT(*) FROM {self.table}").fetchone()[0]
+        excess = self._count - target
+        if excess <= 0:
+            return
+        self._conn.execute(
+            f"DELETE FROM {self.table} WHERE key IN "
+            f"(SELECT key FROM {self.table} ORDER BY last_access ASC LIMIT ?)",
+            (excess,),
+        )
+        self._conn.commit()
+        self._count -= excess
+        self.evictions += excess
+
+    def clear(self) -> None:
+        with self._lock:
+            self._conn.execute(f"DELETE FROM {self.table}")
+            self._conn.commit()
+            self._count = 0
+
+    def __len__(self) -> int:
+        return self._count
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": (self.hits / total) if total else 0.0,
+            "entries": self._count,
+            "evictions": self.evictions,
+        }
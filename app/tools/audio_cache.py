@@ -0,0 +1,250 @@
+"""
+Bounded on-disk cache for synthesized audio.
+
+Audio files live in AUDIO_DIR as `<key>.<fmt>`; a small SQLite manifest next to
+them records each entry's size, last access, model and voice. When the total
+size exceeds the byte budget, least recently used entries are deleted (down to
+90% of the budget). Files are written to a temp file and renamed into place, so
+readers never see partial audio, and `lock(key)` serializes work on one key so
+concurrent sessions asking for the same text synthesize it only once.
+
+Prune from the command line:
+    python -m app.tools.audio_cache --prune [--max-bytes N]
+"""
+from __future__ import annotations
+import argparse
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from pathlib import Path
+from typing import BinaryIO, Dict, Iterator, List, Optional
+
+from app.config import AUDIO_DIR, AUDIO_CACHE_MAX_BYTES
+
+INDEX_FILE = "index.sqlite3"
+_PART_SUFFIX = ".part"
+_STALE_PART_SECONDS = 3600
+
+
+class AudioCache:
+    def __init__(self, root: Path | None = None, max_bytes: int | None = None):
+        self.root = Path(root or AUDIO_DIR).resolve()
+        self.max_bytes = max_bytes or AUDIO_CACHE_MAX_BYTES
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._key_locks: Dict[str, List] = {}  # key -> [RLock, users]
+
+        self.root.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(self.root / INDEX_FILE), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            " key TEXT PRIMARY KEY,"
+            " filename TEXT NOT NULL,"
+            " bytes INTEGER NOT NULL,"
+            " model TEXT,"
+            " voice TEXT,"
+            " created REAL NOT NULL,"
+            " last_access REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_audio_last_access ON entries(last_access)")
+        self._conn.commit()
+        self._total = self._conn.execute("SELECT COALESCE(SUM(bytes), 0) FROM entries").fetchone()[0]
+
+    def path_for(self, key: str, fmt: str) -> Path:
+        return self.root / f"{key}.{fmt}"
+
+    # --- per-key locking ---
+
+    @contextmanager
+    def lock(self, key: str) -> Iterator[None]:
+        """
+        Hold while checking for and producing one key, so a second request for
+        the same audio waits for the first instead of synthesizing it again.
+        Re-entrant; entries being worked on are never evicted.
+        """
+        with self._lock:
+            entry = self._key_locks.setdefault(key, [threading.RLock(), 0])
+            entry[1] += 1
+        try:
+            with entry[0]:
+                yield
+        finally:
+            with self._lock:
+                entry[1] -= 1
+                if entry[1] == 0:
+                    self._key_locks.pop(key, None)
+
+    # --- reads ---
+
+    def get(self, key: str, fmt: str) -> Optional[Path]:
+        """Path of a cached entry (and mark it used), or None."""
+        path = self.path_for(key, fmt)
+        with self._lock:
+            row = self._conn.execute("SELECT bytes FROM entries WHERE key = ?", (key,)).fetchone()
+            exists = path.exists()
+            if not exists:
+                if row is not None:  # deleted behind our back
+                    self._drop_row(key, row[0])
+                    self._conn.commit()
+                self.misses += 1
+                return None
+            now = time.time()
+            if row is None:
+                # Written before the manifest existed (or by another process): adopt it
+                self._insert(key, path.name, path.stat().st_size, None, None, now)
+            else:
+                self._conn.execute("UPDATE entries SET last_access = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+            self.hits += 1
+        return path
+
+    # --- writes ---
+
+    @contextmanager
+    def writer(self, key: str, fmt: str, *, model: str | None = None, voice: str | None = None) -> Iterator[BinaryIO]:
+        """
+        File object for writing an entry incrementally. The data goes to a temp
+        file that is renamed into place (and indexed) only if the block succeeds.
+        """
+        path = self.path_for(key, fmt)
+        tmp = self.root / f".{key}.{uuid.uuid4().hex[:8]}{_PART_SUFFIX}"
+        f = open(tmp, "wb")
+        try:
+            yield f
+            f.close()
+            os.replace(tmp, path)
+        except BaseException:
+            f.close()
+            tmp.unlink(missing_ok=True)
+            raise
+        self._record(key, path, model, voice)
+
+    def put(self, key: str, fmt: str, data: bytes, *, model: str | None = None, voice: str | None = None) -> Path:
+        with self.writer(key, fmt, model=model, voice=voice) as f:
+            f.write(data)
+        return self.path_for(key, fmt)
+
+    def _insert(self, key: str, filename: str, size: int, model: Optional[str], voice: Optional[str], now: float) -> None:
+        old = self._conn.execute("SELECT bytes FROM entries WHERE key = ?", (key,)).fetchone()
+        self._conn.execute(
+            "INSERT OR REPLACE INTO entries (key, filename, bytes, model, voice, created, last_access)"
+            " VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (key, filename, size, model, voice, now, now),
+        )
+        self._total += size - (old[0] if old else 0)
+
+    def _drop_row(self, key: str, size: int) -> None:
+        self._conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+        self._total -= size
+
+    def _record(self, key: str, path: Path, model: Optional[str], voice: Optional[str]) -> None:
+        with self._lock:
+            self._insert(key, path.name, path.stat().st_size, model, voice, time.time())
+            self._conn.commit()
+            if self._total > self.max_bytes:
+                self._evict(keep=key)
+
+    # --- eviction / maintenance ---
+
+    def _evict(self, keep: Optional[str] = None, budget: Optional[int] = None) -> int:
+        # LRU down to 90% of the budget, so we don't evict on every write
+        target = int((budget or self.max_bytes) * 0.9)
+        removed = 0
+        rows = self._conn.execute("SELECT key, filename, bytes FROM entries ORDER BY last_access ASC").fetchall()
+        for key, filename, size in rows:
+            if self._total <= target:
+                break
+            if key == keep or key in self._key_locks:
+                continue
+            try:
+                (self.root / filename).unlink(missing_ok=True)
+            except OSError:
+                continue  # e.g. still open on Windows; try again next time
+            self._drop_row(key, size)
+            removed += 1
+        self._conn.commit()
+        self.evictions += removed
+        return removed
+
+    def prune(self, max_bytes: Optional[int] = None) -> Dict[str, int]:
+        """
+        Reconcile the manifest with the directory (adopt untracked audio files,
+        forget missing ones, delete stale temp files), then evict down to the budget.
+        """
+        adopted = forgotten = stale = 0
+        now = time.time()
+        with self._lock:
+            indexed = dict(self._conn.execute("SELECT filename, bytes FROM entries").fetchall())
+            for f in self.root.iterdir():
+                if not f.is_file() or f.name.startswith(INDEX_FILE):
+                    continue
+                if f.name.endswith(_PART_SUFFIX):
+                    if now - f.stat().st_mtime > _STALE_PART_SECONDS:
+                        f.unlink(missing_ok=True)
+                        stale += 1
+                    continue
+                if f.name.startswith("."):
+                    continue
+                if f.name not in indexed:
+                    st = f.stat()
+                    self._insert(f.stem, f.name, st.st_size, None, None, st.st_mtime)  # last used ~ when written
+                    adopted += 1
+            for filename, size in indexed.items():
+                if not (self.root / filename).exists():
+                    self._conn.execute("DELETE FROM entries WHERE filename = ?", (filename,))
+                    self._total -= size
+                    forgotten += 1
+            self._conn.commit()
+            evicted = self._evict(budget=max_bytes) if self._total > (max_bytes or self.max_bytes) else 0
+        return {"adopted": adopted, "forgotten": forgotten, "stale_parts": stale, "evicted": evicted}
+
+    def stats(self) -> Dict[str, object]:
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+            total = self.hits + self.misses
+            return {
+                "entries": entries,
+                "bytes": self._total,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0,
+                "evictions": self.evictions,
+            }
+
+
+_cache: Optional[AudioCache] = None
+_init_lock = threading.Lock()
+
+
+def get_audio_cache() -> AudioCache:
+    """Process-wide audio cache over AUDIO_DIR."""
+    global _cache
+    with _init_lock:
+        if _cache is None:
+            _cache = AudioCache()
+    return _cache
+
+
+def main(argv: List[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Inspect or prune the TTS audio cache.")
+    parser.add_argument("--prune", action="store_true", help="reconcile the manifest and evict down to the budget")
+    parser.add_argument("--max-bytes", type=int, help="budget for this prune (default AUDIO_CACHE_MAX_BYTES)")
+    args = parser.parse_args(argv)
+
+    cache = get_audio_cache()
+    if args.prune:
+        print(f"Pruned {cache.root}: {cache.prune(max_bytes=args.max_bytes)}")
+    s = cache.stats()
+    print(f"{s['entries']} entries, {s['bytes'] / 1e6:.1f} MB of {s['max_bytes'] / 1e6:.1f} MB budget")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,194 @@
+"""
+Pre-generate TTS audio for the whole catalog, so the first "Listen" click on
+any summary is served from the audio cache.
+
+Every full summary in data/book_summaries.json (a JSON array or NDJSON), and
+with --short the short summary shown in search results, is synthesized for
+each voice in TTS_VOICE_CHOICES through synthesize_to_file(), i.e. into the same cache
+entries the app plays from. A bounded worker pool does the work under a
+request-rate limit. The audio cache itself records what is finished: a run
+skips every text whose file is already cached, so an interrupted run (Ctrl+C,
+crash, quota error) resumes where it stopped, and a text whose file has since
+been evicted is generated again.
+
+Usage:
+    python -m app.tools.pregen_audio [--short] [--voices alloy verse] [--workers 2] [--rate 30]
+"""
+from __future__ import annotations
+import argparse
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from typing import Dict, Iterable, List
+
+from app.config import BOOK_SUMMARIES_PATH, TTS_FORMAT, TTS_MODEL, TTS_VOICE_CHOICES
+from app.rag.records import iter_records, to_short
+from app.tools.audio_cache import get_audio_cache
+from app.tools.tts import make_tts_key, synthesize_to_file
+
+
+@dataclass(frozen=True)
+class Job:
+    key: str
+    title: str
+    kind: str  # "full" or "short"
+    voice: str
+    text: str
+
+
+def plan_jobs(
+    records: Iterable[dict],
+    voices: List[str],
+    *,
+    short: bool = False,
+    model: str = TTS_MODEL,
+    fmt: str = TTS_FORMAT,
+) -> List[Job]:
+    """One job per (text, voice); texts that hash to the same cache key are synthesized once."""
+    jobs: Dict[str, Job] = {}
+    for rec in records:
+        texts = [("full", rec["summary"])]
+        if short:
+            texts.append(("short", to_short(rec["summary"])))
+        for kind, text in texts:
+            text = (text or "").strip()
+            if not text:
+                continue
+            for voice in voices:
+                # Same key synthesize_to_file / synthesize_stream compute for this text
+                key = make_tts_key(text, model=model, voice=voice, fmt=fmt)
+                jobs.setdefault(key, Job(key, rec["title"], kind, voice, text))
+    return list(jobs.values())
+
+
+class RateLimiter:
+    """Spaces out wait() returns to at most `per_minute` (0 = unlimited), across threads."""
+
+    def __init__(self, per_minute: float):
+        self.interval = 60.0 / per_minute if per_minute > 0 else 0.0
+        self._next = 0.0
+        self._lock = threading.Lock()
+
+    def wait(self) -> None:
+        if not self.interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._next)
+            self._next = start + self.interval
+        if start > now:
+            time.sleep(start - now)
+
+
+def _report_progress(done: int, total: int, skipped: int, failed: int, elapsed: float) -> None:
+    rate = (done - skipped) / elapsed if elapsed > 0 else 0.0
+    eta = (total - done) / rate if rate > 0 else float("nan")
+    print(
+        f"  {done}/{total} texts ({skipped} already cached, {failed} failed), "
+        f"{rate:.2f} texts/s, ETA {eta:.0f}s",
+        flush=True,
+    )
+
+
+def run(
+    jobs: List[Job],
+    *,
+    workers: int = 2,
+    per_minute: float = 30.0,
+    model: str = TTS_MODEL,
+    fmt: str = TTS_FORMAT,
+    progress_every: int = 10,
+) -> Dict[str, object]:
+    """Synthesize every job whose audio is not cached yet; returns counts and failures."""
+    cache = get_audio_cache()
+    limiter = RateLimiter(per_minute)
+    todo: List[Job] = []
+    skipped = 0
+    for job in jobs:
+        if cache.path_for(job.key, fmt).exists():
+            skipped += 1
+        else:
+            todo.append(job)
+
+    failures: Dict[str, str] = {}
+    done = skipped
+    t0 = time.perf_counter()
+
+    def work(job: Job) -> None:
+        # Charged per API request: a long text is several chunk requests
+        synthesize_to_file(job.text, model=model, voice=job.voice, fmt=fmt, throttle=limiter.wait)
+
+    # Submit lazily so at most 2x workers jobs are queued (Ctrl+C stops quickly)
+    pool = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="pregen")
+    pending = {}
+    queue = iter(todo)
+    try:
+        while True:
+            while len(pending) < 2 * max(1, workers):
+                job = next(queue, None)
+                if job is None:
+                    break
+                pending[pool.submit(work, job)] = job
+            if not pending:
+                break
+            finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for fut in finished:
+                job = pending.pop(fut)
+                exc = fut.exception()
+                if exc is not None:
+                    failures[f"{job.title} [{job.kind}, {job.voice}]"] = f"{type(exc).__name__}: {exc}"
+                done += 1
+                if progress_every and (done - skipped) % progress_every == 0:
+                    _report_progress(done, len(jobs), skipped, len(failures), time.perf_counter() - t0)
+    finally:
+        for fut in pending:
+            fut.cancel()
+        pool.shutdown(wait=True)
+
+    return {
+        "total": len(jobs),
+        "synthesized": done - skipped - len(failures),
+        "skipped": skipped,
+        "failed": failures,
+        "seconds": time.perf_counter() - t0,
+    }
+
+
+def main(argv: List[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Pre-generate TTS audio for every catalog summary.")
+    parser.add_argument("--voices", nargs="+", default=TTS_VOICE_CHOICES, help="voices to render (default TTS_VOICE_CHOICES)")
+    parser.add_argument("--short", action="store_true", help="also render the short summaries")
+    parser.add_argument("--workers", type=int, default=2, help="texts synthesized at once")
+    parser.add_argument("--rate", type=float, default=30.0, help="max TTS API requests per minute, one per chunk (0 = unlimited)")
+    args = parser.parse_args(argv)
+
+    records = list(iter_records(BOOK_SUMMARIES_PATH))
+    jobs = plan_jobs(records, args.voices, short=args.short)
+    print(
+        f"Pre-generating {len(jobs)} texts ({len(records)} books x {len(args.voices)} voices"
+        f"{', full + short' if args.short else ''})"
+    )
+
+    try:
+        result = run(jobs, workers=args.workers, per_minute=args.rate)
+    except KeyboardInterrupt:
+        print("Interrupted; finished audio is cached. Re-run to resume.")
+        raise SystemExit(130)
+
+    print(
+        f"Synthesized {result['synthesized']}, already cached {result['skipped']}, "
+        f"failed {len(result['failed'])} in {result['seconds']:.1f}s"
+    )
+    for what, err in result["failed"].items():
+        print(f"  failed: {what}: {err}")
+    stats = get_audio_cache().stats()
+    print(f"Audio cache: {stats['entries']} files, {stats['bytes'] / 1e6:.1f} of {stats['max_bytes'] / 1e6:.0f} MB")
+    if stats["evictions"]:
+        print("Warning: the cache evicted files during this run; raise AUDIO_CACHE_MAX_BYTES to keep the whole catalog.")
+    if result["failed"]:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
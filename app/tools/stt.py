@@ -1,12 +1,51 @@
+"""
+Speech-to-text via OpenAI Whisper.
+
+Long PCM WAV recordings (longer than STT_SEGMENT_SECONDS) are split at
+silences by the local VAD in app/tools/vad.py; the segments are transcribed
+concurrently and stitched back in order, dropping words repeated where two
+segments overlap. Wall time then follows the longest segment instead of the
+whole recording, and no single request can exceed the upload size limit.
+Before upload, WAV audio is compacted (leading/trailing silence trimmed,
+downmixed to mono 16-bit, resampled to STT_UPLOAD_SAMPLE_RATE), and
+transcripts are cached by a hash of the original audio bytes, so a clip
+resubmitted on a Streamlit rerun costs no request. Other formats
+(mp3/m4a/webm) are sent whole. Microphone recordings kept in MIC_DIR are
+pruned by age and total size (save_recording / prune_recordings).
+"""
 from __future__ import annotations
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import Optional
-from openai import OpenAI
+from typing import TYPE_CHECKING, Dict, List, Optional, Tuple
+import hashlib
 import io
+import re
+import threading
+import time
+
+from app.config import (
+    STT_MODEL,
+    STT_CHUNKING_ENABLED,
+    STT_SEGMENT_SECONDS,
+    STT_SEGMENT_OVERLAP_SECONDS,
+    STT_MAX_CONCURRENCY,
+    STT_COMPACT_AUDIO,
+    STT_UPLOAD_SAMPLE_RATE,
+    MIC_DIR,
+    MIC_RETENTION_DAYS,
+    MIC_MAX_BYTES,
+)
+from app.llm.openai_client import get_client
+from app.tools.transcript_cache import get_transcript_cache, make_transcript_key
+from app.tracing import in_context, span
 
-from app.config import STT_MODEL
+if TYPE_CHECKING:
+    from app.tools.vad import PcmAudio
 
-client = OpenAI()
+# Whisper rejects uploads over 25 MB; keep segments under it with some headroom
+_MAX_UPLOAD_BYTES = 24 * 1024 * 1024
+_MAX_OVERLAP_WORDS = 12
+_WORD_RE = re.compile(r"[^\w']+")
 
 
 def transcribe_wav(path: Path, language: str = "en") -> str:
@@ -15,27 +54,196 @@ def transcribe_wav(path: Path, language: str = "en") -> str:
     Returns plain text ("" if nothing).
     """
     path = Path(path)
-    with path.open("rb") as f:
-        resp = client.audio.transcriptions.create(
-            model=STT_MODEL,
-            file=f,
-            language=language,
-            response_format="text",
-        )
-    # For response_format="text", resp is a string-like; for json, use resp.text
-    return str(resp or "").strip()
+    return _transcribe(path.read_bytes(), path.name, language)
 
 
 def transcribe_bytes(data: bytes, filename: str = "audio.wav", language: str = "en") -> str:
     """
     Transcribe from in-memory bytes. Handy for uploads.
     """
+    return _transcribe(data, filename, language)
+
+
+def _request(data: bytes, filename: str, language: str) -> str:
     bio = io.BytesIO(data)
     bio.name = filename  # OpenAI SDK inspects filename for format
-    resp = client.audio.transcriptions.create(
+    resp = get_client("transcription").audio.transcriptions.create(
         model=STT_MODEL,
         file=bio,
         language=language,
         response_format="text",
     )
-    return str(resp or "").strip()
\ No newline at end of file
+    # For response_format="text", resp is a string-like; for json, use resp.text
+    return str(resp or "").strip()
+
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=STT_MAX_CONCURRENCY, thread_name_prefix="stt")
+    return _executor
+
+
+def split_wav(
+    data: bytes, max_seconds: float | None = None, overlap_seconds: float | None = None
+) -> List[Tuple[bytes, bool]]:
+    """
+    (wav bytes, overlaps previous segment) per segment of `data`, cut at
+    silences; a single segment when it is short, not PCM WAV, or chunking is disabled.
+    """
+    from app.tools.vad import read_wav  # deferred, with numpy, until there is audio to look at
+
+    audio = read_wav(data) if STT_CHUNKING_ENABLED else None
+    if audio is None:
+        return [(data, False)]
+    return _split(audio, data, max_seconds, overlap_seconds)
+
+
+def _split(
+    audio: PcmAudio, data: bytes, max_seconds: float | None = None, overlap_seconds: float | None = None
+) -> List[Tuple[bytes, bool]]:
+    from app.tools.vad import plan_segments
+
+    max_seconds = min(max_seconds or STT_SEGMENT_SECONDS, _MAX_UPLOAD_BYTES / audio.bytes_per_second)
+    overlap = STT_SEGMENT_OVERLAP_SECONDS if overlap_seconds is None else overlap_seconds
+    bounds = plan_segments(audio, max_seconds, overlap)
+    if len(bounds) == 1:
+        return [(data, False)]
+    return [(audio.to_wav(a, b), i > 0 and a < bounds[i - 1][1]) for i, (a, b) in enumerate(bounds)]
+
+
+def _transcribe_segment(data: bytes, index: int, language: str) -> str:
+    with span("stt_segment", index=index, bytes=len(data)):
+        return _request(data, f"segment_{index}.wav", language)
+
+
+def _prepare(data: bytes, filename: str) -> List[Tuple[bytes, bool]]:
+    """Upload payload(s) for `data`: compacted and split when it is PCM WAV; [] if it is only silence."""
+    from app.tools.vad import compact, read_wav  # deferred, with numpy, until there is audio to look at
+
+    audio = read_wav(data) if filename.lower().endswith(".wav") else None
+    if audio is None:
+        return [(data, False)]
+    if STT_COMPACT_AUDIO:
+        audio = compact(audio, STT_UPLOAD_SAMPLE_RATE)
+        if not audio.frames:
+            return []
+        data = audio.to_wav()
+    if not STT_CHUNKING_ENABLED:
+        return [(data, False)]
+    return _split(audio, data)
+
+
+def _transcribe(data: bytes, filename: str, language: str) -> str:
+    with span("stt", cache_hit=False, bytes_in=len(data)) as s:
+        cache = get_transcript_cache()
+        key = make_transcript_key(data, STT_MODEL, language)
+        if cache is not None:
+            text = cache.get(key)
+            if text is not None:
+                s.set(cache_hit=True)
+                return text
+
+        segments = _prepare(data, filename)
+        s.set(bytes_out=sum(len(seg) for seg, _ in segments), segments=len(segments))
+        if not segments:
+            text = ""
+        elif len(segments) == 1:
+            text = _request(segments[0][0], filename, language)
+        else:
+            pool = _get_executor()
+            futures = [pool.submit(in_context(_transcribe_segment, seg, i, language)) for i, (seg, _) in enumerate(segments)]
+            text = stitch([f.result() for f in futures], [overlaps for _, overlaps in segments])
+
+        if cache is not None:
+            cache.put(key, text, len(data))
+        return text
+
+
+def _norm_word(w: str) -> str:
+    return _WORD_RE.sub("", w.casefold())
+
+
+def stitch(texts: List[str], overlaps: Optional[List[bool]] = None, max_overlap_words: int = _MAX_OVERLAP_WORDS) -> str:
+    """
+    Join segment transcripts in order. Where a segment's audio overlaps the
+    previous one (`overlaps[i]`, default all), opening words that repeat the
+    previous closing words are kept once.
+    """
+    words: List[str] = []
+    for i, text in enumerate(texts):
+        nxt = text.split()
+        if not nxt:
+            continue
+        if overlaps is not None and not overlaps[i]:
+            words.extend(nxt)
+            continue
+        tail = [_norm_word(w) for w in words[-max_overlap_words:]]
+        head = [_norm_word(w) for w in nxt[:max_overlap_words]]
+        k = next(
+            (k for k in range(min(len(tail), len(head)), 0, -1) if tail[-k:] == head[:k] and any(head[:k])),
+            0,
+        )
+        words.extend(nxt[k:])
+    return " ".join(words)
+
+
+def save_recording(data: bytes, directory: Path | None = None) -> Path:
+    """
+    Keep a microphone recording in MIC_DIR (named by content hash, so a
+    resubmitted clip is stored once), then apply the retention policy.
+    """
+    directory = Path(directory or MIC_DIR)
+    directory.mkdir(parents=True, exist_ok=True)
+    path = (directory / f"mic_{hashlib.sha256(data).hexdigest()[:16]}.wav").resolve()
+    if path.exists():
+        path.touch()
+    else:
+        tmp = path.with_suffix(".part")
+        tmp.write_bytes(data)
+        tmp.replace(path)
+    prune_recordings(directory)
+    return path
+
+
+def prune_recordings(
+    directory: Path | None = None, max_age_days: float | None = None, max_bytes: int | None = None
+) -> Dict[str, int]:
+    """
+    Delete recordings older than MIC_RETENTION_DAYS, then the oldest ones
+    until MIC_DIR fits in MIC_MAX_BYTES. Returns counts of what was removed.
+    """
+    directory = Path(directory or MIC_DIR)
+    if not directory.is_dir():
+        return {"removed": 0, "freed_bytes": 0, "kept_bytes": 0}
+    max_age_days = MIC_RETENTION_DAYS if max_age_days is None else max_age_days
+    max_bytes = MIC_MAX_BYTES if max_bytes is None else max_bytes
+    files = []
+    for f in directory.iterdir():
+        try:
+            if f.is_file():
+                st = f.stat()
+                files.append((st.st_mtime, st.st_size, f))
+        except OSError:
+            continue
+    files.sort()  # oldest first
+
+    removed = freed = 0
+    cutoff = time.time() - max_age_days * 86400 if max_age_days > 0 else None
+    total = sum(size for _, size, _ in files)
+    for mtime, size, f in files:
+        if not ((cutoff is not None and mtime < cutoff) or (max_bytes and total > max_bytes)):
+            continue
+        try:
+            f.unlink()
+        except OSError:
+            continue  # still open elsewhere; next time
+        removed += 1
+        freed += size
+        total -= size
+    return {"removed": removed, "freed_bytes": freed, "kept_bytes": total}
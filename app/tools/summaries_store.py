@@ -1,25 +1,157 @@
-import json
+"""
+Local book summaries, served from an SQLite file built from book_summaries.json
+(a JSON array or NDJSON, read one record at a time like ingest does).
 
+Only the titles stay in memory (normalized title -> row id); summary bodies are
+read on demand and the most recent SUMMARIES_CACHE_SIZE of them are kept in a
+small LRU. The database is rebuilt (into a temp file, then swapped in) whenever
+the JSON's size or modification time differs from the one it was built from,
+so every process shares one up-to-date copy and startup no longer parses the
+whole catalog.
+"""
+from __future__ import annotations
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from collections import OrderedDict
 from pathlib import Path
-from typing import Optional
+from typing import Dict, List, Optional
 
-from app.config import BOOK_SUMMARIES_PATH
+from app.config import BOOK_SUMMARIES_PATH, SUMMARIES_DB_PATH, SUMMARIES_CACHE_SIZE
+from app.rag.records import iter_records
+
+_SCHEMA_VERSION = "1"
+
+
+def _source_signature(path: Path) -> str:
+    st = path.stat()
+    return f"{_SCHEMA_VERSION}:{path.resolve()}:{st.st_mtime_ns}:{st.st_size}"
+
+
+def _connect_ro(db: Path, **kwargs) -> sqlite3.Connection:
+    return sqlite3.connect(Path(db).resolve().as_uri() + "?mode=ro", uri=True, **kwargs)
+
+
+def build_summaries_db(source: Path, db_path: Path) -> Path:
+    """
+    Write the catalog's records into a fresh database at db_path. Returns where
+    it ended up: a side file when db_path is still open elsewhere (Windows).
+    """
+    records = iter_records(source)
+    db_path.parent.mkdir(parents=True, exist_ok=True)
+    for old in db_path.parent.glob(f".{db_path.name}.*.tmp"):
+        try:
+            if time.time() - old.stat().st_mtime > 3600:  # not another process's build in progress
+                old.unlink()
+        except OSError:
+            pass  # still open elsewhere
+    tmp = db_path.with_name(f".{db_path.name}.{uuid.uuid4().hex[:8]}.tmp")
+    conn = sqlite3.connect(str(tmp))
+    try:
+        conn.execute("CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+        conn.execute("CREATE TABLE books (id INTEGER PRIMARY KEY, norm_title TEXT NOT NULL, title TEXT NOT NULL, summary TEXT NOT NULL)")
+        conn.executemany(
+            "INSERT INTO books (id, norm_title, title, summary) VALUES (?, ?, ?, ?)",
+            ((i, _norm(r["title"]), r["title"], r["summary"]) for i, r in enumerate(records)),
+        )
+        conn.execute("INSERT INTO meta VALUES ('source', ?)", (_source_signature(Path(source)),))
+        conn.commit()
+    finally:
+        conn.close()
+    try:
+        os.replace(tmp, db_path)  # readers see the old or the new database, never a partial one
+    except PermissionError:
+        return tmp
+    return db_path
+
+
+def _norm(s: str) -> str:
+    return " ".join(s.lower().split())
 
 
 class SummariesStore:
-    def __init__(self, path: Path | None = None):
+    def __init__(self, path: Path | None = None, db_path: Path | None = None, cache_size: int | None = None):
         self.path = Path(path or BOOK_SUMMARIES_PATH)
-        with self.path.open("r", encoding="utf-8") as f:
-            self._records = json.load(f)
-        # map normalized title -> record
-        self._by_title = {self._norm(r["title"]): r for r in self._records}
+        self.db_path = Path(db_path or SUMMARIES_DB_PATH)
+        self.cache_size = SUMMARIES_CACHE_SIZE if cache_size is None else cache_size
+        self._lock = threading.Lock()
+        self._bodies: "OrderedDict[int, str]" = OrderedDict()
+
+        db = self.db_path
+        if self._stored_signature() != _source_signature(self.path):
+            db = build_summaries_db(self.path, self.db_path)
+        self._conn = _connect_ro(db, check_same_thread=False)
+        rows = self._conn.execute("SELECT id, norm_title, title FROM books ORDER BY id").fetchall()
+        self._titles: List[str] = [title for _, _, title in rows]
+        # map normalized title -> row id (later duplicates win)
+        self._by_title: Dict[str, int] = {norm: id_ for id_, norm, _ in rows}
+
+    def _stored_signature(self) -> Optional[str]:
+        if not self.db_path.exists():
+            return None
+        try:
+            conn = _connect_ro(self.db_path)
+            try:
+                row = conn.execute("SELECT value FROM meta WHERE key = 'source'").fetchone()
+            finally:
+                conn.close()
+        except sqlite3.Error:
+            return None  # unreadable or older layout: rebuild
+        return row[0] if row else None
 
     def _norm(self, s: str) -> str:
-        return " ".join(s.lower().split())
+        return _norm(s)
 
     def get_summary_by_title(self, title: str) -> Optional[str]:
-        rec = self._by_title.get(self._norm(title))
-        return rec["summary"] if rec else None
+        id_ = self._by_title.get(self._norm(title))
+        if id_ is None:
+            return None
+        with self._lock:
+            body = self._bodies.get(id_)
+            if body is not None:
+                self._bodies.move_to_end(id_)
+                return body
+            body = self._conn.execute("SELECT summary FROM books WHERE id = ?", (id_,)).fetchone()[0]
+            if self.cache_size > 0:
+                self._bodies[id_] = body
+                if len(self._bodies) > self.cache_size:
+                    self._bodies.popitem(last=False)
+        return body
 
     def titles(self) -> list[str]:
-        return [r["title"] for r in self._records]
+        return list(self._titles)
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    def __del__(self):
+        # A reload in get_store() drops the old store while a request may still
+        # hold it, so the connection is closed when the last reference goes.
+        conn = getattr(self, "_conn", None)
+        if conn is not None:
+            conn.close()
+
+    def __len__(self) -> int:
+        return len(self._titles)
+
+
+# Process-wide store, reloaded when the JSON file changes
+_shared: Optional[SummariesStore] = None
+_shared_sig: Optional[tuple] = None
+_shared_lock = threading.Lock()
+
+
+def get_store() -> SummariesStore:
+    """Return the shared SummariesStore, (re)loading it if the source file changed."""
+    global _shared, _shared_sig
+    st = Path(BOOK_SUMMARIES_PATH).stat()
+    sig = (st.st_mtime_ns, st.st_size)
+    if _shared is not None and sig == _shared_sig:
+        return _shared
+    with _shared_lock:
+        if _shared is None or sig != _shared_sig:
+            _shared, _shared_sig = SummariesStore(), sig
+        return _shared
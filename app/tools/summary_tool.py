@@ -1,19 +1,24 @@
 from __future__ import annotations
 import json
+import threading
 from typing import Optional, Dict, Any
-from openai import OpenAI
 
-from app.config import OPENAI_CHAT_MODEL
-from app.tools.summaries_store import SummariesStore
+from app.config import OPENAI_CHAT_MODEL, SUMMARY_LLM_FALLBACK, SUMMARY_FUZZY_MIN_SCORE
+from app.llm.openai_client import get_client
+from app.tools.summaries_store import SummariesStore, get_store
+from app.tools.title_index import TitleIndex
+from app.tracing import span
 
-_store = SummariesStore()
+_index: Optional[TitleIndex] = None
+_index_store: Optional[SummariesStore] = None
+_index_lock = threading.Lock()
 
 
 def get_summary_by_title(title: str) -> Optional[str]:
     """
     Return the full summary text for an exact title (case-insensitive).
     """
-    return _store.get_summary_by_title(title)
+    return get_store().get_summary_by_title(title)
 
 # OpenAI tool schema
 OPENAI_SUMMARY_TOOL = {
@@ -38,7 +43,7 @@ def call_summary_tool_via_openai(title: str) -> Dict[str, Any]:
     Ask the model to CALL the tool with the provided exact title.
     We then execute the local function and return the summary.
     """
-    client = OpenAI()
+    client = get_client("chat")
 
     system = (
         "You are a function-calling orchestrator. "
@@ -79,4 +84,63 @@ def call_summary_tool_via_openai(title: str) -> Dict[str, Any]:
         "args_title": args_title,
         "summary": summary or "",
         "used_tool": True,
-    }
\ No newline at end of file
+    }
+
+
+def get_title_index() -> TitleIndex:
+    """Fuzzy index over the store's titles, rebuilt when the store is reloaded."""
+    global _index, _index_store
+    store = get_store()
+    with _index_lock:
+        if _index is None or _index_store is not store:
+            _index, _index_store = TitleIndex(store.titles()), store
+        return _index
+
+
+def resolve_summary(title: str, allow_llm_fallback: Optional[bool] = None) -> Dict[str, Any]:
+    """
+    Resolve a title to its full summary without an LLM round trip when possible:
+    exact (normalized) match first, then an unambiguous fuzzy match.
+    The forced tool call is only used as an opt-in fallback.
+    Returns the same shape as call_summary_tool_via_openai, plus "match".
+    """
+    if allow_llm_fallback is None:
+        allow_llm_fallback = SUMMARY_LLM_FALLBACK
+    with span("summary") as s:
+        res = _resolve_summary(title, allow_llm_fallback)
+        s.set(match=res["match"], used_tool=res.get("used_tool", False))
+    return res
+
+
+def _resolve_summary(title: str, allow_llm_fallback: bool) -> Dict[str, Any]:
+    def local(args_title: str, summary: Optional[str], match: str) -> Dict[str, Any]:
+        return {
+            "ok": summary is not None,
+            "requested_title": title,
+            "args_title": args_title,
+            "summary": summary or "",
+            "used_tool": False,
+            "match": match,
+        }
+
+    summary = get_summary_by_title(title)
+    if summary is not None:
+        return local(title, summary, "exact")
+
+    index = get_title_index()
+    exact = index.exact(title)
+    if exact is not None:
+        return local(exact, get_summary_by_title(exact), "exact")
+
+    matches = index.search(title, limit=2)
+    if matches and matches[0][1] >= SUMMARY_FUZZY_MIN_SCORE:
+        # ambiguous if the runner-up is (almost) as good
+        if len(matches) == 1 or matches[0][1] - matches[1][1] >= 0.05:
+            best = matches[0][0]
+            return local(best, get_summary_by_title(best), "fuzzy")
+
+    if allow_llm_fallback:
+        res = call_summary_tool_via_openai(title)
+        res["match"] = "llm"
+        return res
+    return local(title, None, "none")
@@ -0,0 +1,68 @@
+"""
+Fuzzy title index over the local summaries.
+
+Titles are normalized (case, punctuation, whitespace) and indexed by character
+trigrams; a query only gets scored against titles that share trigrams with it,
+so lookups stay cheap as the catalog grows.
+"""
+from __future__ import annotations
+import re
+from collections import defaultdict
+from difflib import SequenceMatcher
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+
+def normalize_title(title: str) -> str:
+    s = re.sub(r"[^\w]+", " ", (title or "").casefold())
+    return " ".join(s.split())
+
+
+def _trigrams(s: str) -> Set[str]:
+    padded = f"  {s} "
+    return {padded[i : i + 3] for i in range(len(padded) - 2)}
+
+
+class TitleIndex:
+    def __init__(self, titles: Iterable[str]):
+        self._titles: List[str] = []
+        self._norm: List[str] = []
+        self._by_norm: Dict[str, str] = {}
+        self._grams: Dict[str, List[int]] = defaultdict(list)
+        for title in titles:
+            norm = normalize_title(title)
+            if not norm or norm in self._by_norm:
+                continue
+            idx = len(self._titles)
+            self._titles.append(title)
+            self._norm.append(norm)
+            self._by_norm[norm] = title
+            for g in _trigrams(norm):
+                self._grams[g].append(idx)
+
+    def __len__(self) -> int:
+        return len(self._titles)
+
+    def exact(self, title: str) -> Optional[str]:
+        """Title with the same normalized form, if any."""
+        return self._by_norm.get(normalize_title(title))
+
+    def search(self, query: str, limit: int = 5, candidates: int = 50) -> List[Tuple[str, float]]:
+        """
+        Best matching titles with a similarity score in [0, 1], highest first.
+        Only the `candidates` titles sharing the most trigrams are fully scored.
+        """
+        norm = normalize_title(query)
+        if not norm:
+            return []
+        shared: Dict[int, int] = defaultdict(int)
+        for g in _trigrams(norm):
+            for idx in self._grams.get(g, ()):
+                shared[idx] += 1
+        top = sorted(shared, key=shared.get, reverse=True)[:candidates]
+
+        scored = [
+            (self._titles[idx], SequenceMatcher(None, norm, self._norm[idx]).ratio())
+            for idx in top
+        ]
+        scored.sort(key=lambda t: t[1], reverse=True)
+        return scored[:limit]
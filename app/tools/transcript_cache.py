@@ -0,0 +1,58 @@
+"""
+Disk-backed transcript cache for speech-to-text.
+
+Entries are keyed by (model, language, hash of the uploaded audio bytes), so a
+clip that Streamlit resubmits on a rerun, or the same file uploaded twice, is
+transcribed once. Stored in a small SQLite file (app/sqlite_lru.py); when it
+grows past `max_entries`, the least recently used rows are evicted.
+"""
+from __future__ import annotations
+import hashlib
+import threading
+from pathlib import Path
+from typing import Optional
+
+from app.config import STT_CACHE_ENABLED, STT_CACHE_MAX_ENTRIES, STT_CACHE_PATH
+from app.sqlite_lru import SqliteLRU
+
+
+def make_transcript_key(data: bytes, model: str, language: str) -> str:
+    h = hashlib.sha256(f"{model}\x00{language}\x00".encode("utf-8"))
+    h.update(data)
+    return h.hexdigest()
+
+
+class TranscriptCache:
+    def __init__(self, path: Path | None = None, max_entries: int | None = None):
+        self.path = Path(path or STT_CACHE_PATH)
+        self.max_entries = max_entries or STT_CACHE_MAX_ENTRIES
+        self._store = SqliteLRU(
+            self.path,
+            "transcripts",
+            self.max_entries,
+            value_column="text",
+            value_type="TEXT",
+            extra_columns=[("audio_bytes", "INTEGER NOT NULL")],
+        )
+
+    def get(self, key: str) -> Optional[str]:
+        return self._store.get(key)
+
+    def put(self, key: str, text: str, audio_bytes: int = 0) -> None:
+        self._store.put(key, text, audio_bytes=audio_bytes)
+
+    def stats(self) -> dict:
+        return self._store.stats()
+
+
+_cache: Optional[TranscriptCache] = None
+_init_lock = threading.Lock()
+
+
+def get_transcript_cache() -> Optional[TranscriptCache]:
+    """Process-wide transcript cache (None when disabled)."""
+    global _cache
+    with _init_lock:
+        if _cache is None and STT_CACHE_ENABLED:
+            _cache = TranscriptCache()
+    return _cache
@@ -1,33 +1,133 @@
+"""
+Text-to-speech with on-disk caching.
+
+Text is split on sentence boundaries into chunks of at most TTS_CHUNK_CHARS
+(the first one shorter, so playback can start early), the chunks are
+synthesized concurrently and reassembled in order. Only formats that
+concatenate cleanly (mp3/aac/pcm) are chunked that finely; wav, flac and opus
+are synthesized in one request (wav longer than the API's input limit is
+remuxed into a single file). Every chunk is cached under
+its own content hash in the audio cache (app/tools/audio_cache.py), so texts
+that share chunks (and a one-chunk text, whose chunk *is* the whole file) reuse
+audio; the cache bounds disk use and makes concurrent requests for the same
+audio wait for one synthesis.
+
+synthesize_to_file() returns the finished file; synthesize_stream() yields each
+chunk's audio as soon as it is playable (or, through iter_bytes(), the bytes as
+they arrive) and reports time-to-first-audio.
+"""
 from __future__ import annotations
-from pathlib import Path
-from typing import Iterable
 import hashlib, json
-from openai import OpenAI
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import closing
+from pathlib import Path
+from typing import Callable, Iterator, List, Optional, Tuple
+
+from app.config import (
+    TTS_MODEL,
+    TTS_VOICE,
+    TTS_FORMAT,
+    TTS_CHUNK_CHARS,
+    TTS_FIRST_CHUNK_CHARS,
+    TTS_MAX_CONCURRENCY,
+)
+from app.llm.openai_client import get_client
+from app.tools.audio_cache import get_audio_cache
+from app.tracing import in_context, span
+
+_SENTENCE_RE = re.compile(r"(?<=[.!?…])\s+")
+# Formats whose files play back to back when concatenated (MP3/ADTS frames, raw
+# PCM). Anything else is synthesized in one request, up to the API's input
+# limit: wav and flac have a header describing the whole file, and joined Ogg
+# Opus files form a chained stream that many players stop after the first link.
+_CONCAT_FORMATS = frozenset({"mp3", "aac", "pcm"})
+_MAX_INPUT_CHARS = 4096
 
-from app.config import TTS_MODEL, TTS_VOICE, TTS_FORMAT, AUDIO_DIR
 
-client = OpenAI()
+def _split_long(sentence: str, max_chars: int) -> List[str]:
+    # A sentence longer than a chunk: break between words, never inside one
+    parts: List[str] = []
+    cur = ""
+    for word in sentence.split():
+        while len(word) > max_chars:  # a single "word" longer than a chunk (e.g. a URL)
+            if cur:
+                parts.append(cur)
+                cur = ""
+            parts.append(word[:max_chars])
+            word = word[max_chars:]
+        if cur and len(cur) + 1 + len(word) > max_chars:
+            parts.append(cur)
+            cur = word
+        else:
+            cur = f"{cur} {word}" if cur else word
+    if cur:
+        parts.append(cur)
+    return parts
 
 
-def _chunk_text(text: str, max_chars: int = 2500) -> list[str]:
-    """Simple character-based chunking (safe for TTS)."""
+def _chunk_text(text: str, max_chars: int | None = None, first_chars: int | None = None) -> list[str]:
+    """
+    Pack whole sentences into chunks of at most max_chars (safe for TTS);
+    the first chunk is capped at first_chars so its audio arrives quickly.
+    """
+    max_chars = max_chars or TTS_CHUNK_CHARS
+    first_chars = min(first_chars or TTS_FIRST_CHUNK_CHARS, max_chars)
     text = (text or "").strip()
     if not text:
         return []
-    return [text[i : i + max_chars] for i in range(0, len(text), max_chars)]
+    chunks: List[str] = []
+    cur = ""
+    for sentence in _SENTENCE_RE.split(text):
+        limit = max_chars if chunks else first_chars
+        pieces = [sentence] if len(sentence) <= limit else _split_long(sentence, limit)
+        for piece in pieces:
+            limit = max_chars if chunks else first_chars
+            if cur and len(cur) + 1 + len(piece) > limit:
+                chunks.append(cur)
+                cur = piece
+            else:
+                cur = f"{cur} {piece}" if cur else piece
+    if cur:
+        chunks.append(cur)
+    return chunks
+
+
+def _chunks_for(text: str, fmt: str) -> List[str]:
+    if fmt in _CONCAT_FORMATS:
+        return _chunk_text(text)
+    return _chunk_text(text, max_chars=_MAX_INPUT_CHARS, first_chars=_MAX_INPUT_CHARS)
+
+
+def _join_audio(parts: List[bytes], fmt: str) -> bytes:
+    """One file from chunk files, in order."""
+    if fmt in _CONCAT_FORMATS:
+        return b"".join(parts)
+    if fmt == "wav":
+        from app.tools.vad import PcmAudio, read_wav  # deferred: pulls in numpy
+
+        audios = [read_wav(p) for p in parts]
+        if any(a is None for a in audios) or len({(a.rate, a.channels, a.sampwidth) for a in audios}) != 1:
+            raise ValueError("TTS returned WAV chunks that cannot be joined.")
+        head = audios[0]
+        return PcmAudio(b"".join(a.frames for a in audios), head.rate, head.channels, head.sampwidth).to_wav()
+    raise ValueError(
+        f"Text too long for a single {fmt} request ({_MAX_INPUT_CHARS} characters); use mp3, aac or wav."
+    )
 
 
 def make_tts_key(text: str, model: str = TTS_MODEL, voice: str = TTS_VOICE, fmt: str = TTS_FORMAT) -> str:
     """Generate a unique key for TTS requests based on text, model, voice, and format."""
     payload = {"t": text, "m": model, "v": voice, "f": fmt}
-    h = hashlib.sha256(json.dumps(payload, sort_keys=True).encode("utf-8")).hexdigest()
-    return h[:12]
+    return hashlib.sha256(json.dumps(payload, sort_keys=True).encode("utf-8")).hexdigest()
 
 
 def _synthesize_chunk_bytes(text: str, *, model: str, voice: str, fmt: str) -> bytes:
     """Call OpenAI TTS for a single chunk; returns raw audio bytes."""
     # Non-streaming; simple and reliable for Streamlit
-    resp = client.audio.speech.create(
+    resp = get_client("speech").audio.speech.create(
         model=model,
         voice=voice,
         input=text,
@@ -36,29 +136,206 @@ def _synthesize_chunk_bytes(text: str, *, model: str, voice: str, fmt: str) -> b
     return resp.read()  # bytes
 
 
-def synthesize_to_file(text: str, *, model: str | None = None, voice: str | None = None, fmt: str | None = None) -> Path:
+def _stream_chunk_bytes(text: str, *, model: str, voice: str, fmt: str) -> Iterator[bytes]:
+    """Call OpenAI TTS for a single chunk, yielding audio bytes as they arrive."""
+    with get_client("speech").audio.speech.with_streaming_response.create(
+        model=model,
+        voice=voice,
+        input=text,
+        response_format=fmt,
+    ) as resp:
+        yield from resp.iter_bytes(16384)
+
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=TTS_MAX_CONCURRENCY, thread_name_prefix="tts")
+    return _executor
+
+
+def _chunk_audio(
+    text: str, *, model: str, voice: str, fmt: str, throttle: Optional[Callable[[], None]] = None
+) -> bytes:
+    """Audio for one chunk, from its cache entry or a fresh synthesis (`throttle` runs before the API call)."""
+    cache = get_audio_cache()
+    key = make_tts_key(text, model=model, voice=voice, fmt=fmt)
+    with cache.lock(key):
+        path = cache.get(key, fmt)
+        if path is not None:
+            return path.read_bytes()
+        if throttle is not None:
+            throttle()
+        data = _synthesize_chunk_bytes(text, model=model, voice=voice, fmt=fmt)
+        cache.put(key, fmt, data, model=model, voice=voice)
+    return data
+
+
+def synthesize_to_file(
+    text: str,
+    *,
+    model: str | None = None,
+    voice: str | None = None,
+    fmt: str | None = None,
+    throttle: Optional[Callable[[], None]] = None,
+) -> Path:
     """
     Create (or return cached) audio file for text using selected voice/model/format.
-    Returns the absolute file path.
+    Chunks are synthesized concurrently; returns the absolute file path.
+    `throttle`, if given, is called before every TTS API request (one per
+    uncached chunk), e.g. a rate limiter's wait().
     """
     if not text or not text.strip():
         raise ValueError("Empty text for TTS.")
+    text = text.strip()
     model = model or TTS_MODEL
     voice = voice or TTS_VOICE
     fmt = fmt or TTS_FORMAT
 
+    cache = get_audio_cache()
     key = make_tts_key(text, model=model, voice=voice, fmt=fmt)
-    out_path = (AUDIO_DIR / f"{key}.{fmt}").resolve()
-    if out_path.exists():
-        return out_path
-
-    chunks = _chunk_text(text)
-    if len(chunks) == 1:
-        audio_bytes = _synthesize_chunk_bytes(chunks[0], model=model, voice=voice, fmt=fmt)
-    else:
-        audio_bytes = b"".join(_synthesize_chunk_bytes(c, model=model, voice=voice, fmt=fmt) for c in chunks)
-
-    out_path.parent.mkdir(parents=True, exist_ok=True)
-    with open(out_path, "wb") as f:
-        f.write(audio_bytes)
-    return out_path
\ No newline at end of file
+    with span("tts", cache_hit=True, chars=len(text), voice=voice) as s, cache.lock(key):
+        path = cache.get(key, fmt)
+        if path is not None:
+            return path
+
+        chunks = _chunks_for(text, fmt)
+        s.set(cache_hit=False, chunks=len(chunks))
+        if len(chunks) == 1:
+            audio_bytes = _chunk_audio(chunks[0], model=model, voice=voice, fmt=fmt, throttle=throttle)
+        else:
+            pool = _get_executor()
+            opts = dict(model=model, voice=voice, fmt=fmt, throttle=throttle)
+            futures = [pool.submit(in_context(_chunk_audio, c, **opts)) for c in chunks]
+            audio_bytes = _join_audio([f.result() for f in futures], fmt)
+        # A one-chunk text's chunk entry is usually the file itself
+        if cache.get(key, fmt) is None:
+            cache.put(key, fmt, audio_bytes, model=model, voice=voice)
+        s.set(bytes=len(audio_bytes))
+    return cache.path_for(key, fmt)
+
+
+class TTSStream:
+    """
+    Streamed synthesis of one text. Iterate to receive playable segments (one
+    per chunk, in order) as soon as each is complete, or use iter_bytes() to
+    receive the audio bytes as they arrive from the API. Either way the first
+    chunk is streamed while the others are synthesized concurrently, and audio
+    is appended to a cache temp file as it arrives and renamed to `path` once
+    complete. Afterwards the timing fields are set (seconds since iteration started).
+    """
+
+    def __init__(self, text: str, *, model: str, voice: str, fmt: str):
+        self.text = text
+        self.model = model
+        self.voice = voice
+        self.fmt = fmt
+        self.key = make_tts_key(text, model=model, voice=voice, fmt=fmt)
+        self.path = get_audio_cache().path_for(self.key, fmt)
+        self.cache_hit = False
+        self.segments = 0
+        self.time_to_first_audio: Optional[float] = None
+        self.total_time: Optional[float] = None
+
+    def __iter__(self) -> Iterator[bytes]:
+        return self._timed(self._segments())
+
+    def iter_bytes(self) -> Iterator[bytes]:
+        """Audio bytes as they arrive; together they are the file at `path`."""
+        return self._timed(self._bytes())
+
+    def _timed(self, out: Iterator[bytes]) -> Iterator[bytes]:
+        t0 = time.perf_counter()
+        with span("tts_stream", cache_hit=False, chars=len(self.text), voice=self.voice) as s:
+            try:
+                for data in out:
+                    if self.time_to_first_audio is None:
+                        self.time_to_first_audio = time.perf_counter() - t0
+                    yield data
+            finally:
+                out.close()  # an abandoned stream discards its temp file now, not at garbage collection
+                self.total_time = time.perf_counter() - t0
+                s.set(cache_hit=self.cache_hit, segments=self.segments, ttfa=self.time_to_first_audio)
+
+    def _segments(self) -> Iterator[bytes]:
+        with closing(self._pieces()) as pieces:
+            buf: List[bytes] = []
+            for _, data, done in pieces:
+                buf.append(data)
+                if done:
+                    yield b"".join(buf)
+                    buf = []
+
+    def _bytes(self) -> Iterator[bytes]:
+        with closing(self._pieces()) as pieces:
+            for _, data, _ in pieces:
+                if data:
+                    yield data
+
+    def _pieces(self) -> Iterator[Tuple[int, bytes, bool]]:
+        # (chunk index, audio bytes, chunk complete), as the bytes arrive
+        opts = dict(model=self.model, voice=self.voice, fmt=self.fmt)
+        cache = get_audio_cache()
+        with cache.lock(self.key):
+            path = cache.get(self.key, self.fmt)
+            if path is not None:
+                self.cache_hit = True
+                self.segments = 1
+                yield 0, path.read_bytes(), True
+                return
+
+            chunks = _chunks_for(self.text, self.fmt)
+            if len(chunks) > 1 and self.fmt not in _CONCAT_FORMATS:
+                # Chunks need remuxing into one file, so there is nothing to play before it is done
+                data = synthesize_to_file(self.text, **opts).read_bytes()
+                self.segments = 1
+                yield 0, data, True
+                return
+            head_key = make_tts_key(chunks[0], **opts)
+            # Later chunks are synthesized while the first one streams in
+            pool = _get_executor()
+            rest = [pool.submit(in_context(_chunk_audio, c, **opts)) for c in chunks[1:]]
+            try:
+                with cache.writer(self.key, self.fmt, model=self.model, voice=self.voice) as f:
+                    head_path = cache.get(head_key, self.fmt) if head_key != self.key else None
+                    if head_path is not None:
+                        head = head_path.read_bytes()
+                        f.write(head)
+                        self.segments = 1
+                        yield 0, head, True
+                    else:
+                        pieces = []
+                        for piece in _stream_chunk_bytes(chunks[0], **opts):
+                            f.write(piece)
+                            f.flush()
+                            pieces.append(piece)
+                            yield 0, piece, False
+                        if head_key != self.key:  # one chunk: the file being written is its entry
+                            cache.put(head_key, self.fmt, b"".join(pieces), model=self.model, voice=self.voice)
+                        self.segments = 1
+                        yield 0, b"", True
+                    for i, fut in enumerate(rest, start=1):
+                        seg = fut.result()
+                        f.write(seg)
+                        f.flush()
+                        self.segments += 1
+                        yield i, seg, True
+            except BaseException:  # includes GeneratorExit when the consumer stops early
+                for fut in rest:
+                    fut.cancel()
+                raise
+
+
+def synthesize_stream(text: str, *, model: str | None = None, voice: str | None = None, fmt: str | None = None) -> TTSStream:
+    """
+    Streaming variant of synthesize_to_file(); iterate the result for playable
+    segments, then use its `path`.
+    """
+    if not text or not text.strip():
+        raise ValueError("Empty text for TTS.")
+    return TTSStream(text.strip(), model=model or TTS_MODEL, voice=voice or TTS_VOICE, fmt=fmt or TTS_FORMAT)
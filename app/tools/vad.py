@@ -0,0 +1,190 @@
+"""
+Energy-based voice activity detection over PCM WAV audio.
+
+Used to split long recordings into segments that can be transcribed
+independently: the audio is scored in short frames by RMS level (dBFS), frames
+near the recording's noise floor count as silence, and cuts are placed in the
+middle of the longest silence inside each segment's window. Where a window has
+no silence at all, the cut goes at its quietest frame and neighbouring segments
+overlap slightly, so no word is lost (the transcripts are de-duplicated when
+stitched). compact() shrinks a recording before upload: mono, 16-bit, at most
+the target sample rate, with leading and trailing silence trimmed. Only
+uncompressed PCM WAV is handled; anything else returns None from read_wav() and
+is sent as is.
+"""
+from __future__ import annotations
+import io
+import wave
+from dataclasses import dataclass
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+FRAME_MS = 30
+SILENCE_MARGIN_DB = 10.0  # how far above the noise floor still counts as silence
+MIN_SILENCE_DB = -60.0  # always silence below this, however clean the recording
+
+_DTYPES = {1: np.uint8, 2: "<i2", 4: "<i4"}
+
+
+@dataclass
+class PcmAudio:
+    frames: bytes
+    rate: int
+    channels: int
+    sampwidth: int
+
+    @property
+    def duration(self) -> float:
+        return len(self.frames) / (self.rate * self.channels * self.sampwidth)
+
+    @property
+    def bytes_per_second(self) -> int:
+        return self.rate * self.channels * self.sampwidth
+
+    def to_wav(self, start: float = 0.0, end: Optional[float] = None) -> bytes:
+        """Encode the [start, end) seconds as a standalone WAV file."""
+        step = self.channels * self.sampwidth
+        a = int(start * self.rate) * step
+        b = len(self.frames) if end is None else min(len(self.frames), int(end * self.rate) * step)
+        buf = io.BytesIO()
+        with wave.open(buf, "wb") as w:
+            w.setnchannels(self.channels)
+            w.setsampwidth(self.sampwidth)
+            w.setframerate(self.rate)
+            w.writeframes(self.frames[a:b])
+        return buf.getvalue()
+
+
+def read_wav(data: bytes) -> Optional[PcmAudio]:
+    """Parse PCM WAV bytes; None for other formats (or WAV flavours we can't slice)."""
+    try:
+        with wave.open(io.BytesIO(data), "rb") as w:
+            audio = PcmAudio(w.readframes(w.getnframes()), w.getframerate(), w.getnchannels(), w.getsampwidth())
+    except (wave.Error, EOFError):
+        return None
+    if audio.sampwidth not in _DTYPES or not audio.rate or not audio.frames:
+        return None
+    return audio
+
+
+def to_float_mono(audio: PcmAudio) -> np.ndarray:
+    """Samples in [-1, 1], channels averaged."""
+    x = np.frombuffer(audio.frames, dtype=_DTYPES[audio.sampwidth]).astype(np.float32)
+    if audio.sampwidth == 1:
+        x -= 128.0  # 8-bit WAV is unsigned
+    x /= float(2 ** (8 * audio.sampwidth - 1))
+    return x[: len(x) - len(x) % audio.channels].reshape(-1, audio.channels).mean(axis=1)
+
+
+def from_float_mono(x: np.ndarray, rate: int) -> PcmAudio:
+    pcm = (np.clip(x, -1.0, 1.0) * 32767).astype("<i2")
+    return PcmAudio(pcm.tobytes(), rate, 1, 2)
+
+
+def frame_levels(audio: PcmAudio, frame_ms: int = FRAME_MS) -> np.ndarray:
+    """RMS level per frame in dBFS (mono mix); a trailing partial frame is dropped."""
+    x = to_float_mono(audio)
+    n = max(1, audio.rate * frame_ms // 1000)
+    k = len(x) // n
+    if k == 0:
+        return np.zeros(0, dtype=np.float32)
+    rms = np.sqrt(np.mean(np.square(x[: k * n].reshape(k, n)), axis=1))
+    return 20.0 * np.log10(np.maximum(rms, 1e-10))
+
+
+def silent_frames(levels: np.ndarray, margin_db: float = SILENCE_MARGIN_DB) -> np.ndarray:
+    """Boolean mask of frames at (or near) the recording's noise floor."""
+    if not len(levels):
+        return np.zeros(0, dtype=bool)
+    floor = float(np.percentile(levels, 10))
+    loud = float(np.percentile(levels, 90))
+    # Near the floor but well below the loud (speech) level; anything under MIN_SILENCE_DB regardless
+    threshold = max(min(floor + margin_db, loud - margin_db), MIN_SILENCE_DB)
+    return levels <= threshold
+
+
+def _longest_run(mask: np.ndarray) -> Optional[Tuple[int, int]]:
+    best: Optional[Tuple[int, int]] = None
+    start = None
+    for i, v in enumerate(mask.tolist() + [False]):
+        if v and start is None:
+            start = i
+        elif not v and start is not None:
+            if best is None or i - start > best[1] - best[0]:
+                best = (start, i)
+            start = None
+    return best
+
+
+def plan_segments(
+    audio: PcmAudio,
+    max_seconds: float,
+    overlap_seconds: float = 1.0,
+    frame_ms: int = FRAME_MS,
+) -> List[Tuple[float, float]]:
+    """
+    (start, end) seconds of segments no longer than max_seconds (plus half the
+    overlap where a cut falls inside speech), cut at silences where possible.
+    """
+    total = audio.duration
+    if total <= max_seconds:
+        return [(0.0, total)]
+    levels = frame_levels(audio, frame_ms)
+    silent = silent_frames(levels)
+    frame_s = frame_ms / 1000.0
+
+    segments: List[Tuple[float, float]] = []
+    start = 0.0
+    while total - start > max_seconds:
+        # Look for a cut in the second half of the window, so segments stay reasonably long
+        lo = int((start + max_seconds / 2) / frame_s)
+        hi = max(lo + 1, int((start + max_seconds) / frame_s))
+        run = _longest_run(silent[lo:hi])
+        if run is not None:
+            cut = (lo + (run[0] + run[1]) / 2) * frame_s
+            segments.append((start, cut))
+            start = cut
+        else:
+            window = levels[lo:hi]
+            cut = (lo + int(np.argmin(window)) + 0.5) * frame_s if len(window) else start + max_seconds
+            half = overlap_seconds / 2
+            segments.append((start, min(total, cut + half)))
+            start = cut - half
+    segments.append((start, total))
+    return segments
+
+
+def _resample(x: np.ndarray, src: int, dst: int) -> np.ndarray:
+    # Box filter against aliasing, then linear interpolation; plenty for speech recognition
+    width = int(np.ceil(src / dst))
+    if width > 1:
+        x = np.convolve(x, np.ones(width, dtype=np.float32) / width, mode="same")
+    n = int(len(x) * dst / src)
+    return np.interp(np.arange(n) * (src / dst), np.arange(len(x)), x).astype(np.float32)
+
+
+def trim_silence(audio: PcmAudio, pad_seconds: float = 0.2, frame_ms: int = FRAME_MS) -> PcmAudio:
+    """Drop leading/trailing silence, keeping `pad_seconds` around the speech."""
+    levels = frame_levels(audio, frame_ms)
+    voiced = np.flatnonzero(~silent_frames(levels))
+    step = audio.channels * audio.sampwidth
+    if not len(voiced):
+        return PcmAudio(b"", audio.rate, audio.channels, audio.sampwidth)
+    frame_s = frame_ms / 1000.0
+    start = max(0.0, voiced[0] * frame_s - pad_seconds)
+    end = (voiced[-1] + 1) * frame_s + pad_seconds
+    a = int(start * audio.rate) * step
+    b = min(len(audio.frames), int(end * audio.rate) * step)
+    return PcmAudio(audio.frames[a:b], audio.rate, audio.channels, audio.sampwidth)
+
+
+def compact(audio: PcmAudio, max_rate: int = 16000) -> PcmAudio:
+    """Mono 16-bit PCM at no more than max_rate, with leading/trailing silence trimmed."""
+    if audio.channels != 1 or audio.sampwidth != 2 or audio.rate > max_rate:
+        x = to_float_mono(audio)
+        rate = audio.rate
+        if rate > max_rate:
+            x, rate = _resample(x, rate, max_rate), max_rate
+        audio = from_float_mono(x, rate)
+    return trim_silence(audio)
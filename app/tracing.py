@@ -0,0 +1,264 @@
+"""
+Lightweight per-stage tracing.
+
+    with start_trace("request") as trace:       # one per user message
+        with span("embedding", cache_hit=False) as s:
+            ...
+            s.set(tokens=12)
+
+Every finished span feeds a rolling window per stage name (p50/p95/p99 via
+latency_summary()), whether or not a trace is active. Spans opened while a
+trace is active are also collected on it, including spans from worker threads
+when the task was submitted with `in_context(...)`. Finished traces are
+appended to TRACE_EXPORT_PATH as JSON lines when that is set, and
+`start_trace(profile=True)` runs cProfile over the calling thread and over
+every `in_context(...)` task, merging them into one report.
+"""
+from __future__ import annotations
+import contextvars
+import cProfile
+import functools
+import io
+import json
+import pstats
+import sys
+import threading
+import time
+import uuid
+from collections import defaultdict, deque
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Deque, Dict, Iterator, List, Optional
+
+from app.config import TRACE_ENABLED, TRACE_EXPORT_PATH, TRACE_WINDOW
+
+
+@dataclass
+class Span:
+    name: str
+    start: float  # epoch seconds
+    duration: float = 0.0  # seconds
+    attrs: Dict[str, Any] = field(default_factory=dict)  # tokens, cache_hit, ...
+    error: Optional[str] = None
+    thread: str = ""
+
+    def set(self, **attrs: Any) -> "Span":
+        self.attrs.update(attrs)
+        return self
+
+
+@dataclass
+class Trace:
+    name: str
+    trace_id: str = field(default_factory=lambda: uuid.uuid4().hex[:16])
+    start: float = field(default_factory=time.time)
+    duration: float = 0.0
+    spans: List[Span] = field(default_factory=list)
+    error: Optional[str] = None
+    profile: Optional[str] = None  # pstats report when profiled
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False, compare=False)
+    _profiling: bool = field(default=False, repr=False, compare=False)
+    _task_profiles: List[cProfile.Profile] = field(default_factory=list, repr=False, compare=False)
+
+    def add(self, s: Span) -> None:
+        with self._lock:
+            self.spans.append(s)
+
+    def _add_profile(self, prof: cProfile.Profile) -> None:
+        with self._lock:
+            self._task_profiles.append(prof)
+
+    def timings(self) -> Dict[str, float]:
+        """Total seconds per stage name (stages hit more than once are summed)."""
+        out: Dict[str, float] = defaultdict(float)
+        with self._lock:
+            for s in self.spans:
+                out[s.name] += s.duration
+        return dict(out)
+
+    def to_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            spans = [asdict(s) for s in self.spans]
+        return {
+            "trace_id": self.trace_id,
+            "name": self.name,
+            "start": self.start,
+            "duration": self.duration,
+            "error": self.error,
+            "spans": spans,
+        }
+
+
+class LatencyStats:
+    """Rolling window of span durations per stage name."""
+
+    def __init__(self, window: int = TRACE_WINDOW):
+        self.window = window
+        self._samples: Dict[str, Deque[float]] = {}
+        self._errors: Dict[str, int] = defaultdict(int)
+        self._lock = threading.Lock()
+
+    def add(self, name: str, duration: float, error: bool = False) -> None:
+        with self._lock:
+            self._samples.setdefault(name, deque(maxlen=self.window)).append(duration)
+            if error:
+                self._errors[name] += 1
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        """name -> {"n", "p50", "p95", "p99", "errors"} (seconds)."""
+        with self._lock:
+            snap = {name: sorted(d) for name, d in self._samples.items()}
+            errors = dict(self._errors)
+        out = {}
+        for name, s in snap.items():
+            pct = lambda p: s[min(len(s) - 1, int(round(p / 100 * (len(s) - 1))))]
+            out[name] = {"n": len(s), "p50": pct(50), "p95": pct(95), "p99": pct(99), "errors": errors.get(name, 0)}
+        return out
+
+    def clear(self) -> None:
+        with self._lock:
+            self._samples.clear()
+            self._errors.clear()
+
+
+_stats = LatencyStats()
+_current: contextvars.ContextVar[Optional[Trace]] = contextvars.ContextVar("trace", default=None)
+_export_lock = threading.Lock()
+
+
+def current_trace() -> Optional[Trace]:
+    return _current.get()
+
+
+def latency_summary() -> Dict[str, Dict[str, float]]:
+    """Rolling p50/p95/p99 per stage over the last TRACE_WINDOW spans."""
+    return _stats.summary()
+
+
+def get_latency_stats() -> LatencyStats:
+    return _stats
+
+
+@contextmanager
+def span(name: str, **attrs: Any) -> Iterator[Span]:
+    """
+    Time the enclosed block as stage `name`. Exceptions are recorded on the
+    span (by type name) and re-raised.
+    """
+    s = Span(name=name, start=time.time(), attrs=dict(attrs), thread=threading.current_thread().name)
+    t0 = time.perf_counter()
+    try:
+        yield s
+    except BaseException as e:
+        s.error = type(e).__name__
+        raise
+    finally:
+        s.duration = time.perf_counter() - t0
+        if TRACE_ENABLED:
+            _stats.add(name, s.duration, error=s.error is not None)
+            trace = _current.get()
+            if trace is not None:
+                trace.add(s)
+
+
+def traced(name: Optional[str] = None) -> Callable:
+    """Decorator form of span(); the stage name defaults to the function name."""
+
+    def decorate(fn: Callable) -> Callable:
+        stage = name or fn.__name__
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(stage):
+                return fn(*args, **kwargs)
+
+        return wrapper
+
+    return decorate
+
+
+def in_context(fn: Callable, *args, **kwargs) -> Callable[[], Any]:
+    """
+    Bind fn(*args) to the caller's context, so spans it opens on a worker
+    thread land in the caller's trace: `pool.submit(in_context(fn, x))`.
+    """
+    ctx = contextvars.copy_context()
+    trace = _current.get()
+    if trace is not None and trace._profiling:
+        return lambda: ctx.run(_profiled, trace, fn, *args, **kwargs)
+    return lambda: ctx.run(fn, *args, **kwargs)
+
+
+def _profiled(trace: Trace, fn: Callable, *args, **kwargs) -> Any:
+    # Worker threads are not covered by the caller's profiler: profile the task
+    # on its own and hand the result to the trace. A task run inline on an
+    # already profiled thread is left to that thread's profiler.
+    if sys.getprofile() is not None:
+        return fn(*args, **kwargs)
+    prof = cProfile.Profile()
+    try:
+        prof.enable()
+    except ValueError:  # another profiler is already active
+        return fn(*args, **kwargs)
+    try:
+        return fn(*args, **kwargs)
+    finally:
+        prof.disable()
+        trace._add_profile(prof)
+
+
+def export_jsonl(trace: Trace, path: Path) -> None:
+    """Append one finished trace as a JSON line."""
+    path = Path(path)
+    line = json.dumps(trace.to_dict(), ensure_ascii=False, default=str)
+    with _export_lock:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with path.open("a", encoding="utf-8") as f:
+            f.write(line + "\n")
+
+
+@contextmanager
+def start_trace(name: str = "request", profile: bool = False, top: int = 30) -> Iterator[Trace]:
+    """
+    Collect every span opened in this context (and in tasks submitted with
+    in_context()) into one Trace. With `profile=True` the calling thread and
+    those tasks run under cProfile, and `trace.profile` holds the `top` entries
+    of the merged stats by cumulative time (worker time adds to the totals, so
+    they can exceed the request's wall time).
+    """
+    trace = Trace(name=name)
+    token = _current.set(trace)
+    prof = cProfile.Profile() if profile else None
+    t0 = time.perf_counter()
+    if prof is not None:
+        try:
+            prof.enable()
+        except ValueError:  # another profiler is already active
+            prof = None
+    trace._profiling = prof is not None
+    try:
+        yield trace
+    except BaseException as e:
+        trace.error = type(e).__name__
+        raise
+    finally:
+        if prof is not None:
+            prof.disable()
+            trace._profiling = False
+            buf = io.StringIO()
+            stats = pstats.Stats(prof, stream=buf)
+            with trace._lock:
+                workers = list(trace._task_profiles)
+            for p in workers:
+                stats.add(p)
+            print(f"Merged: calling thread + {len(workers)} worker task(s)", file=buf)
+            stats.sort_stats("cumulative").print_stats(top)
+            trace.profile = buf.getvalue()
+        trace.duration = time.perf_counter() - t0
+        _current.reset(token)
+        if TRACE_ENABLED and TRACE_EXPORT_PATH is not None:
+            try:
+                export_jsonl(trace, TRACE_EXPORT_PATH)
+            except OSError:
+                pass  # tracing must never break a request
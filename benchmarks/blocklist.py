@@ -0,0 +1,87 @@
+"""
+Throughput of the local blocklist engine against the regex alternation it replaced.
+
+For each term-list size a synthetic blocklist is compiled both ways and used to
+scan a large clean text (worst case: no early exit). Reports build time and
+scan throughput in MB/s as JSON.
+
+Usage:
+    python -m benchmarks.blocklist --terms 100 1000 10000 --text-kb 256
+"""
+from __future__ import annotations
+import argparse
+import json
+import random
+import re
+import string
+import time
+from typing import Dict, List
+
+from app.guards.blocklist import Blocklist, normalize_for_matching
+
+
+def make_terms(n: int, seed: int = 3) -> List[str]:
+    rng = random.Random(seed)
+    return ["".join(rng.choice(string.ascii_lowercase) for _ in range(rng.randint(5, 10))) for _ in range(n)]
+
+
+def make_text(kb: int, seed: int = 5) -> str:
+    # Words from a different alphabet mix so nothing matches and every byte is scanned
+    rng = random.Random(seed)
+    words = ["".join(rng.choice("aeioubcdfg") for _ in range(rng.randint(2, 9))) for _ in range(500)]
+    out: List[str] = []
+    size = 0
+    while size < kb * 1024:
+        w = rng.choice(words).capitalize() if rng.random() < 0.1 else rng.choice(words)
+        out.append(w)
+        size += len(w) + 1
+    return " ".join(out)
+
+
+def _best_of(fn, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def run(term_counts: List[int], text_kb: int, repeat: int) -> Dict[str, dict]:
+    text = make_text(text_kb)
+    mb = len(text.encode("utf-8")) / 1e6
+    results: Dict[str, dict] = {
+        "normalize": {"mb_per_s": mb / _best_of(lambda: normalize_for_matching(text), repeat)}
+    }
+    for n in term_counts:
+        terms = make_terms(n)
+        t0 = time.perf_counter()
+        engine = Blocklist((t, "xx") for t in terms)
+        build_ac = time.perf_counter() - t0
+        t0 = time.perf_counter()
+        regex = re.compile(r"\b(" + "|".join(map(re.escape, terms)) + r")\b", flags=re.IGNORECASE)
+        build_re = time.perf_counter() - t0
+
+        assert engine.search(text) is None and regex.search(text) is None
+        scan_ac = _best_of(lambda: engine.search(text), repeat)
+        scan_re = _best_of(lambda: regex.search(text), repeat)
+        results[str(n)] = {
+            "automaton_build_ms": build_ac * 1000,
+            "automaton_mb_per_s": mb / scan_ac,
+            "regex_build_ms": build_re * 1000,
+            "regex_mb_per_s": mb / scan_re,
+        }
+    return results
+
+
+def main(argv: List[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Blocklist engine throughput vs. regex alternation.")
+    parser.add_argument("--terms", type=int, nargs="+", default=[100, 1000, 10000])
+    parser.add_argument("--text-kb", type=int, default=256)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args(argv)
+    print(json.dumps(run(args.terms, args.text_kb, args.repeat), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,260 @@
+"""
+Offline end-to-end benchmarks (no OPENAI_API_KEY needed).
+
+Every OpenAI call goes through app.llm.stub_client.StubOpenAI, which returns
+deterministic embeddings/completions after a configurable simulated latency.
+For each catalog size a synthetic catalog is generated and every stage is
+measured in a fresh subprocess (config is read at import time):
+
+    ingest (rebuild + no-op incremental), BooksRetriever.search (vector,
+    title short-circuit, numpy backend, search_many), SummariesStore lookups,
+    moderation, TTS caching and the full recommendation pipeline.
+
+Usage:
+    python -m benchmarks.run --sizes 100 1000 5000 --out bench.json
+    python -m benchmarks.run --sizes 200 --latency-scale 0   # CPU overhead only
+"""
+from __future__ import annotations
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable, Dict, List
+
+ROOT = Path(__file__).resolve().parents[1]
+
+_WORDS = (
+    "magic friendship war dragon winter island empire detective secret garden ocean "
+    "revolution family memory journey forest city machine love betrayal kingdom "
+    "river storm ghost library school mountain desert rebellion prophecy orphan "
+    "sister brother letter crown sword ship star planet robot plague village "
+    "murder mystery courage hope grief music painter soldier queen thief"
+).split()
+
+
+def make_catalog(n: int, seed: int = 7) -> List[dict]:
+    rng = random.Random(seed)
+    books = []
+    for i in range(n):
+        title = f"The {rng.choice(_WORDS).title()} of {rng.choice(_WORDS).title()} {i}"
+        sentences = [
+            " ".join(rng.choice(_WORDS) for _ in range(rng.randint(8, 14))).capitalize() + "."
+            for _ in range(6)
+        ]
+        books.append({"title": title, "summary": " ".join(sentences)})
+    return books
+
+
+def stats(samples: List[float]) -> Dict[str, float]:
+    s = sorted(samples)
+    pct = lambda p: s[min(len(s) - 1, int(round(p / 100 * (len(s) - 1))))]
+    total = sum(s)
+    return {
+        "n": len(s),
+        "mean_ms": 1000 * statistics.fmean(s),
+        "p50_ms": 1000 * pct(50),
+        "p95_ms": 1000 * pct(95),
+        "p99_ms": 1000 * pct(99),
+        "ops_per_s": len(s) / total if total > 0 else float("inf"),
+    }
+
+
+def timed(fn: Callable, args_list: List[tuple]) -> Dict[str, float]:
+    samples = []
+    for args in args_list:
+        t0 = time.perf_counter()
+        fn(*args)
+        samples.append(time.perf_counter() - t0)
+    return stats(samples)
+
+
+def run_size(size: int, repeat: int, latency_scale: float) -> Dict[str, dict]:
+    """Child-process body: env already points every path at a scratch directory."""
+    from app.llm.stub_client import StubOpenAI, install_stub
+
+    stub = StubOpenAI(latency_scale=latency_scale)
+    install_stub(stub)
+
+    from app.config import BOOK_SUMMARIES_PATH, NUMPY_INDEX_PATH
+    from app.guards.moderation import check_message, check_messages, moderation_stats
+    from app.pipeline import RecommendationPipeline
+    from app.rag import ingest
+    from app.rag.retriever import BooksRetriever, get_retriever
+    from app.tools.summaries_store import SummariesStore
+    from app.tools.summary_tool import resolve_summary
+    from app.tools.tts import synthesize_stream, synthesize_to_file
+
+    books = json.loads(Path(BOOK_SUMMARIES_PATH).read_text(encoding="utf-8"))
+    rng = random.Random(size)
+    out: Dict[str, dict] = {}
+
+    # Ingest: full rebuild, then an incremental run with nothing to do
+    t0 = time.perf_counter()
+    ingest.main(["--rebuild", "--export-numpy"])
+    out["ingest_rebuild"] = {**stats([time.perf_counter() - t0]), "books": size}
+    t0 = time.perf_counter()
+    ingest.main([])
+    out["ingest_noop"] = stats([time.perf_counter() - t0])
+
+    theme_queries = [" ".join(rng.sample(_WORDS, 4)) for _ in range(repeat)]
+    title_queries = [rng.choice(books)["title"] for _ in range(repeat)]
+
+    # Retrieval (cold embeddings: the stub's latency is paid on first sight of a query)
+    t0 = time.perf_counter()
+    retriever = get_retriever()
+    out["retriever_open"] = stats([time.perf_counter() - t0])
+    out["search_theme"] = timed(retriever.search, [(q,) for q in theme_queries])
+    out["search_theme_cached_embedding"] = timed(retriever.search, [(q,) for q in theme_queries])
+    out["search_title"] = timed(retriever.search, [(q,) for q in title_queries])
+
+    t0 = time.perf_counter()
+    fast = BooksRetriever(path=NUMPY_INDEX_PATH, backend="numpy")
+    out["numpy_open"] = stats([time.perf_counter() - t0])
+    out["search_theme_numpy"] = timed(fast.search, [(q,) for q in theme_queries])
+
+    batch = [" ".join(rng.sample(_WORDS, 3)) for _ in range(repeat * 4)]
+    t0 = time.perf_counter()
+    retriever.search_many(batch)
+    elapsed = time.perf_counter() - t0
+    out["search_many"] = {**stats([elapsed]), "queries": len(batch), "queries_per_s": len(batch) / elapsed}
+
+    # Summaries
+    t0 = time.perf_counter()
+    store = SummariesStore()
+    out["summaries_load"] = stats([time.perf_counter() - t0])
+    out["summaries_lookup"] = timed(store.get_summary_by_title, [(q,) for q in title_queries * 20])
+    out["summary_resolve_fuzzy"] = timed(resolve_summary, [(q[:-1] + "x",) for q in title_queries])
+
+    # Moderation (clean + flagged)
+    msgs = theme_queries + ["I will kill you", "this is shit"] * (repeat // 4 + 1)
+    out["moderation"] = timed(check_message, [(m,) for m in msgs])
+    out["moderation_repeat"] = timed(check_message, [(m,) for m in msgs])
+    out["moderation_batch"] = {**timed(check_messages, [(batch,)]), "inputs": len(batch)}
+    out["moderation_stats"] = moderation_stats()
+
+    # TTS: cold synthesis vs. cache hit
+    texts = [b["summary"] for b in books[: max(3, repeat // 4)]]
+    out["tts_cold"] = timed(synthesize_to_file, [(t,) for t in texts])
+    before = stub.calls["speech"]
+    out["tts_cached"] = {**timed(synthesize_to_file, [(t,) for t in texts]), "api_calls": stub.calls["speech"] - before}
+
+    # Streaming TTS on uncached texts: time to the first playable segment (and to
+    # the first bytes, for consumers that can play a growing stream) vs. the whole file
+    ttfa, first_bytes, full = [], [], []
+    for t in texts:
+        stream = synthesize_stream(t, voice="bench-stream")
+        for _ in stream:
+            pass
+        ttfa.append(stream.time_to_first_audio)
+        full.append(stream.total_time)
+        stream = synthesize_stream(t, voice="bench-stream-bytes")
+        for _ in stream.iter_bytes():
+            pass
+        first_bytes.append(stream.time_to_first_audio)
+    out["tts_stream_first_audio"] = stats(ttfa)
+    out["tts_stream_first_bytes"] = stats(first_bytes)
+    out["tts_stream_total"] = stats(full)
+
+    # Full recommendation flow; every other query is a reordered paraphrase
+    pipeline = RecommendationPipeline()
+    flow = []
+    for q in theme_queries:
+        words = q.split()
+        flow.append(q)
+        flow.append(" ".join(reversed(words)))
+    out["recommendation_e2e"] = timed(pipeline.run, [(q,) for q in flow + title_queries])
+
+    out["stub_calls"] = dict(stub.calls)
+    return out
+
+
+def _child_env(size: int, workdir: Path) -> Dict[str, str]:
+    data = workdir / "book_summaries.json"
+    data.write_text(json.dumps(make_catalog(size)), encoding="utf-8")
+    env = dict(os.environ)
+    env.update({
+        "OPENAI_API_KEY": env.get("OPENAI_API_KEY") or "sk-offline-benchmark",  # never used: stubbed
+        "BOOK_SUMMARIES_PATH": str(data),
+        "CHROMADB_PATH": str(workdir / "chroma"),
+        "LEXICAL_INDEX_PATH": str(workdir / "lexical_index.json"),
+        "SUMMARIES_DB_PATH": str(workdir / "summaries.sqlite3"),
+        "INGEST_CHECKPOINT_PATH": str(workdir / "ingest.checkpoint.json"),
+        "STT_CACHE_PATH": str(workdir / "stt_cache.sqlite3"),
+        "NUMPY_INDEX_PATH": str(workdir / "numpy_index"),
+        "EMBED_CACHE_PATH": str(workdir / "embed_cache.sqlite3"),
+        "AUDIO_DIR": str(workdir / "audio"),
+        "MIC_DIR": str(workdir / "mic"),
+        "MODERATION_ENABLED": "true",
+        "MODERATION_PROVIDER": "openai",
+        "PYTHONPATH": str(ROOT) + os.pathsep + env.get("PYTHONPATH", ""),
+    })
+    return env
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "HEAD"], cwd=ROOT, text=True).strip()
+    except Exception:
+        return "unknown"
+
+
+def main(argv: List[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Offline Smart Librarian benchmarks (stub OpenAI backend).")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1000, 5000], help="catalog sizes")
+    parser.add_argument("--repeat", type=int, default=20, help="queries per measured stage")
+    parser.add_argument("--latency-scale", type=float, default=1.0, help="multiplier on simulated API latency")
+    parser.add_argument("--out", type=Path, help="write JSON results here (default: stdout)")
+    parser.add_argument("--child", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.child is not None:
+        # Quiet the ingest progress output; the parent only reads our JSON
+        real_stdout, sys.stdout = sys.stdout, sys.stderr
+        try:
+            result = run_size(args.child, args.repeat, args.latency_scale)
+        finally:
+            sys.stdout = real_stdout
+        print(json.dumps(result))
+        return
+
+    report = {
+        "meta": {
+            "commit": _git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "repeat": args.repeat,
+            "latency_scale": args.latency_scale,
+        },
+        "results": {},
+    }
+    for size in args.sizes:
+        with tempfile.TemporaryDirectory(prefix=f"bench_{size}_") as tmp:
+            print(f"[bench] catalog size {size} ...", file=sys.stderr, flush=True)
+            proc = subprocess.run(
+                [sys.executable, "-m", "benchmarks.run", "--child", str(size),
+                 "--repeat", str(args.repeat), "--latency-scale", str(args.latency_scale)],
+                cwd=ROOT, env=_child_env(size, Path(tmp)), capture_output=True, text=True,
+            )
+            if proc.returncode != 0:
+                sys.stderr.write(proc.stderr)
+                raise SystemExit(f"benchmark for size {size} failed")
+            report["results"][str(size)] = json.loads(proc.stdout.strip().splitlines()[-1])
+
+    text = json.dumps(report, indent=2)
+    if args.out:
+        args.out.write_text(text, encoding="utf-8")
+        print(f"[bench] wrote {args.out}", file=sys.stderr)
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
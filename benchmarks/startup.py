@@ -0,0 +1,122 @@
+"""
+Cold-start profile of the app's entry points.
+
+Each target is imported in a fresh interpreter under `-X importtime`; the
+report gives the wall time of the import (best of --repeat runs), the import
+time per top-level package (self time, so nothing is counted twice) and the
+slowest individual modules by cumulative time. Heavy dependencies that should
+only load on first use (chromadb, openai, numpy) are flagged when a target pulls them in.
+
+Usage:
+    python -m benchmarks.startup                       # all default targets
+    python -m benchmarks.startup --targets ui ingest --top 10 --json
+"""
+from __future__ import annotations
+import argparse
+import json
+import os
+import re
+import subprocess
+import sys
+from collections import defaultdict
+from pathlib import Path
+from typing import Dict, List
+
+ROOT = Path(__file__).resolve().parents[1]
+
+# name -> modules imported together (the UI group mirrors app_streamlit's imports, minus streamlit)
+TARGETS: Dict[str, List[str]] = {
+    "config": ["app.config"],
+    "ui": [
+        "app.config", "app.rag.retriever", "app.llm.openai_client", "app.guards.moderation",
+        "app.llm.semantic_cache", "app.tools.summaries_store", "app.pipeline", "app.tracing",
+        "app.tools.audio_cache", "app.tools.tts", "app.tools.stt",
+    ],
+    "ingest": ["app.rag.ingest"],
+    "pregen_audio": ["app.tools.pregen_audio"],
+}
+DEFERRED = ("chromadb", "openai", "numpy")
+
+_LINE_RE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)")
+
+
+def parse_importtime(stderr: str) -> List[dict]:
+    """One dict per `-X importtime` line: module, self_us, cumulative_us, depth."""
+    rows = []
+    for line in stderr.splitlines():
+        m = _LINE_RE.match(line)
+        if m:
+            rows.append({
+                "module": m.group(4),
+                "self_us": int(m.group(1)),
+                "cumulative_us": int(m.group(2)),
+                "depth": len(m.group(3)) // 2,
+            })
+    return rows
+
+
+def profile_target(modules: List[str], repeat: int = 3) -> dict:
+    code = (
+        "import sys, time; t = time.perf_counter(); "
+        + "; ".join(f"import {m}" for m in modules)
+        + "; print(time.perf_counter() - t); print(','.join(sorted(sys.modules)))"
+    )
+    env = {**os.environ, "PYTHONPATH": str(ROOT) + os.pathsep + os.environ.get("PYTHONPATH", "")}
+    best = None
+    for _ in range(max(1, repeat)):
+        proc = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", code],
+            cwd=ROOT, env=env, capture_output=True, text=True, check=True,
+        )
+        wall = float(proc.stdout.splitlines()[0])
+        if best is None or wall < best[0]:
+            best = (wall, proc)
+    wall, proc = best
+    rows = parse_importtime(proc.stderr)
+    loaded = set(proc.stdout.splitlines()[1].split(","))
+    by_package: Dict[str, int] = defaultdict(int)
+    for r in rows:
+        by_package[r["module"].split(".")[0]] += r["self_us"]
+    return {
+        "wall_ms": wall * 1000,
+        "modules": len(rows),
+        "by_package_ms": {k: v / 1000 for k, v in sorted(by_package.items(), key=lambda kv: -kv[1])},
+        "slowest": sorted(rows, key=lambda r: -r["cumulative_us"]),
+        "heavy_loaded": [m for m in DEFERRED if m in loaded],
+    }
+
+
+def format_report(results: Dict[str, dict], top: int) -> str:
+    lines = []
+    for name, res in results.items():
+        lines.append(f"== {name}: {res['wall_ms']:.0f} ms, {res['modules']} modules")
+        if res["heavy_loaded"]:
+            lines.append(f"   heavy imports loaded eagerly: {', '.join(res['heavy_loaded'])}")
+        lines.append("   by package (self ms):")
+        for pkg, ms in list(res["by_package_ms"].items())[:top]:
+            lines.append(f"     {ms:9.1f}  {pkg}")
+        lines.append("   slowest modules (cumulative ms):")
+        for r in res["slowest"][:top]:
+            lines.append(f"     {r['cumulative_us'] / 1000:9.1f}  {r['module']}")
+    return "\n".join(lines)
+
+
+def main(argv: List[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Import-time profile of Smart Librarian entry points.")
+    parser.add_argument("--targets", nargs="+", default=list(TARGETS), help=f"any of {', '.join(TARGETS)} or module names")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per target (best is reported)")
+    parser.add_argument("--top", type=int, default=15, help="rows per table")
+    parser.add_argument("--json", action="store_true", help="print JSON instead of a table")
+    args = parser.parse_args(argv)
+
+    results = {t: profile_target(TARGETS.get(t, [t]), args.repeat) for t in args.targets}
+    if args.json:
+        for res in results.values():
+            res["slowest"] = res["slowest"][: args.top]
+        print(json.dumps(results, indent=2))
+    else:
+        print(format_report(results, args.top))
+
+
+if __name__ == "__main__":
+    main()
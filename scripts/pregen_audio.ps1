@@ -0,0 +1,10 @@
+<# Pre-generate TTS audio for every summary in data/book_summaries.json (resumable) #>
+$ErrorActionPreference = "Stop"
+
+# Activate venv if present
+if (Test-Path "$PSScriptRoot\..\.\venv\Scripts\Activate.ps1") {
+    . "$PSScriptRoot\..\.\venv\Scripts\Activate.ps1"
+}
+
+# Run pre-generation; extra arguments are passed through (e.g. --short --workers 4)
+python -m app.tools.pregen_audio @args
@@ -0,0 +1,79 @@
+import os
+import threading
+import time
+
+from app.llm.openai_client import set_client_factory
+from app.llm.stub_client import StubOpenAI
+from app.tools import audio_cache, tts
+from app.tools.audio_cache import AudioCache
+
+
+def test_put_and_get_round_trip_with_manifest(tmp_path):
+    cache = AudioCache(tmp_path, max_bytes=10_000)
+    assert cache.get("k1", "mp3") is None
+    path = cache.put("k1", "mp3", b"x" * 100, model="m", voice="alloy")
+    assert cache.get("k1", "mp3") == path
+    assert path.read_bytes() == b"x" * 100
+    assert not list(tmp_path.glob("*.part"))
+    s = cache.stats()
+    assert (s["entries"], s["bytes"], s["hits"], s["misses"]) == (1, 100, 1, 1)
+
+    reopened = AudioCache(tmp_path)  # the manifest survives restarts
+    assert reopened.stats()["bytes"] == 100
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path):
+    cache = AudioCache(tmp_path, max_bytes=350)
+    for key in ("a", "b", "c"):
+        cache.put(key, "mp3", b"x" * 100)
+        time.sleep(0.01)
+    cache.get("a", "mp3")  # "b" is now the oldest
+    cache.put("d", "mp3", b"x" * 100)
+
+    assert cache.get("b", "mp3") is None
+    assert cache.get("a", "mp3") is not None and cache.get("d", "mp3") is not None
+    assert cache.stats()["bytes"] <= 350 and cache.evictions >= 1
+
+
+def test_failed_write_leaves_nothing_behind(tmp_path):
+    cache = AudioCache(tmp_path)
+    try:
+        with cache.writer("k", "mp3") as f:
+            f.write(b"partial")
+            raise RuntimeError("synthesis failed")
+    except RuntimeError:
+        pass
+    assert cache.get("k", "mp3") is None
+    assert [p.name for p in tmp_path.iterdir() if not p.name.startswith(audio_cache.INDEX_FILE)] == []
+
+
+def test_prune_adopts_legacy_files_and_removes_stale_parts(tmp_path):
+    (tmp_path / "0123456789ab.mp3").write_bytes(b"x" * 50)  # short key from before the manifest
+    stale = tmp_path / ".old.deadbeef.part"
+    stale.write_bytes(b"x")
+    os.utime(stale, (time.time() - 7200, time.time() - 7200))
+
+    cache = AudioCache(tmp_path)
+    result = cache.prune(max_bytes=10)
+    assert result["adopted"] == 1 and result["stale_parts"] == 1 and result["evicted"] == 1
+    assert not stale.exists() and cache.stats()["entries"] == 0
+
+
+def test_concurrent_requests_for_the_same_text_synthesize_once(tmp_path, monkeypatch):
+    stub = StubOpenAI(latency={"speech": 0.1})
+    set_client_factory(lambda: stub)
+    monkeypatch.setattr(audio_cache, "_cache", AudioCache(tmp_path))
+    try:
+        paths = []
+        threads = [
+            threading.Thread(target=lambda: paths.append(tts.synthesize_to_file("Hello there.")))
+            for _ in range(4)
+        ]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+    finally:
+        set_client_factory(None)
+    assert stub.calls["speech"] == 1
+    assert len(set(paths)) == 1 and len(paths[0].stem) == 64  # full sha256 key
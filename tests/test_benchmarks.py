@@ -0,0 +1,30 @@
+import json
+import subprocess
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+
+
+def test_offline_benchmark_runs_without_api(tmp_path):
+    out = tmp_path / "bench.json"
+    subprocess.run(
+        [sys.executable, "-m", "benchmarks.run", "--sizes", "30", "--repeat", "3",
+         "--latency-scale", "0", "--out", str(out)],
+        cwd=ROOT, check=True, capture_output=True, timeout=300,
+    )
+    report = json.loads(out.read_text(encoding="utf-8"))
+    res = report["results"]["30"]
+    for stage in ("ingest_rebuild", "search_theme", "search_title", "moderation", "tts_cached", "recommendation_e2e"):
+        assert res[stage]["n"] >= 1 and res[stage]["p95_ms"] >= 0
+    # Cached TTS replays must not reach the API
+    assert res["tts_cached"]["api_calls"] == 0
+
+
+def test_app_imports_defer_heavy_dependencies():
+    from benchmarks.startup import TARGETS, profile_target
+
+    for target in ("ui", "ingest", "pregen_audio"):
+        res = profile_target(TARGETS[target], repeat=1)
+        assert res["heavy_loaded"] == [], target  # chromadb / openai / numpy load on first use
+        assert res["modules"] > 0 and res["by_package_ms"]
@@ -0,0 +1,94 @@
+import os
+
+from app.guards import blocklist as bl
+from app.guards.blocklist import Blocklist, normalize_for_matching
+
+
+def test_normalization_handles_case_diacritics_and_leetspeak():
+    assert normalize_for_matching("Sh1t!") == "shit"
+    assert normalize_for_matching("PULĂ  mea") == "pula mea"
+    assert normalize_for_matching("N@sty, h3ll0 — top 10 books!") == "nasty hello top 10 books"
+    # leading symbols are leetspeak too
+    assert normalize_for_matching("$hit") == "shit"
+    assert normalize_for_matching("@sshole, a$$") == "asshole ass"
+    # non-Latin scripts keep their words
+    assert normalize_for_matching("Ты ДУРАК!") == "ты дурак"
+
+
+def test_matches_whole_words_and_phrases():
+    engine = Blocklist([("shit", "en"), ("nesimțit", "ro"), ("bad apple", "en"), ("apple pie", "en")])
+    assert engine.search("oh SH1T") is not None
+    assert engine.search("shitake mushrooms") is None  # whole words only
+    assert engine.search("ce nesimtit").lang == "ro"
+    # overlapping phrases are all reported
+    assert [m.term for m in engine.find_all("a bad apple pie")] == ["bad apple", "apple pie"]
+    assert engine.search("bad, apple!") is not None
+
+
+def test_leading_leet_symbols_and_non_latin_terms_match():
+    engine = Blocklist([("shit", "en"), ("asshole", "en"), ("дурак", "ru")])
+    assert engine.search("oh $hit") is not None
+    assert engine.search("you @sshole") is not None
+    assert engine.search("ты дурак").lang == "ru"
+    assert engine.search("ты дураки") is None  # whole words only
+
+
+def test_terms_without_letters_are_skipped(caplog):
+    with caplog.at_level("WARNING", logger=bl.__name__):
+        engine = Blocklist([("!!!", "en"), ("idiot", "en")])
+    assert len(engine) == 1
+    assert "'!!!'" in caplog.text
+
+
+def test_loads_per_language_files_and_hot_reloads(tmp_path, monkeypatch):
+    (tmp_path / "en.txt").write_text("# comment\nidiot\n", encoding="utf-8")
+    (tmp_path / "ro.txt").write_text("prost\n", encoding="utf-8")
+    assert len(Blocklist.from_dir(tmp_path, langs=["en"])) == 1
+
+    monkeypatch.setattr(bl, "MODERATION_BLOCKLIST_DIR", tmp_path)
+    monkeypatch.setattr(bl, "MODERATION_BLOCKLIST_LANGS", [])
+    monkeypatch.setattr(bl, "MODERATION_BLOCKLIST_RELOAD_SECONDS", 0.0)
+    monkeypatch.setattr(bl, "_blocklist", None)
+    assert bl.get_blocklist().search("you prost") is not None
+    assert bl.get_blocklist().search("what a dolt") is None
+
+    path = tmp_path / "en.txt"
+    path.write_text("idiot\ndolt\n", encoding="utf-8")
+    os.utime(path, ns=(path.stat().st_atime_ns, path.stat().st_mtime_ns + 10**9))
+    assert bl.get_blocklist().search("what a dolt") is not None
+
+
+def test_shipped_lists_cover_the_previous_terms():
+    engine = Blocklist.from_dir(bl.MODERATION_BLOCKLIST_DIR)
+    for word in ("fuck", "shit", "bitch", "asshole", "idiot", "moron", "pula", "dracu", "fut", "jigodie", "nesimtit", "prost"):
+        assert engine.search(f"you {word.upper()}!") is not None
+
+
+def _touch_later(path):
+    os.utime(path, ns=(path.stat().st_atime_ns, path.stat().st_mtime_ns + 10**9))
+
+
+def test_reload_survives_bad_terms_and_failed_loads(tmp_path, monkeypatch, caplog):
+    path = tmp_path / "en.txt"
+    path.write_text("idiot\n", encoding="utf-8")
+    monkeypatch.setattr(bl, "MODERATION_BLOCKLIST_DIR", tmp_path)
+    monkeypatch.setattr(bl, "MODERATION_BLOCKLIST_LANGS", [])
+    monkeypatch.setattr(bl, "MODERATION_BLOCKLIST_RELOAD_SECONDS", 0.0)
+    monkeypatch.setattr(bl, "_blocklist", None)
+    assert bl.get_blocklist().search("you idiot") is not None
+
+    # a term with nothing to match is skipped; the rest of the file still loads
+    path.write_text("idiot\n***\ndolt\n", encoding="utf-8")
+    _touch_later(path)
+    with caplog.at_level("WARNING", logger=bl.__name__):
+        assert bl.get_blocklist().search("hello") is None
+    assert bl.get_blocklist().search("what a dolt") is not None
+    assert "'***'" in caplog.text
+
+    # an unreadable file keeps the last good blocklist and is retried on the next check
+    path.write_bytes(b"\xff\xfe\xff")
+    _touch_later(path)
+    assert bl.get_blocklist().search("what a dolt") is not None
+    path.write_text("idiot\n", encoding="utf-8")
+    _touch_later(path)
+    assert bl.get_blocklist().search("what a dolt") is None
@@ -0,0 +1,42 @@
+from types import SimpleNamespace
+
+import pytest
+
+from app.llm import openai_client
+from app.llm.openai_client import get_async_client, get_client, set_client_factory
+
+
+@pytest.fixture
+def restore_factory():
+    yield
+    set_client_factory(None)
+
+
+def test_one_pool_shared_by_all_operations(monkeypatch, restore_factory):
+    monkeypatch.setenv("OPENAI_API_KEY", "sk-test")
+    set_client_factory(None)
+
+    base = get_client()
+    assert get_client() is base
+    chat, speech = get_client("chat"), get_client("speech")
+    assert get_client("chat") is chat  # views are cached per operation
+    assert chat._client is base._client and speech._client is base._client  # same HTTP pool
+    assert speech.timeout.read == openai_client.OPERATION_TIMEOUTS["speech"]
+    assert base.max_retries == openai_client.OPENAI_MAX_RETRIES
+
+    async_chat = get_async_client("chat")
+    assert async_chat._client is get_async_client()._client
+
+
+def test_factory_is_swappable(restore_factory):
+    built = []
+
+    def factory():
+        stub = SimpleNamespace(with_options=lambda **_: stub)
+        built.append(stub)
+        return stub
+
+    set_client_factory(factory)
+    assert get_client("moderation") is get_client("embeddings") is built[0]
+    set_client_factory(factory)  # swapping again drops the previous client
+    assert get_client() is built[1]
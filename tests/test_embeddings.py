@@ -0,0 +1,107 @@
+from app.llm.embed_cache import EmbeddingCache, make_embed_key
+
+
+def test_cache_hit_and_miss(tmp_path):
+    cache = EmbeddingCache(path=tmp_path / "cache.sqlite3")
+    assert cache.get("cozy fantasy", "m") is None
+    cache.put("cozy fantasy", "m", [0.5, -1.0, 2.0])
+    assert cache.get("cozy fantasy", "m") == [0.5, -1.0, 2.0]
+    stats = cache.stats()
+    assert stats["hits"] == 1 and stats["misses"] == 1
+
+
+def test_cache_key_normalizes_whitespace_and_separates_models():
+    assert make_embed_key("  cozy   fantasy\n", "m") == make_embed_key("cozy fantasy", "m")
+    assert make_embed_key("cozy fantasy", "m1") != make_embed_key("cozy fantasy", "m2")
+
+
+def test_cache_evicts_least_recently_used(tmp_path):
+    cache = EmbeddingCache(path=tmp_path / "cache.sqlite3", max_entries=10)
+    for i in range(10):
+        cache.put(f"text {i}", "m", [float(i)])
+    cache.get("text 0", "m")  # touch: most recently used now
+    cache.put("text 10", "m", [10.0])
+    assert cache.get("text 0", "m") == [0.0]
+    assert cache.get("text 1", "m") is None
+    assert cache.stats()["entries"] <= 10
+
+
+class _FakeEmbeddings:
+    def __init__(self, fail_first: int = 0):
+        self.calls = []
+        self.fail_first = fail_first
+
+    def create(self, model, input):
+        from types import SimpleNamespace
+        from openai import RateLimitError
+
+        if self.fail_first:
+            self.fail_first -= 1
+            err = RateLimitError.__new__(RateLimitError)
+            err.response = SimpleNamespace(headers={"retry-after": "0.01"})
+            raise err
+        batch = [input] if isinstance(input, str) else list(input)
+        self.calls.append(batch)
+        # deterministic "vector": text length + position; returned out of order on purpose
+        data = [SimpleNamespace(index=i, embedding=[float(len(t)), float(i)]) for i, t in enumerate(batch)]
+        return SimpleNamespace(data=list(reversed(data)))
+
+
+class _FakeClient:
+    def __init__(self, **kw):
+        self.embeddings = _FakeEmbeddings(**kw)
+
+    def with_options(self, **_):
+        return self
+
+
+def _use_fake_client(monkeypatch, tmp_path, **kw):
+    from app.llm import openai_client
+
+    fake = _FakeClient(**kw)
+    monkeypatch.setattr(openai_client, "_client", fake)
+    monkeypatch.setattr(openai_client, "_embed_cache", EmbeddingCache(path=tmp_path / "c.sqlite3"))
+    monkeypatch.setattr(openai_client.time, "sleep", lambda s: None)
+    return openai_client, fake
+
+
+def test_embed_texts_batches_in_order_and_dedupes(monkeypatch, tmp_path):
+    oc, fake = _use_fake_client(monkeypatch, tmp_path)
+    texts = ["a", "bb", "ccc", "a", "dddd"]
+    vecs = oc.embed_texts(texts, batch_size=2, max_concurrency=2)
+    assert [v[0] for v in vecs] == [1.0, 2.0, 3.0, 1.0, 4.0]
+    assert sorted(len(b) for b in fake.embeddings.calls) == [2, 2]  # 4 unique texts, 2 per request
+
+    # second run is served entirely from the cache
+    fake.embeddings.calls.clear()
+    assert oc.embed_texts(texts, batch_size=2) == vecs
+    assert fake.embeddings.calls == []
+
+
+def test_embed_texts_retries_rate_limits(monkeypatch, tmp_path):
+    oc, fake = _use_fake_client(monkeypatch, tmp_path, fail_first=2)
+    assert oc.embed_texts(["hello"])[0][0] == 5.0
+    assert len(fake.embeddings.calls) == 1
+
+
+def test_chat_stream_collects_text_and_timings(monkeypatch):
+    from types import SimpleNamespace
+    from app.llm import openai_client
+
+    def chunk(content):
+        return SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=content))])
+
+    class _Completions:
+        def create(self, **kwargs):
+            assert kwargs["stream"] is True
+            return iter([SimpleNamespace(choices=[]), chunk("Hello"), chunk(None), chunk(" world")])
+
+    fake = SimpleNamespace(chat=SimpleNamespace(completions=_Completions()))
+    fake.with_options = lambda **_: fake
+    monkeypatch.setattr(openai_client, "_client", fake)
+
+    stream = openai_client.chat_stream([{"role": "user", "content": "hi"}])
+    assert list(stream) == ["Hello", " world"]
+    assert stream.text == "Hello world"
+    assert stream.time_to_first_token is not None
+    assert stream.total_time >= stream.time_to_first_token
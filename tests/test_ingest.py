@@ -0,0 +1,142 @@
+import json
+
+from app.rag import ingest
+from app.rag.lexical import LexicalIndex
+
+
+def _fake_embed(calls):
+    def embed(docs, **_):
+        calls.append(list(docs))
+        return [[float(len(d)), 1.0] for d in docs]
+    return embed
+
+
+def test_diff_hashes_classifies_records():
+    diff = ingest.diff_hashes(
+        existing={"a": "1", "b": "2", "c": "3"},
+        incoming={"a": "1", "b": "changed", "d": "4"},
+    )
+    assert diff.added == ["d"]
+    assert diff.changed == ["b"]
+    assert diff.removed == ["c"]
+    assert diff.unchanged == 1
+
+
+def test_incremental_ingest_only_embeds_changes(monkeypatch, tmp_path):
+    data = tmp_path / "books.json"
+    books = [
+        {"title": "Book One", "summary": "First. Story."},
+        {"title": "Book Two", "summary": "Second story."},
+    ]
+    data.write_text(json.dumps(books), encoding="utf-8")
+    calls = []
+    monkeypatch.setattr(ingest, "BOOK_SUMMARIES_PATH", data)
+    monkeypatch.setattr(ingest, "CHROMADB_PATH", tmp_path / "chroma")
+    monkeypatch.setattr(ingest, "embed_texts", _fake_embed(calls))
+    monkeypatch.setattr(ingest, "LEXICAL_INDEX_PATH", tmp_path / "lexical.json")
+    monkeypatch.setattr(ingest, "INGEST_CHECKPOINT_PATH", tmp_path / "ingest.checkpoint.json")
+
+    ingest.main([])
+    assert len(calls[-1]) == 2
+
+    # change one book, drop the other, add a new one
+    books = [
+        {"title": "Book One", "summary": "First. Story, revised."},
+        {"title": "Book Three", "summary": "Third story."},
+    ]
+    data.write_text(json.dumps(books), encoding="utf-8")
+    ingest.main([])
+    assert sorted(d.splitlines()[0] for d in calls[-1]) == ["Title: Book One", "Title: Book Three"]
+
+    import chromadb
+    col = chromadb.PersistentClient(path=str(tmp_path / "chroma")).get_collection(ingest.CHROMA_COLLECTION)
+    assert sorted(col.get()["ids"]) == ["book-one", "book-three"]
+
+    # nothing changed -> nothing embedded
+    n = len(calls)
+    ingest.main([])
+    assert len(calls) == n
+
+
+def test_iter_records_streams_json_arrays_and_ndjson(tmp_path):
+    books = [
+        {"title": "Tricky, [one]", "summary": "Braces {} and \"quotes\", commas ]."},
+        {"title": "Ünïcode", "summary": "Ça va."},
+        {"title": "Third", "summary": "x" * 50},
+    ]
+    arr = tmp_path / "books.json"
+    arr.write_text("\n  " + json.dumps(books, indent=2, ensure_ascii=False), encoding="utf-8")
+    assert list(ingest.iter_records(arr, chunk_size=7)) == books  # records straddle read chunks
+
+    nd = tmp_path / "books.ndjson"
+    nd.write_text("\n".join(json.dumps(b) for b in books) + "\n\n", encoding="utf-8")
+    assert list(ingest.iter_records(nd)) == books
+
+
+def test_lexical_index_is_collected_from_the_batches(monkeypatch, tmp_path):
+    data = tmp_path / "books.ndjson"
+    books = [
+        {"title": "Dune", "summary": "Spice and sandworms."},
+        {"title": "Emma", "summary": "Matchmaking in Highbury."},
+        {"title": "DUNE", "summary": "Desert planet politics."},  # same id, later record wins
+    ]
+    data.write_text("\n".join(json.dumps(b) for b in books) + "\n", encoding="utf-8")
+    monkeypatch.setattr(ingest, "BOOK_SUMMARIES_PATH", data)
+    monkeypatch.setattr(ingest, "CHROMADB_PATH", tmp_path / "chroma")
+    monkeypatch.setattr(ingest, "embed_texts", _fake_embed([]))
+    monkeypatch.setattr(ingest, "LEXICAL_INDEX_PATH", tmp_path / "lexical.json")
+    monkeypatch.setattr(ingest, "INGEST_CHECKPOINT_PATH", tmp_path / "ingest.checkpoint.json")
+    reads = []
+    read = ingest.iter_records
+    monkeypatch.setattr(ingest, "iter_records", lambda path: reads.append(path) or read(path))
+
+    ingest.main(["--batch-size", "1"])
+    assert reads == [data]  # one pass over the catalog
+
+    index = LexicalIndex.load(tmp_path / "lexical.json")
+    assert [d["id"] for d in index.docs] == ["dune", "emma"]
+    assert index.item(index.search("desert planet")[0][0])["title"] == "DUNE"
+    assert index.search("sandworms") == []
+    assert index.docs == ingest.build_lexical_index(books).docs
+
+
+def test_interrupted_rebuild_resumes_from_checkpoint(monkeypatch, tmp_path):
+    data = tmp_path / "books.json"
+    data.write_text(json.dumps([{"title": "Old", "summary": "Old book."}]), encoding="utf-8")
+    ckpt_path = tmp_path / "ingest.checkpoint.json"
+    calls = []
+    monkeypatch.setattr(ingest, "BOOK_SUMMARIES_PATH", data)
+    monkeypatch.setattr(ingest, "CHROMADB_PATH", tmp_path / "chroma")
+    monkeypatch.setattr(ingest, "LEXICAL_INDEX_PATH", tmp_path / "lexical.json")
+    monkeypatch.setattr(ingest, "INGEST_CHECKPOINT_PATH", ckpt_path)
+    monkeypatch.setattr(ingest, "embed_texts", _fake_embed(calls))
+    ingest.main([])
+
+    books = [{"title": f"Book {i}", "summary": f"Story {i}."} for i in range(5)]
+    data.write_text(json.dumps(books), encoding="utf-8")
+    embed = _fake_embed(calls)
+
+    def flaky(docs, **kw):
+        if len(calls) == 2:  # the second batch of the rebuild fails
+            raise RuntimeError("rate limited")
+        return embed(docs, **kw)
+
+    monkeypatch.setattr(ingest, "embed_texts", flaky)
+    try:
+        ingest.main(["--rebuild", "--batch-size", "2"])
+    except RuntimeError:
+        pass
+    assert json.loads(ckpt_path.read_text())["records_done"] == 2
+
+    import chromadb
+    client = chromadb.PersistentClient(path=str(tmp_path / "chroma"))
+    assert client.get_collection(ingest.CHROMA_COLLECTION).get()["ids"] == ["old"]  # live data untouched
+
+    monkeypatch.setattr(ingest, "embed_texts", embed)
+    ingest.main(["--rebuild", "--batch-size", "2"])
+    assert [len(c) for c in calls[2:]] == [2, 1]  # only the unfinished records
+    col = client.get_collection(ingest.CHROMA_COLLECTION)
+    assert sorted(col.get()["ids"]) == [f"book-{i}" for i in range(5)]
+    assert not ckpt_path.exists()
+    assert len(LexicalIndex.load(tmp_path / "lexical.json")) == 5  # resumed records are indexed too
+    assert [c.name for c in client.list_collections()] == [ingest.CHROMA_COLLECTION]
@@ -1,4 +1,5 @@
 import os
+import time
 import pytest
 from app.guards.moderation import check_message
 
@@ -14,3 +15,61 @@ def test_local_blocks_basic_profanity():
 def test_openai_moderation_runs():
     res = check_message("I will kill you")  # usually flagged for violence/threat
     assert res.flagged and res.provider == "openai+local"  # Checks if message went past both filters
+
+
+def _stub_moderation(monkeypatch):
+    from app.guards import moderation
+    from app.llm.openai_client import set_client_factory
+    from app.llm.stub_client import StubOpenAI
+
+    stub = StubOpenAI(latency_scale=0)
+    set_client_factory(lambda: stub)
+    monkeypatch.setattr(moderation, "MODERATION_ENABLED", True)
+    monkeypatch.setattr(moderation, "MODERATION_PROVIDER", "openai")
+    monkeypatch.setattr(moderation, "_cache", moderation.ModerationCache())
+    return moderation, stub
+
+
+@pytest.fixture
+def restore_client():
+    from app.llm.openai_client import set_client_factory
+
+    yield
+    set_client_factory(None)
+
+
+def test_blocklist_short_circuits_the_api(monkeypatch, restore_client):
+    moderation, stub = _stub_moderation(monkeypatch)
+    res = moderation.check_message("this is shit")
+    assert res.flagged and res.provider == "local"
+    assert stub.calls["moderation"] == 0
+    assert moderation.moderation_stats()["short_circuit_rate"] == 1.0
+
+
+def test_verdicts_are_cached_by_normalized_text(monkeypatch, restore_client):
+    moderation, stub = _stub_moderation(monkeypatch)
+    first = moderation.check_message("I will kill you")
+    again = moderation.check_message("  i will KILL   you ")
+    assert first.flagged and again.flagged and again.cached
+    assert stub.calls["moderation"] == 1
+    stats = moderation.moderation_stats()
+    assert stats["cache_hits"] == 1 and stats["api_calls"] == 1
+
+
+def test_batch_sends_distinct_unknown_texts_in_one_request(monkeypatch, restore_client):
+    moderation, stub = _stub_moderation(monkeypatch)
+    texts = ["cozy fantasy", "murder mystery", "Cozy  fantasy", "you idiot", "space opera"]
+    results = moderation.check_messages(texts)
+    assert [r.flagged for r in results] == [False, True, False, True, False]
+    assert results[3].provider == "local"
+    assert stub.calls["moderation"] == 1
+    assert moderation.moderation_stats()["api_inputs"] == 3
+
+
+def test_cache_entries_expire():
+    from app.guards.moderation import ModerationCache, ModerationResult
+
+    cache = ModerationCache(ttl_seconds=0.0)
+    cache.put("k", ModerationResult(True, False, "openai", []))
+    time.sleep(0.01)
+    assert cache.get("k") is None
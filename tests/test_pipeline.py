@@ -0,0 +1,134 @@
+import time
+
+from app import pipeline as pl
+from app.guards.moderation import ModerationResult
+from app.llm.semantic_cache import SemanticCache
+
+
+class _FakeRetriever:
+    def __init__(self):
+        self.calls = 0
+
+    def search_by_embedding(self, q_emb, top_k=None):
+        self.calls += 1
+        return [{"id": "b", "title": "Book", "document": "Title: Book\nSummary: Nice.", "distance": 0.1}]
+
+    def lexical_hit(self, query, top_k=None):
+        if query == "Book":
+            return [{"id": "b", "title": "Book", "document": "Title: Book\nSummary: Nice.", "distance": None}]
+        return None
+
+    def fuse(self, query, items, top_k=None):
+        return items
+
+
+def _slow(value, delay=0.2):
+    def fn(*args, **kwargs):
+        time.sleep(delay)
+        return value
+    return fn
+
+
+def _patch_stages(monkeypatch, flagged=False):
+    retriever = _FakeRetriever()
+    mod = ModerationResult(allowed=not flagged, flagged=flagged, provider="test", categories=[])
+    monkeypatch.setattr(pl, "check_message", _slow(mod))
+    monkeypatch.setattr(pl, "embed_text", _slow([1.0, 0.0]))
+    monkeypatch.setattr(pl, "get_retriever", lambda: retriever)
+    monkeypatch.setattr(pl, "chat_once", _slow("A lovely pick."))
+    monkeypatch.setattr(pl, "resolve_summary", _slow({"ok": True, "summary": "Full."}))
+    cache = SemanticCache(threshold=0.95)
+    monkeypatch.setattr(pl, "get_semantic_cache", lambda: cache)
+    return retriever
+
+
+def test_pipeline_overlaps_independent_stages(monkeypatch):
+    _patch_stages(monkeypatch)
+    t0 = time.perf_counter()
+    res = pl.RecommendationPipeline().run("cozy fantasy")
+    elapsed = time.perf_counter() - t0
+
+    assert res.reply == "A lovely pick."
+    assert res.summary["ok"] is True
+    # four 0.2s stages on two parallel branches -> ~0.4s, not ~0.8s
+    assert elapsed < 0.7
+    assert {"moderation", "embedding", "search", "chat", "summary"} <= set(res.timings)
+
+
+def test_pipeline_stops_when_flagged(monkeypatch):
+    retriever = _patch_stages(monkeypatch, flagged=True)
+    res = pl.RecommendationPipeline().run("bad words")
+    assert res.flagged
+    assert res.items == [] and res.reply == ""
+    assert retriever.calls == 0
+
+
+def test_recommend_stream_yields_tokens_and_records_ttft(monkeypatch):
+    _patch_stages(monkeypatch)
+
+    class _Stream:
+        text = ""
+        time_to_first_token = None
+        total_time = None
+
+        def __iter__(self):
+            for tok in ["A ", "lovely ", "pick."]:
+                if self.time_to_first_token is None:
+                    self.time_to_first_token = 0.01
+                self.text += tok
+                yield tok
+            self.total_time = 0.02
+
+    monkeypatch.setattr(pl, "chat_stream", lambda messages: _Stream())
+    p = pl.RecommendationPipeline()
+    res = p.retrieve("cozy fantasy")
+    tokens = list(p.recommend_stream(res))
+
+    assert tokens == ["A ", "lovely ", "pick."]
+    assert res.reply == "A lovely pick."
+    assert res.summary["ok"] is True
+    assert res.timings["chat_ttft"] == 0.01
+
+
+def test_paraphrased_query_reuses_cached_reply(monkeypatch):
+    _patch_stages(monkeypatch)
+    calls = []
+    monkeypatch.setattr(pl, "chat_once", lambda messages: calls.append(messages) or "A lovely pick.")
+    p = pl.RecommendationPipeline()
+
+    first = p.run("cozy fantasy about friendship")
+    monkeypatch.setattr(pl, "embed_text", lambda q: [0.99, 0.05])  # near-identical direction
+    second = p.run("friendship fantasy, cozy")
+
+    assert len(calls) == 1
+    assert not first.reply_cached and second.reply_cached
+    assert second.reply == "A lovely pick."
+
+
+def test_semantic_cache_threshold_ttl_and_lru():
+    cache = SemanticCache(threshold=0.9, ttl_seconds=60, max_entries=2)
+    cache.store([1.0, 0.0], "Dune", "reply-a")
+    assert cache.lookup([2.0, 0.1], "Dune") == "reply-a"  # scale-invariant, cos ~0.999
+    assert cache.lookup([0.0, 1.0], "Dune") is None  # orthogonal
+    assert cache.lookup([1.0, 0.0], "Emma") is None  # other title
+
+    cache.store([0.0, 1.0], "Emma", "reply-b")
+    cache.store([1.0, 1.0], "Ulysses", "reply-c")  # evicts least recently used (Dune)
+    assert cache.lookup([1.0, 0.0], "Dune") is None
+    assert cache.stats()["evictions"] == 1
+
+    cache.ttl_seconds = -1  # everything is stale now
+    assert cache.lookup([0.0, 1.0], "Emma") is None
+    assert cache.stats()["expired"] == 1
+
+
+def test_title_query_skips_embedding(monkeypatch):
+    retriever = _patch_stages(monkeypatch)
+
+    def no_embedding(query):
+        raise AssertionError("should not embed a title query")
+
+    monkeypatch.setattr(pl, "embed_text", no_embedding)
+    res = pl.RecommendationPipeline().run("Book")
+    assert res.best["title"] == "Book" and retriever.calls == 0
+    assert res.query_embedding is None and res.reply == "A lovely pick."
@@ -0,0 +1,83 @@
+import json
+
+import pytest
+
+from app.llm.openai_client import set_client_factory
+from app.llm.stub_client import StubOpenAI
+from app.tools import audio_cache, pregen_audio, tts
+
+BOOKS = [
+    {"title": "Book A", "summary": "First sentence of A. Second sentence. Third one. Fourth and last."},
+    {"title": "Book B", "summary": "B has a single sentence."},
+]
+
+
+@pytest.fixture
+def stub(tmp_path, monkeypatch):
+    stub = StubOpenAI(latency_scale=0)
+    set_client_factory(lambda: stub)
+    monkeypatch.setattr(audio_cache, "_cache", audio_cache.AudioCache(tmp_path / "audio"))
+    yield stub
+    set_client_factory(None)
+
+
+def test_plan_covers_every_voice_and_dedupes_texts():
+    jobs = pregen_audio.plan_jobs(BOOKS + BOOKS[:1], ["alloy", "verse"], short=True)
+    # A: full + short, B: its short summary equals the full one
+    assert len(jobs) == 3 * 2
+    assert {j.voice for j in jobs} == {"alloy", "verse"}
+
+
+def test_run_fills_the_cache_and_resumes_from_it(stub):
+    jobs = pregen_audio.plan_jobs(BOOKS, ["alloy", "verse"])
+    result = pregen_audio.run(jobs, workers=2, per_minute=0, progress_every=0)
+    assert result["synthesized"] == 4 and not result["failed"]
+
+    # What the app plays is now a cache hit
+    assert tts.synthesize_stream(BOOKS[0]["summary"], voice="verse").path.exists()
+    calls = stub.calls["speech"]
+    again = pregen_audio.run(jobs, per_minute=0, progress_every=0)
+    assert again["skipped"] == 4 and stub.calls["speech"] == calls
+
+    # An evicted file is generated again
+    cache = audio_cache.get_audio_cache()
+    cache.path_for(jobs[0].key, tts.TTS_FORMAT).unlink()
+    third = pregen_audio.run(jobs, per_minute=0, progress_every=0)
+    assert third["synthesized"] == 1 and third["skipped"] == 3
+
+
+def test_failures_are_reported_and_retried_next_run(stub, monkeypatch):
+    def flaky(text, **kw):
+        if "single" in text:
+            raise RuntimeError("quota")
+        return real(text, **kw)
+
+    real = pregen_audio.synthesize_to_file
+    monkeypatch.setattr(pregen_audio, "synthesize_to_file", flaky)
+    jobs = pregen_audio.plan_jobs(BOOKS, ["alloy"])
+    result = pregen_audio.run(jobs, per_minute=0, progress_every=0)
+    assert list(result["failed"]) == ["Book B [full, alloy]"]
+
+    monkeypatch.setattr(pregen_audio, "synthesize_to_file", real)
+    again = pregen_audio.run(jobs, per_minute=0, progress_every=0)
+    assert again["skipped"] == 1 and again["synthesized"] == 1
+
+
+def test_main_reads_ndjson_catalogs(stub, tmp_path, monkeypatch, capsys):
+    src = tmp_path / "books.ndjson"
+    src.write_text("\n".join(json.dumps(b) for b in BOOKS), encoding="utf-8")
+    monkeypatch.setattr(pregen_audio, "BOOK_SUMMARIES_PATH", src)
+    pregen_audio.main(["--voices", "alloy", "--rate", "0"])
+    assert "Synthesized 2," in capsys.readouterr().out
+    assert stub.calls["speech"] >= 2
+
+
+def test_rate_limit_is_charged_per_api_request(stub, monkeypatch):
+    monkeypatch.setattr(tts, "TTS_CHUNK_CHARS", 40)
+    monkeypatch.setattr(tts, "TTS_FIRST_CHUNK_CHARS", 20)
+    waits = []
+    monkeypatch.setattr(pregen_audio.RateLimiter, "wait", lambda self: waits.append(1))
+    jobs = pregen_audio.plan_jobs(BOOKS, ["alloy"])
+    pregen_audio.run(jobs, per_minute=60, progress_every=0)
+    assert stub.calls["speech"] > len(jobs)  # book A needs several chunk requests
+    assert len(waits) == stub.calls["speech"]
@@ -44,3 +44,157 @@ def test_retriever_has_vectors_and_returns_top1():
 
     # best_title() should agree with search(..., top_k=1)
     assert r.best_title(title) == top["title"]
+
+
+def _ingest_into(monkeypatch, tmp_path, books):
+    from app.rag import ingest, retriever
+
+    monkeypatch.setattr(ingest, "LEXICAL_INDEX_PATH", tmp_path / "lexical.json")
+    monkeypatch.setattr(retriever, "LEXICAL_INDEX_PATH", tmp_path / "lexical.json")
+    monkeypatch.setattr(ingest, "INGEST_CHECKPOINT_PATH", tmp_path / "ingest.checkpoint.json")
+
+    data = tmp_path / "books.json"
+    data.write_text(json.dumps(books), encoding="utf-8")
+    monkeypatch.setattr(ingest, "BOOK_SUMMARIES_PATH", data)
+    monkeypatch.setattr(ingest, "CHROMADB_PATH", tmp_path / "chroma")
+    monkeypatch.setattr(ingest, "embed_texts", lambda docs, **_: [[float(len(d)), 1.0] for d in docs])
+    ingest.main([])
+
+
+def test_shared_retriever_is_reused_and_reloaded_after_ingest(monkeypatch, tmp_path):
+    from app.rag import retriever
+
+    _ingest_into(monkeypatch, tmp_path, [{"title": "Book One", "summary": "First story."}])
+    monkeypatch.setattr(retriever, "CHROMADB_PATH", tmp_path / "chroma")
+    monkeypatch.setattr(retriever, "_shared", None)
+
+    first = retriever.get_retriever()
+    assert retriever.get_retriever() is first
+    assert first.collection.count() == 1
+
+    _ingest_into(monkeypatch, tmp_path, [
+        {"title": "Book One", "summary": "First story."},
+        {"title": "Book Two", "summary": "Second story."},
+    ])
+    second = retriever.get_retriever()
+    assert second is not first
+    assert second.collection.count() == 2
+
+    # A no-op ingest leaves the index files alone, so nothing is reopened
+    _ingest_into(monkeypatch, tmp_path, [
+        {"title": "Book One", "summary": "First story."},
+        {"title": "Book Two", "summary": "Second story."},
+    ])
+    assert retriever.get_retriever() is second
+
+
+def test_numpy_backend_matches_chroma(monkeypatch, tmp_path):
+    from app.rag import ingest
+    from app.rag.retriever import BooksRetriever
+
+    monkeypatch.setattr(ingest, "NUMPY_INDEX_PATH", tmp_path / "np_index")
+    monkeypatch.setattr(ingest, "LEXICAL_ENABLED", False)
+    monkeypatch.setattr(ingest, "INGEST_CHECKPOINT_PATH", tmp_path / "ingest.checkpoint.json")
+    books = [{"title": f"Book {i}", "summary": "x" * (i + 1)} for i in range(12)]
+    data = tmp_path / "books.json"
+    data.write_text(json.dumps(books), encoding="utf-8")
+    monkeypatch.setattr(ingest, "BOOK_SUMMARIES_PATH", data)
+    monkeypatch.setattr(ingest, "CHROMADB_PATH", tmp_path / "chroma")
+    # 2-d vectors at different angles so cosine ranking is well defined
+    monkeypatch.setattr(
+        ingest, "embed_texts", lambda docs, **_: [[1.0, len(d) / 10.0] for d in docs]
+    )
+    ingest.main(["--export-numpy"])
+
+    chroma = BooksRetriever(path=tmp_path / "chroma", backend="chroma")
+    fast = BooksRetriever(path=tmp_path / "np_index", backend="numpy")
+    assert fast.collection.count() == chroma.collection.count() == 12
+
+    q = [1.0, 2.0]
+    a = chroma.search_by_embedding(q, top_k=5)
+    b = fast.search_by_embedding(q, top_k=5)
+    assert [it["title"] for it in a] == [it["title"] for it in b]
+    for x, y in zip(a, b):
+        assert abs(x["distance"] - y["distance"]) < 1e-4
+        assert x["document"] == y["document"]
+
+
+def test_numpy_index_exact_top_k(tmp_path):
+    import numpy as np
+    from app.rag.numpy_index import NumpyIndex, write_numpy_index
+
+    rng = np.random.default_rng(0)
+    vecs = rng.normal(size=(200, 8)).astype(np.float32)
+    page = {
+        "ids": [str(i) for i in range(200)],
+        "documents": [f"doc {i}" for i in range(200)],
+        "metadatas": [{"title": f"T{i}"} for i in range(200)],
+        "embeddings": vecs,
+    }
+    write_numpy_index(tmp_path, 200, 8, [page])
+    idx = NumpyIndex(tmp_path)
+
+    q = rng.normal(size=(3, 8))
+    res = idx.query(q.tolist(), n_results=4)
+    unit = vecs / np.linalg.norm(vecs, axis=1, keepdims=True)
+    for qi in range(3):
+        sims = unit @ (q[qi] / np.linalg.norm(q[qi]))
+        expected = [str(i) for i in np.argsort(-sims)[:4]]
+        assert res["ids"][qi] == expected
+        assert res["distances"][qi] == sorted(res["distances"][qi])
+
+
+def test_search_many_returns_results_per_query_in_order(monkeypatch, tmp_path):
+    from app.rag import retriever
+
+    books = [{"title": f"Book {i}", "summary": "x" * (i + 1)} for i in range(6)]
+    _ingest_into(monkeypatch, tmp_path, books)
+    r = retriever.BooksRetriever(path=tmp_path / "chroma", backend="chroma")
+
+    queries = {"Title: Book 0": [1.0, 0.0], "Title: Book 5": [0.0, 1.0], "Title: Book 2": [1.0, 1.0]}
+    calls = []
+
+    def fake_embed_texts(texts, **_):
+        calls.append(list(texts))
+        return [queries[t] for t in texts]
+
+    monkeypatch.setattr(retriever, "embed_texts", fake_embed_texts)
+    results = r.search_many(list(queries), top_k=3, batch_size=2)
+
+    assert len(calls) == 1  # one batched embeddings pass
+    assert len(results) == 3 and any(results)
+    for q, items in zip(queries, results):
+        assert items == r.fuse(q, r.search_by_embedding(queries[q], top_k=3), top_k=3)
+
+    # Same answers as search(), including the title short-circuit
+    monkeypatch.setattr(retriever, "embed_text", lambda q: queries[q])
+    mixed = ["Book 4", *queries]
+    assert r.search_many(mixed, top_k=3) == [r.search(q, top_k=3) for q in mixed]
+    assert r.search_many(["Book 4"], top_k=3)[0][0]["title"] == "Book 4"
+
+
+def test_title_queries_skip_embedding_and_themes_are_fused(monkeypatch, tmp_path):
+    from app.rag import retriever
+
+    data = json.loads(Path(BOOK_SUMMARIES_PATH).read_text(encoding="utf-8"))
+    _ingest_into(monkeypatch, tmp_path, data)
+    r = retriever.BooksRetriever(path=tmp_path / "chroma", backend="chroma")
+    assert r.lexical is not None and len(r.lexical) == len(data)
+
+    def no_embedding(query):
+        raise AssertionError("title queries must not be embedded")
+
+    monkeypatch.setattr(retriever, "embed_text", no_embedding)
+    assert r.search("the hunger games")[0]["title"] == "The Hunger Games"
+    assert r.search("Hunger Games", top_k=1)[0]["title"] == "The Hunger Games"
+    assert r.lexical_hit("a dystopian story about games and survival") is None
+
+    # theme query: vector results fused with BM25 results
+    monkeypatch.setattr(retriever, "embed_text", lambda q: [1.0, 1.0])
+    items = r.search("dystopian games survival", top_k=3)
+    assert 0 < len(items) <= 3
+    assert "The Hunger Games" in [it["title"] for it in items]
+
+    # no confident vector hit: BM25 word overlap alone is not a match
+    monkeypatch.setattr(retriever, "embed_text", lambda q: [-1.0, 0.0])
+    assert r.search("dystopian games survival", top_k=3) == []
@@ -0,0 +1,145 @@
+import io
+import os
+import threading
+import time
+import wave
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from app.llm.openai_client import set_client_factory
+from app.tools import stt, transcript_cache, vad
+
+RATE = 16000
+
+
+def _wav(samples: np.ndarray, rate: int = RATE, channels: int = 1) -> bytes:
+    buf = io.BytesIO()
+    with wave.open(buf, "wb") as w:
+        w.setnchannels(channels)
+        w.setsampwidth(2)
+        w.setframerate(rate)
+        w.writeframes((np.repeat(samples, channels) * 32767).astype("<i2").tobytes())
+    return buf.getvalue()
+
+
+def _words_audio(n: int, word_s: float = 1.0, gap_s: float = 0.6) -> bytes:
+    # "word" i is a tone of amplitude (i + 1) / 10, separated by silence
+    t = np.arange(int(word_s * RATE)) / RATE
+    parts = []
+    for i in range(n):
+        parts.append((i + 1) / 10 * np.sin(2 * np.pi * 220 * t))
+        parts.append(np.zeros(int(gap_s * RATE)))
+    return _wav(np.concatenate(parts))
+
+
+class _FakeWhisper:
+    """Transcribes the tones above back into w1..wN, after a fixed latency."""
+
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.calls = 0
+        self.uploads = []
+        self._lock = threading.Lock()
+        self.audio = SimpleNamespace(transcriptions=SimpleNamespace(create=self.create))
+
+    def with_options(self, **_):
+        return self
+
+    def create(self, model, file, language=None, response_format="text", **_):
+        with self._lock:
+            self.calls += 1
+        time.sleep(self.latency)
+        audio = vad.read_wav(file.read())
+        self.uploads.append(audio)
+        x = np.frombuffer(audio.frames, dtype="<i2") / 32767
+        frames = x[: len(x) // 480 * 480].reshape(-1, 480)
+        peaks = np.abs(frames).max(axis=1)
+        words, prev = [], 0.0
+        for p in peaks:
+            if p > 0.05 and prev <= 0.05:
+                words.append(f"w{int(round(p * 10))}")
+            prev = p
+        return " ".join(words)
+
+
+@pytest.fixture
+def whisper(tmp_path, monkeypatch):
+    fake = _FakeWhisper(latency=0.2)
+    set_client_factory(lambda: fake)
+    monkeypatch.setattr(transcript_cache, "_cache", transcript_cache.TranscriptCache(tmp_path / "stt.sqlite3"))
+    yield fake
+    set_client_factory(None)
+
+
+def test_short_audio_is_sent_whole(whisper):
+    assert stt.transcribe_bytes(_words_audio(2), filename="mic.wav") == "w1 w2"
+    assert whisper.calls == 1
+
+
+def test_long_audio_is_split_at_silences_and_transcribed_concurrently(whisper, monkeypatch):
+    monkeypatch.setattr(stt, "STT_SEGMENT_SECONDS", 3.0)
+    data = _words_audio(9)
+    segments = stt._prepare(data, "mic.wav")  # compacted, then split
+    assert len(segments) >= 5 and not any(overlaps for _, overlaps in segments)
+
+    t0 = time.perf_counter()
+    text = stt.transcribe_bytes(data, filename="mic.wav")
+    elapsed = time.perf_counter() - t0
+    assert text == " ".join(f"w{i}" for i in range(1, 10))
+    assert whisper.calls == len(segments)
+    assert elapsed < 0.2 * len(segments) * 0.75  # segments overlapped in time
+
+
+def test_cuts_inside_speech_overlap():
+    tone = 0.5 * np.sin(2 * np.pi * 220 * np.arange(10 * RATE) / RATE)
+    bounds = vad.plan_segments(vad.read_wav(_wav(tone)), max_seconds=3.0, overlap_seconds=1.0)
+    assert bounds[0][0] == 0.0 and bounds[-1][1] == pytest.approx(10.0)
+    assert all(b[0] < a[1] for a, b in zip(bounds, bounds[1:]))
+
+
+def test_stitch_drops_words_repeated_in_overlaps():
+    assert stt.stitch(["I want a cozy", "cozy fantasy about", "About friendship."]) == (
+        "I want a cozy fantasy about friendship."
+    )
+    # Segments cut at silences don't overlap: a repeated word is real speech
+    assert stt.stitch(["no", "no more"], [False, False]) == "no no more"
+
+
+def test_non_wav_uploads_are_not_split(whisper, monkeypatch):
+    monkeypatch.setattr(stt, "STT_SEGMENT_SECONDS", 3.0)
+    assert stt.split_wav(b"not a wav") == [(b"not a wav", False)]
+
+
+def test_uploads_are_compacted_and_transcripts_cached(whisper):
+    # 44.1 kHz stereo with two seconds of silence on each side
+    pad = np.zeros(2 * 44100)
+    t = np.arange(44100) / 44100
+    data = _wav(np.concatenate([pad, 0.3 * np.sin(2 * np.pi * 220 * t), pad]), rate=44100, channels=2)
+
+    assert stt.transcribe_bytes(data, filename="mic.wav") == "w3"
+    sent = whisper.uploads[0]
+    assert (sent.rate, sent.channels, sent.sampwidth) == (16000, 1, 2)
+    assert sent.duration < 1.6 and len(sent.frames) < len(data) / 10
+
+    assert stt.transcribe_bytes(data, filename="mic.wav") == "w3"
+    assert whisper.calls == 1
+
+
+def test_silence_only_is_not_uploaded(whisper):
+    assert stt.transcribe_bytes(_wav(np.zeros(RATE)), filename="mic.wav") == ""
+    assert whisper.calls == 0
+
+
+def test_recordings_are_deduplicated_and_pruned(tmp_path):
+    first = stt.save_recording(b"clip one", directory=tmp_path)
+    assert stt.save_recording(b"clip one", directory=tmp_path) == first
+    old = tmp_path / "mic_old.wav"
+    old.write_bytes(b"x" * 10)
+    os.utime(old, (time.time() - 10 * 86400,) * 2)
+    stt.save_recording(b"clip two", directory=tmp_path)
+    assert not old.exists() and len(list(tmp_path.iterdir())) == 2
+
+    result = stt.prune_recordings(tmp_path, max_age_days=0, max_bytes=10)
+    assert result["removed"] == 1 and result["kept_bytes"] <= 10
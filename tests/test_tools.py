@@ -1,6 +1,8 @@
+import gc
 import json
 import pytest
 import os
+import sqlite3
 from pathlib import Path
 
 from app.tools.summaries_store import SummariesStore
@@ -22,4 +24,76 @@ def test_openai_tool_call_path():
     res = call_summary_tool_via_openai(title)
     assert res["used_tool"] is True
     assert res["ok"] is True
-    assert isinstance(res["summary"], str) and len(res["summary"]) > 0
\ No newline at end of file
+    assert isinstance(res["summary"], str) and len(res["summary"]) > 0
+
+def test_resolve_summary_exact_is_local(monkeypatch):
+    from app.tools import summary_tool
+
+    def no_llm(title):
+        raise AssertionError("LLM tool call should not be needed")
+
+    monkeypatch.setattr(summary_tool, "call_summary_tool_via_openai", no_llm)
+    data = json.loads(Path(BOOK_SUMMARIES_PATH).read_text(encoding="utf-8"))
+    title = data[0]["title"]
+    res = summary_tool.resolve_summary(title.upper())
+    assert res["ok"] and res["match"] == "exact" and res["used_tool"] is False
+    assert res["summary"] == data[0]["summary"]
+
+
+def test_resolve_summary_fuzzy_and_unknown():
+    from app.tools.summary_tool import resolve_summary
+
+    res = resolve_summary("The Hunger Gmaes", allow_llm_fallback=False)
+    assert res["ok"] and res["match"] == "fuzzy"
+    assert res["args_title"] == "The Hunger Games"
+
+    res = resolve_summary("Completely Unrelated Nonsense", allow_llm_fallback=False)
+    assert not res["ok"] and res["match"] == "none"
+
+
+def test_title_index_ranks_closest_titles():
+    from app.tools.title_index import TitleIndex
+
+    idx = TitleIndex(["The Hobbit", "The Hunger Games", "Dune", "The Book Thief"])
+    assert idx.exact("  the HOBBIT! ") == "The Hobbit"
+    assert idx.search("hunger game", limit=1)[0][0] == "The Hunger Games"
+    assert idx.search("") == []
+
+
+def test_summaries_store_reads_bodies_lazily_and_rebuilds_on_change(tmp_path):
+    src = tmp_path / "books.json"
+    books = [{"title": f"Book {i}", "summary": f"Summary {i}."} for i in range(5)]
+    src.write_text(json.dumps(books + [{"title": "book  0", "summary": "Newer."}]), encoding="utf-8")
+    store = SummariesStore(path=src, db_path=tmp_path / "s.sqlite3", cache_size=2)
+
+    assert store.titles()[:5] == [b["title"] for b in books] and len(store) == 6
+    assert not store._bodies  # nothing loaded up front
+    assert store.get_summary_by_title("BOOK 3") == "Summary 3."
+    assert store.get_summary_by_title("Book 0") == "Newer."  # later duplicates win
+    store.get_summary_by_title("Book 1")
+    assert len(store._bodies) == 2
+    assert store.get_summary_by_title("Missing") is None
+
+    src.write_text(json.dumps([{"title": "Other", "summary": "Changed."}]), encoding="utf-8")
+    store = SummariesStore(path=src, db_path=tmp_path / "s.sqlite3")
+    assert store.titles() == ["Other"] and store.get_summary_by_title("other") == "Changed."
+
+
+def test_summaries_store_reads_ndjson_catalogs(tmp_path):
+    src = tmp_path / "books.ndjson"
+    books = [{"title": f"Book {i}", "summary": f"Summary {i}."} for i in range(3)]
+    src.write_text("\n".join(json.dumps(b) for b in books) + "\n", encoding="utf-8")
+    store = SummariesStore(path=src, db_path=tmp_path / "s.sqlite3")
+    assert store.titles() == [b["title"] for b in books]
+    assert store.get_summary_by_title("book 2") == "Summary 2."
+
+
+def test_summaries_store_closes_its_connection_when_dropped(tmp_path):
+    src = tmp_path / "books.json"
+    src.write_text(json.dumps([{"title": "Dune", "summary": "Spice."}]), encoding="utf-8")
+    store = SummariesStore(path=src, db_path=tmp_path / "s.sqlite3")
+    conn = store._conn
+    del store  # what a reload in get_store() does to the old store
+    gc.collect()
+    with pytest.raises(sqlite3.ProgrammingError):
+        conn.execute("SELECT 1")
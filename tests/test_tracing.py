@@ -0,0 +1,84 @@
+import json
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from app import tracing
+from app.tracing import LatencyStats, export_jsonl, in_context, span, start_trace, traced
+
+
+def test_spans_are_collected_on_the_active_trace():
+    with start_trace("request") as trace:
+        with span("embedding", cache_hit=False) as s:
+            s.set(cache_hit=True, total_tokens=7)
+        with pytest.raises(KeyError):
+            with span("summary"):
+                raise KeyError("x")
+    with span("outside"):
+        pass
+
+    names = [s.name for s in trace.spans]
+    assert names == ["embedding", "summary"]
+    assert trace.spans[0].attrs == {"cache_hit": True, "total_tokens": 7}
+    assert trace.spans[1].error == "KeyError"
+    assert trace.duration >= sum(trace.timings().values())
+    assert tracing.latency_summary()["outside"]["n"] >= 1
+
+
+def test_in_context_carries_trace_into_worker_threads():
+    @traced("moderation")
+    def work(x):
+        return x * 2
+
+    with start_trace() as trace, ThreadPoolExecutor(max_workers=2) as pool:
+        futures = [pool.submit(in_context(work, i)) for i in range(3)]
+        assert [f.result() for f in futures] == [0, 2, 4]
+        pool.submit(work, 9).result()  # not bound: recorded in stats only
+
+    assert [s.name for s in trace.spans] == ["moderation"] * 3
+
+
+def test_latency_stats_percentiles_over_rolling_window():
+    stats = LatencyStats(window=100)
+    for i in range(1, 201):
+        stats.add("chat", i / 1000)  # only the last 100 (101..200 ms) are kept
+    stats.add("chat", 0.150, error=True)
+    summary = stats.summary()["chat"]
+    assert summary["n"] == 100
+    assert summary["p50"] == pytest.approx(0.151, abs=0.002)
+    assert summary["p99"] == pytest.approx(0.200, abs=0.002)
+    assert summary["errors"] == 1
+
+
+def _worker_only_stage(n):
+    return sum(i * i for i in range(n))
+
+
+def test_profile_covers_tasks_on_worker_threads():
+    with start_trace("request", profile=True) as trace:
+        with ThreadPoolExecutor(max_workers=2) as pool:
+            futures = [pool.submit(in_context(_worker_only_stage, 10_000)) for _ in range(2)]
+            assert [f.result() for f in futures] == [_worker_only_stage(10_000)] * 2
+        in_context(_worker_only_stage, 10)()  # inline on the profiled thread: no nested profiler
+    assert "_worker_only_stage" in trace.profile
+    assert "2 worker task(s)" in trace.profile
+
+    with start_trace("request") as plain:
+        with ThreadPoolExecutor(max_workers=1) as pool:
+            pool.submit(in_context(_worker_only_stage, 10)).result()
+    assert plain.profile is None
+
+
+def test_profile_and_jsonl_export(tmp_path):
+    with start_trace("request", profile=True) as trace:
+        with span("chat"):
+            sum(i * i for i in range(10_000))
+    assert trace.profile and "cumulative" in trace.profile
+
+    out = tmp_path / "traces.jsonl"
+    export_jsonl(trace, out)
+    export_jsonl(trace, out)
+    rows = [json.loads(line) for line in out.read_text(encoding="utf-8").splitlines()]
+    assert len(rows) == 2
+    assert rows[0]["trace_id"] == trace.trace_id
+    assert rows[0]["spans"][0]["name"] == "chat"
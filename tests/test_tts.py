@@ -0,0 +1,140 @@
+import time
+
+import pytest
+
+from app.llm.openai_client import set_client_factory
+from app.llm.stub_client import StubOpenAI, fake_audio
+from app.tools import audio_cache, tts
+
+
+@pytest.fixture
+def stub_tts(tmp_path, monkeypatch):
+    stub = StubOpenAI(latency={"speech": 0.2})
+    set_client_factory(lambda: stub)
+    monkeypatch.setattr(audio_cache, "_cache", audio_cache.AudioCache(tmp_path))
+    yield stub
+    set_client_factory(None)
+
+
+def test_chunks_break_on_sentences_within_the_limit():
+    text = "One short sentence. " * 20 + "A final question?"
+    chunks = tts._chunk_text(text, max_chars=100)
+    assert all(len(c) <= 100 for c in chunks)
+    assert all(c.endswith((".", "?")) for c in chunks)
+    assert " ".join(chunks) == text.strip()
+
+
+def test_overlong_sentences_split_between_words():
+    chunks = tts._chunk_text("word " * 100, max_chars=48)
+    assert all(len(c) <= 48 and not c.startswith(" ") for c in chunks)
+    assert " ".join(chunks).split() == ["word"] * 100
+
+
+def test_chunks_are_synthesized_concurrently_and_in_order(stub_tts, monkeypatch):
+    monkeypatch.setattr(tts, "TTS_CHUNK_CHARS", 40)
+    sentences = [f"Sentence number {i} is here." for i in range(6)]
+    text = " ".join(sentences)
+    chunks = tts._chunk_text(text)
+    assert len(chunks) >= 4
+
+    t0 = time.perf_counter()
+    path = tts.synthesize_to_file(text, voice="alloy")
+    elapsed = time.perf_counter() - t0
+    assert path.read_bytes() == b"".join(fake_audio(c, "alloy") for c in chunks)
+    assert elapsed < 0.2 * len(chunks) * 0.75  # not N serial round trips
+
+    # A text sharing the first chunk reuses its audio
+    calls = stub_tts.calls["speech"]
+    tts.synthesize_to_file(chunks[0], voice="alloy")
+    assert stub_tts.calls["speech"] == calls
+
+
+def test_first_chunk_is_short_for_early_playback():
+    text = "A fairly short opening sentence. " + "Then a much longer stretch of narration follows here. " * 10
+    chunks = tts._chunk_text(text, max_chars=300, first_chars=60)
+    assert len(chunks[0]) <= 60 and len(chunks[1]) > 60
+
+
+def test_stream_yields_first_segment_early_and_writes_the_cache_file(stub_tts, monkeypatch):
+    monkeypatch.setattr(tts, "TTS_CHUNK_CHARS", 60)
+    monkeypatch.setattr(tts, "TTS_FIRST_CHUNK_CHARS", 30)
+    text = " ".join(f"Sentence number {i} is here." for i in range(8))
+
+    stream = tts.synthesize_stream(text, voice="verse")
+    segments = list(stream)
+    assert len(segments) == len(tts._chunk_text(text)) > 2
+    assert stream.time_to_first_audio < stream.total_time
+    assert stream.time_to_first_audio < 0.2  # head chunk streams: first bytes after 1/4 of the latency
+    assert stream.path.read_bytes() == b"".join(segments)
+    assert not list(stream.path.parent.glob("*.part"))
+
+    # Same text again: served from the cache as a single segment, same path as synthesize_to_file
+    again = tts.synthesize_stream(text, voice="verse")
+    assert list(again) == [b"".join(segments)] and again.cache_hit
+    assert tts.synthesize_to_file(text, voice="verse") == stream.path
+
+
+def test_iter_bytes_hands_over_audio_as_it_arrives(stub_tts, monkeypatch):
+    monkeypatch.setattr(tts, "TTS_CHUNK_CHARS", 60)
+    monkeypatch.setattr(tts, "TTS_FIRST_CHUNK_CHARS", 30)
+    text = " ".join(f"Sentence number {i} is here." for i in range(8))
+    received = []
+    real = tts._stream_chunk_bytes
+
+    def trickle(chunk, **opts):
+        data = b"".join(real(chunk, **opts))
+        for i in range(0, len(data), 8):
+            received.append(i)
+            yield data[i : i + 8]
+
+    monkeypatch.setattr(tts, "_stream_chunk_bytes", trickle)
+    stream = tts.synthesize_stream(text, voice="verse")
+    it = stream.iter_bytes()
+    first = next(it)
+    assert len(first) == 8 and len(received) == 1  # before the rest of the first chunk has arrived
+    data = first + b"".join(it)
+    assert data == stream.path.read_bytes()
+    assert stream.segments == len(tts._chunk_text(text))
+
+
+def test_abandoned_stream_leaves_no_partial_file(stub_tts, monkeypatch):
+    monkeypatch.setattr(tts, "TTS_CHUNK_CHARS", 60)
+    monkeypatch.setattr(tts, "TTS_FIRST_CHUNK_CHARS", 30)
+    stream = tts.synthesize_stream(" ".join(f"Line {i} of the text." for i in range(8)))
+    it = iter(stream)
+    next(it)
+    it.close()
+    assert not stream.path.exists()
+    assert not list(stream.path.parent.glob("*.part"))
+
+    it = stream.iter_bytes()
+    next(it)
+    it.close()
+    assert not stream.path.exists()
+    assert not list(stream.path.parent.glob("*.part"))
+
+
+def test_wav_flac_and_opus_are_not_chunk_concatenated(stub_tts, monkeypatch):
+    from app.tools.vad import read_wav
+
+    monkeypatch.setattr(tts, "TTS_CHUNK_CHARS", 40)
+    monkeypatch.setattr(tts, "TTS_FIRST_CHUNK_CHARS", 20)
+    text = " ".join(f"Sentence number {i} is here." for i in range(6))
+
+    # Within the API limit: one request, so the file has a single valid header
+    for fmt in ("wav", "flac", "opus"):
+        calls = stub_tts.calls["speech"]
+        path = tts.synthesize_to_file(text, voice="alloy", fmt=fmt)
+        assert stub_tts.calls["speech"] == calls + 1
+        assert path.read_bytes() == fake_audio(text, "alloy", fmt)
+        assert list(tts.synthesize_stream(text, voice="echo", fmt=fmt)) == [fake_audio(text, "echo", fmt)]
+
+    # Past it, WAV chunks are remuxed under one header; flac and opus cannot be joined
+    monkeypatch.setattr(tts, "_MAX_INPUT_CHARS", 60)
+    data = tts.synthesize_to_file(text, voice="verse", fmt="wav").read_bytes()
+    chunks = tts._chunks_for(text, "wav")
+    assert len(chunks) > 1 and data.count(b"RIFF") == 1
+    assert read_wav(data).frames == b"".join(read_wav(fake_audio(c, "verse", "wav")).frames for c in chunks)
+    for fmt in ("flac", "opus"):
+        with pytest.raises(ValueError):
+            tts.synthesize_to_file(text, voice="verse", fmt=fmt)